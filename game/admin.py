@@ -1,39 +1,75 @@
 # game/admin.py
+import datetime
+
 from django.contrib import admin
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
 from django.db.models import F
 from django.contrib import messages
-from .models import PlayerProfile, CardTemplate, UserCard, MarketListing, Pack, Avatar
+from django.urls import reverse
+from django.utils.html import format_html
+from . import bulk
+from .models import PlayerProfile, CardTemplate, UserCard, MarketListing, Pack, Avatar, BulkJob
+from .cache import bump_profile_version
+from .pagination import EstimatedCountPaginator
+from .slowlog import SLOW_QUERY_MS, clear_slow_queries, get_slow_queries
 
 # --- Actions (عملیات‌های گروهی) ---
 
 @admin.action(description='💎 واریز 1000 الماس هدیه')
 def give_1000_gems(modeladmin, request, queryset):
     updated = queryset.update(gems=F('gems') + 1000)
+    bump_profile_version(*queryset.values_list('user_id', flat=True))
     modeladmin.message_user(request, f"{updated} کاربر 1000 الماس دریافت کردند.", messages.SUCCESS)
 
 @admin.action(description='💰 واریز 5000 سکه هدیه')
 def give_5000_coins(modeladmin, request, queryset):
     updated = queryset.update(coins=F('coins') + 5000)
+    bump_profile_version(*queryset.values_list('user_id', flat=True))
     modeladmin.message_user(request, f"{updated} کاربر 5000 سکه دریافت کردند.", messages.SUCCESS)
 
+def run_bulk_action(modeladmin, request, queryset, action, done_message):
+    """
+    اجرای set-based یک action از game.bulk؛ انتخاب‌های بزرگ‌تر از BACKGROUND_THRESHOLD
+    به یک BulkJob پس‌زمینه سپرده می‌شوند و فقط لینک صفحهٔ پیشرفت برمی‌گردد
+    """
+    total = queryset.count()
+    if total > bulk.BACKGROUND_THRESHOLD:
+        job = bulk.submit(action, queryset, request.user, total)
+        url = reverse('admin:game_bulkjob_change', args=[job.pk])
+        modeladmin.message_user(request, format_html(
+            '{} ردیف در پس‌زمینه پردازش می‌شود: <a href="{}">پیشرفت عملیات #{}</a>', total, url, job.pk),
+            messages.INFO)
+        return
+    affected = bulk.run_action(action, queryset)
+    modeladmin.message_user(request, done_message.format(affected), messages.SUCCESS)
+
 @admin.action(description='⚡ محاسبه مجدد نرخ استخراج (Fix Rates)')
 def recalculate_mining_rates(modeladmin, request, queryset):
-    count = 0
-    for profile in queryset:
-        # فرض بر این است که متد update_mining_rate در مدل PlayerProfile وجود دارد
-        if hasattr(profile, 'update_mining_rate'):
-            profile.update_mining_rate()
-            count += 1
-    modeladmin.message_user(request, f"نرخ استخراج {count} کاربر بروزرسانی شد.", messages.INFO)
+    run_bulk_action(modeladmin, request, queryset, 'recalculate_mining_rates',
+                    "نرخ استخراج {} کاربر بروزرسانی شد.")
 
 # --- Admin Classes ---
 
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    changelist جدول‌های بزرگ: تعداد تخمینی به جای COUNT(*) کامل، بدون شمارش دوم
+    «نمایش همه» بعد از فیلتر، و raw_id به جای dropdownهای میلیونی در فرم‌ها
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
 @admin.register(PlayerProfile)
-class PlayerProfileAdmin(admin.ModelAdmin):
+class PlayerProfileAdmin(LargeTableAdmin):
     list_display = ('user', 'coins', 'gems', 'current_mining_rate', 'last_claim_time')
+    list_select_related = ('user',)
     list_filter = ('last_claim_time',) # level را اگر در مدل ندارید از اینجا حذف کنید
-    search_fields = ('user__username',)
+    # istartswith از ایندکس UPPER(username) (مهاجرت 0020) استفاده می‌کند؛ icontains کل جدول را می‌خواند
+    search_fields = ('user__username__istartswith',)
+    # ایندکس (-coins, -id) در PlayerProfile.Meta
     ordering = ('-coins',)
+    raw_id_fields = ('user', 'avatar', 'slot_1', 'slot_2', 'slot_3')
     actions = [give_1000_gems, give_5000_coins, recalculate_mining_rates]
     
     fieldsets = (
@@ -49,6 +85,10 @@ class PlayerProfileAdmin(admin.ModelAdmin):
     )
     readonly_fields = ('current_mining_rate',)
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        bump_profile_version(obj.user_id)
+
 @admin.register(CardTemplate)
 class CardTemplateAdmin(admin.ModelAdmin):
     list_display = ('name', 'rarity', 'mining_rate', 'minted_count', 'max_supply', 'supply_percentage')
@@ -64,12 +104,14 @@ class CardTemplateAdmin(admin.ModelAdmin):
 
 
 @admin.register(UserCard)
-class UserCardAdmin(admin.ModelAdmin):
+class UserCardAdmin(LargeTableAdmin):
     # اصلاح نام فیلد: user -> owner
     list_display = ('id', 'template', 'serial_number', 'owner', 'is_listed_in_market') 
+    # __str__ مالک نام کاربری است
+    list_select_related = ('template', 'owner__user')
     
     # اصلاح جستجو: user__username -> owner__user__username
-    search_fields = ('template__name', 'owner__user__username')
+    search_fields = ('template__name__istartswith', 'owner__user__username__istartswith')
     
     # اصلاح فیلتر: استفاده از فیلد صحیح
     list_filter = ('is_listed_in_market', 'template__rarity') 
@@ -78,28 +120,23 @@ class UserCardAdmin(admin.ModelAdmin):
     raw_id_fields = ('owner', 'template') 
 
 @admin.register(MarketListing)
-class MarketListingAdmin(admin.ModelAdmin):
+class MarketListingAdmin(LargeTableAdmin):
     # فیلدهای جدید: price فقط برای Vow Fragments
     list_display = ('seller', 'get_card_name', 'price', 'created_at', 'is_active')
+    list_select_related = ('seller__user', 'card_instance__template')
     list_filter = ('created_at', 'is_active')
     actions = ['cancel_listings']
-    search_fields = ('seller__user__username', 'card_instance__template__name')
+    search_fields = ('seller__user__username__istartswith', 'card_instance__template__name__istartswith')
+    raw_id_fields = ('seller', 'card_instance')
 
     def get_card_name(self, obj):
-        return obj.card_instance.template.name if obj.card_instance else '-'
+        return obj.card_instance.template.name
     get_card_name.short_description = 'کارت'
 
     @admin.action(description='❌ لغو آگهی‌های انتخاب شده')
     def cancel_listings(self, request, queryset):
-        for listing in queryset:
-            # آزاد کردن کارت
-            card = listing.card_instance
-            card.is_listed_in_market = False
-            card.save()
-            # غیرفعال کردن آگهی
-            listing.is_active = False
-            listing.save()
-        self.message_user(request, "آگهی‌ها لغو شدند و کارت‌ها به مالکان برگشت.", messages.SUCCESS)
+        run_bulk_action(self, request, queryset, 'cancel_listings',
+                        "{} آگهی لغو شد و کارت‌ها به مالکان برگشت.")
 
 @admin.register(Pack)
 class PackAdmin(admin.ModelAdmin):
@@ -122,3 +159,66 @@ class PackAdmin(admin.ModelAdmin):
 @admin.register(Avatar)
 class AvatarAdmin(admin.ModelAdmin):
     list_display = ('name', 'is_premium')
+
+
+@admin.register(BulkJob)
+class BulkJobAdmin(admin.ModelAdmin):
+    """
+    فقط نمایش؛ jobها از actionهای گروهی ساخته می‌شوند و صفحهٔ هر job تا پایان کار خودکار
+    refresh می‌شود. jobهای خطاخورده یا رهاشده با action «ادامه» از آخرین تکه ادامه پیدا می‌کنند.
+    """
+    list_display = ('id', 'action', 'status', 'progress', 'affected', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'action')
+    list_select_related = ('created_by',)
+    readonly_fields = ('action', 'status', 'progress', 'total', 'processed', 'affected', 'error',
+                       'created_by', 'created_at', 'updated_at', 'started_at', 'finished_at')
+    fields = readonly_fields
+    actions = ['retry_jobs']
+
+    @admin.action(description='🔁 ادامهٔ عملیات‌های خطاخورده یا متوقف‌شده')
+    def retry_jobs(self, request, queryset):
+        retried = [job_id for job_id in queryset.values_list('pk', flat=True) if bulk.retry(job_id)]
+        if retried:
+            self.message_user(request, f'{len(retried)} عملیات از آخرین تکه ادامه پیدا می‌کند.', messages.SUCCESS)
+        else:
+            self.message_user(request, 'عملیات خطاخورده یا متوقف‌شده‌ای انتخاب نشده بود.', messages.WARNING)
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        extra_context = {**(extra_context or {}),
+                         'can_retry': bulk.resumable_jobs().filter(pk=object_id).exists()}
+        return super().change_view(request, object_id, form_url, extra_context)
+
+    def progress(self, obj):
+        return format_html('<progress value="{}" max="{}"></progress> {}%', obj.processed, obj.total or 1,
+                           obj.percent)
+    progress.short_description = 'پیشرفت'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# --- صفحهٔ کوئری‌های کند (game.slowlog) ---
+
+def slow_queries_view(request):
+    if request.method == 'POST' and 'clear' in request.POST:
+        clear_slow_queries()
+        messages.success(request, 'بافر کوئری‌های کند پاک شد.')
+        return redirect(request.path)
+
+    view = request.GET.get('view') or None
+    entries = [
+        dict(entry, at=datetime.datetime.fromtimestamp(entry['at'], tz=datetime.timezone.utc))
+        for entry in get_slow_queries(view=view)
+    ]
+    context = {
+        **admin.site.each_context(request),
+        'title': 'کوئری‌های کند',
+        'entries': entries,
+        'views': sorted({entry['view'] for entry in get_slow_queries() if entry['view']}),
+        'selected_view': view,
+        'threshold_ms': SLOW_QUERY_MS,
+    }
+    return TemplateResponse(request, 'admin/game/slow_queries.html', context)
@@ -0,0 +1,151 @@
+"""
+نسخه‌های async از endpointهای فقط‌خواندنی (بدون تراکنش)
+
+زیر سرور ASGI (مثلاً uvicorn) هر درخواست در حال انتظار یک thread نگه نمی‌دارد،
+پس یک instance کوچک هم می‌تواند هزاران کلاینت polling را جواب دهد. کش‌ها با API
+async خوانده می‌شوند و کوئری‌ها با ORM async اجرا می‌شوند؛ خروجی و کدهای خطا
+همان نسخه‌های DRF در views.py است.
+
+DRF از view async پشتیبانی نمی‌کند، پس احراز هویت (game.authentication.aauthenticate)،
+رندر (FastJSONRenderer / MessagePack) و پاسخ‌های خطا اینجا انجام می‌شوند.
+با GAME_ASYNC_READ_VIEWS در urls.py جایگزین نسخه‌های sync می‌شوند.
+
+event_stream (Server-Sent Events) فقط async دارد و فقط زیر ASGI کار می‌کند.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
+from rest_framework import exceptions
+
+from . import views
+from .authentication import aauthenticate
+from .cache import aget_profile_version, aget_cached_profile, aset_cached_profile, profile_etag
+from .catalog import acatalog_generation, aget_catalog
+from .events import MARKET_CHANNEL, get_broker, player_channel
+from .models import MarketListing, PlayerProfile
+from .renderers import FastJSONRenderer, MessagePackRenderer
+from .serializers import player_profile_data
+
+
+def render(request, data, status=200, headers=None):
+    """رندر مثل DRF؛ MessagePack فقط وقتی کلاینت صریحاً بخواهد"""
+    if 'application/msgpack' in request.headers.get('Accept', ''):
+        renderer = MessagePackRenderer()
+    else:
+        renderer = FastJSONRenderer()
+    body = renderer.render(data) if data is not None else b''
+    response = HttpResponse(body, status=status, content_type=renderer.media_type)
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+def async_api(require_auth=True):
+    """معادل api_view(['GET']) + permission_classes برای viewهای async"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                exc = exceptions.MethodNotAllowed(request.method)
+                return render(request, {'detail': exc.detail}, status=exc.status_code,
+                              headers={'Allow': 'GET, HEAD'})
+            try:
+                request.user = await aauthenticate(request)
+            except exceptions.AuthenticationFailed as exc:
+                return render(request, {'detail': exc.detail}, status=403)
+            if require_auth and not request.user.is_authenticated:
+                exc = exceptions.NotAuthenticated()
+                return render(request, {'detail': exc.detail}, status=403)
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@async_api()
+async def get_avatars(request):
+    return render(request, (await aget_catalog())['avatars'])
+
+
+@async_api(require_auth=False)
+async def get_packs(request):
+    return render(request, views.packs_data(request, await aget_catalog()))
+
+
+@async_api()
+async def get_my_profile(request):
+    user_id = request.user.pk
+    version = f'{await aget_profile_version(user_id)}.{await acatalog_generation()}'
+    etag = profile_etag(user_id, version)
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Vary': 'Accept'}
+
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return render(request, None, status=304, headers=headers)
+
+    data = await aget_cached_profile(user_id, version)
+    if data is None:
+        profile = await PlayerProfile.objects.select_related(
+            'user', 'avatar',
+            'slot_1__template', 'slot_2__template', 'slot_3__template'
+        ).aget(user_id=user_id)
+        data = player_profile_data(profile)
+        await aset_cached_profile(user_id, version, data)
+    return render(request, data, headers=headers)
+
+
+@async_api()
+async def leaderboard(request):
+    data = []
+    async for player in views.leaderboard_queryset():
+        data.append(views.leaderboard_entry(len(data) + 1, player))
+    return render(request, data)
+
+
+@async_api(require_auth=False)
+async def market_feed(request):
+    if request.GET.get('stream') in ('1', 'true') or 'limit' in request.GET or 'cursor' in request.GET:
+        # خروجی استریم با cursor سمت سرور و صفحه‌بندی همان نسخهٔ sync است
+        return await sync_to_async(views.market_feed)(request)
+
+    compact = request.GET.get('compact') in ('1', 'true')
+    listings = MarketListing.objects.filter(is_active=True).order_by('-created_at')
+    data = [views.market_feed_item(row, compact)
+            async for row in listings.values_list(*views.MARKET_FEED_COLUMNS)]
+    return render(request, data)
+
+
+EVENT_HEARTBEAT = getattr(settings, 'GAME_EVENT_HEARTBEAT', 15)
+
+
+def sse_message(event):
+    data = FastJSONRenderer().render(event['data'])
+    return b'event: ' + event['type'].encode() + b'\ndata: ' + data + b'\n\n'
+
+
+@async_api(require_auth=False)
+async def event_stream(request):
+    """
+    رویدادهای بازار برای همه و رویدادهای موجودی برای کاربر لاگین‌شده (SSE)
+    هر GAME_EVENT_HEARTBEAT ثانیه یک کامنت خالی فرستاده می‌شود تا proxyها اتصال را نبندند.
+    """
+    if not hasattr(request, 'scope'):
+        # زیر WSGI هر اتصال باز یک worker را کامل اشغال می‌کند
+        return render(request, {'detail': 'Event stream requires an ASGI server.'}, status=501)
+
+    channels = [MARKET_CHANNEL]
+    if request.user.is_authenticated:
+        channels.append(player_channel(request.user.pk))
+
+    async def stream():
+        with get_broker().subscribe(channels) as subscription:
+            yield b'retry: 5000\n\n'
+            while True:
+                event = await subscription.get(timeout=EVENT_HEARTBEAT)
+                yield b': ping\n\n' if event is None else sse_message(event)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,252 @@
+"""
+احراز هویت کش‌شده (توکن و سشن)
+
+در حالت عادی هر درخواست یک کوئری برای Token (یا سشن)، یک کوئری برای User و
+یک کوئری برای request.user.profile دارد. اینجا کاربر و شناسهٔ پروفایلش در یک
+LRU داخل پروسه با TTL نگه داشته می‌شوند و در صورت تنظیم GAME_AUTH_CACHE_ALIAS
+یک لایهٔ کش مشترک (مثلاً Redis) هم پشت آن قرار می‌گیرد.
+
+ابطال: تغییر/حذف User و حذف Token (سیگنال‌ها)، logout و تغییر رمز در update_profile.
+در حالت چند پروسه‌ای، LRU پروسه‌های دیگر حداکثر به اندازهٔ TTL قدیمی می‌ماند.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+from .models import PlayerProfile
+
+AUTH_CACHE_SIZE = getattr(settings, 'GAME_AUTH_CACHE_SIZE', 10000)
+AUTH_CACHE_TTL = getattr(settings, 'GAME_AUTH_CACHE_TTL', 30)
+AUTH_CACHE_ALIAS = getattr(settings, 'GAME_AUTH_CACHE_ALIAS', None)
+
+
+class TTLCache:
+    """LRU محدود با انقضای زمانی؛ thread-safe"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# user_id -> (user, profile_id)
+_users = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+# token key -> (token, user_id)
+_tokens = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
+
+def _shared():
+    return caches[AUTH_CACHE_ALIAS] if AUTH_CACHE_ALIAS else None
+
+
+def _get(local, prefix, key):
+    value = local.get(key)
+    if value is None and AUTH_CACHE_ALIAS:
+        value = _shared().get(f'game:auth:{prefix}:{key}')
+        if value is not None:
+            local.set(key, value)
+    return value
+
+
+def _set(local, prefix, key, value):
+    local.set(key, value)
+    if AUTH_CACHE_ALIAS:
+        _shared().set(f'game:auth:{prefix}:{key}', value, AUTH_CACHE_TTL)
+
+
+def _delete(local, prefix, key):
+    local.delete(key)
+    if AUTH_CACHE_ALIAS:
+        _shared().delete(f'game:auth:{prefix}:{key}')
+
+
+def invalidate_user(user_id):
+    _delete(_users, 'user', user_id)
+
+
+def invalidate_token(key):
+    _delete(_tokens, 'token', key)
+
+
+def clear_auth_cache():
+    _users.clear()
+    _tokens.clear()
+
+
+def _attach(user, profile_id):
+    # هر درخواست یک کپی می‌گیرد تا تغییرات روی شیء کش‌شده اثر نگذارد
+    user = copy.copy(user)
+    user._game_profile_id = profile_id
+    return user
+
+
+def _load_user(user_id, user=None):
+    """
+    خواندن کاربر و شناسهٔ پروفایل از کش یا دیتابیس
+    اگر user تازه از دیتابیس داده شود، جایگزین نسخهٔ کش‌شده می‌شود
+    """
+    entry = _get(_users, 'user', user_id) if user is None else None
+    if entry is None:
+        if user is None:
+            user = User.objects.filter(pk=user_id).first()
+            if user is None:
+                return None
+        profile_id = PlayerProfile.objects.filter(user_id=user_id).values_list('id', flat=True).first()
+        entry = (user, profile_id)
+        _set(_users, 'user', user_id, entry)
+    return _attach(*entry)
+
+
+def get_profile_id(user):
+    """شناسهٔ پروفایل کاربر؛ اگر احراز هویت کش‌شده آن را داشته باشد بدون کوئری"""
+    profile_id = getattr(user, '_game_profile_id', None)
+    if profile_id is None:
+        profile_id = user.profile.pk
+    return profile_id
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """همان TokenAuthentication با کش توکن و کاربر"""
+
+    def authenticate_credentials(self, key):
+        entry = _get(_tokens, 'token', key)
+        if entry is None:
+            try:
+                token = Token.objects.select_related('user').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            user = _load_user(token.user_id, token.user)
+            token = copy.copy(token)
+            token._state.fields_cache.pop('user', None)
+            entry = (token, token.user_id)
+            _set(_tokens, 'token', key, entry)
+        else:
+            token, user_id = entry
+            user = _load_user(user_id)
+            if user is None:
+                invalidate_token(key)
+                raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (user, token)
+
+
+def get_session_user(request):
+    """
+    جایگزین django.contrib.auth.get_user با کش؛ بررسی hash سشن مثل خود Django انجام می‌شود
+    و در هر حالت مشکوک (عدم تطابق hash، backend ناشناخته) به مسیر اصلی Django سپرده می‌شود.
+    """
+    session = request.session
+    try:
+        user_id = User._meta.pk.to_python(session[SESSION_KEY])
+        backend_path = session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+
+    user = _cached_session_user(user_id, backend_path, session.get(HASH_SESSION_KEY))
+    if user is not None:
+        return user
+
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        user = _load_user(user.pk, user)
+        user.backend = backend_path
+    return user
+
+
+def _cached_session_user(user_id, backend_path, session_hash):
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return None
+    entry = _get(_users, 'user', user_id)
+    if entry is None:
+        return None
+    user = _attach(*entry)
+    if session_hash and constant_time_compare(session_hash, user.get_session_auth_hash()):
+        user.backend = backend_path
+        return user
+    return None
+
+
+async def aget_session_user(request):
+    """
+    نسخهٔ async از get_session_user؛ وقتی کاربر در کش باشد بدون رفتن به thread
+    (سشن cached_db هم با API async خود Django خوانده می‌شود)
+    """
+    session = request.session
+    user_id = await session.aget(SESSION_KEY)
+    backend_path = await session.aget(BACKEND_SESSION_KEY)
+    if user_id is None or backend_path is None:
+        return AnonymousUser()
+    user = _cached_session_user(
+        User._meta.pk.to_python(user_id), backend_path, await session.aget(HASH_SESSION_KEY))
+    if user is not None:
+        return user
+    return await sync_to_async(get_session_user)(request)
+
+
+async def aauthenticate(request):
+    """
+    احراز هویت برای viewهای async (بیرون از DRF): اول توکن، بعد سشن
+    در صورت توکن نامعتبر AuthenticationFailed می‌دهد
+    """
+    auth_header = get_authorization_header(request).split()
+    if not auth_header or auth_header[0].lower() != b'token':
+        return await aget_session_user(request)
+
+    if len(auth_header) != 2:
+        raise exceptions.AuthenticationFailed(_('Invalid token header.'))
+    try:
+        key = auth_header[1].decode()
+    except UnicodeError:
+        raise exceptions.AuthenticationFailed(_('Invalid token header.'))
+
+    entry = _get(_tokens, 'token', key)
+    if entry is not None:
+        cached = _get(_users, 'user', entry[1])
+        if cached is not None and cached[0].is_active:
+            return _attach(*cached)
+    user, _token = await sync_to_async(CachedTokenAuthentication().authenticate_credentials)(key)
+    return user
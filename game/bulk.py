@@ -0,0 +1,216 @@
+"""
+actionهای گروهی ادمین به صورت set-based و تکه‌تکه (chunked)
+
+هر action روی تکه‌های CHUNK_SIZE تایی از pkهای queryset اجرا می‌شود (صفحه‌بندی
+keyset روی pk) و هر تکه یک تراکنش کوتاه با چند UPDATE/INSERT گروهی است؛ هیچ
+ردیفی جداگانه save نمی‌شود. انتخاب‌های بزرگ‌تر از BACKGROUND_THRESHOLD در یک
+thread پس‌زمینه اجرا می‌شوند و پیشرفتشان در BulkJob (صفحهٔ ادمین «عملیات‌های
+گروهی») ثبت می‌شود تا درخواست ادمین timeout نشود.
+
+انتخاب به صورت بازه‌های پیوستهٔ pk (JSON) و آخرین pk هر تکه همراه با تغییرات
+همان تکه در BulkJob ذخیره می‌شوند؛ pkها فقط بزرگ می‌شوند، پس ردیف‌های بعدی هیچ‌وقت
+داخل این بازه‌ها نمی‌افتند و بازه‌ها دقیقاً همان انتخاب‌اند. اگر پروسه وسط کار بسته شود (مثلاً restart شدن worker)، job در وضعیت
+RUNNING می‌ماند و بعد از STALE_AFTER ثانیه بدون پیشرفت، دستور resume_bulk_jobs
+یا action «ادامهٔ عملیات» در ادمین آن را از تکهٔ بعدی ادامه می‌دهد. actionها
+idempotent هستند، پس اجرای دوبارهٔ یک تکه ضرری ندارد.
+"""
+import datetime
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import bump_profile_version
+from .events import MARKET_CHANNEL, publish
+from .inventory import record_many_card_changes
+from .models import BulkJob, MarketListing, PlayerProfile, UserCard
+
+CHUNK_SIZE = getattr(settings, 'GAME_BULK_CHUNK_SIZE', 1000)
+BACKGROUND_THRESHOLD = getattr(settings, 'GAME_BULK_BACKGROUND_THRESHOLD', 5000)
+STALE_AFTER = getattr(settings, 'GAME_BULK_STALE_AFTER', 300)
+
+
+def cancel_listings(pks):
+    """غیرفعال کردن آگهی‌های فعال و آزاد کردن کارت‌هایشان؛ خروجی تعداد آگهی‌های لغوشده"""
+    listings = list(MarketListing.objects.select_for_update().filter(pk__in=pks, is_active=True)
+                    .order_by('pk').values_list('pk', 'card_instance_id', 'seller_id'))
+    if not listings:
+        return 0
+
+    MarketListing.objects.filter(pk__in=[pk for pk, _, _ in listings]).update(is_active=False)
+    UserCard.objects.filter(pk__in=[card_id for _, card_id, _ in listings]).update(is_listed_in_market=False)
+
+    # کارت آگهی فعال همیشه مال فروشنده است
+    changes = {}
+    for _, card_id, seller_id in listings:
+        changes.setdefault(seller_id, []).append(card_id)
+    record_many_card_changes(changes)
+    bump_profile_version(*PlayerProfile.objects.filter(pk__in=changes).values_list('user_id', flat=True))
+    for pk, _, _ in listings:
+        publish(MARKET_CHANNEL, 'listing_removed', {'listing_id': pk})
+    return len(listings)
+
+
+def recalculate_mining_rates(pks):
+    """محاسبهٔ مجدد current_mining_rate با یک SELECT و یک UPDATE؛ خروجی تعداد نرخ‌های تغییرکرده"""
+    rows = PlayerProfile.objects.filter(pk__in=pks).values_list(
+        'pk', 'user_id', 'level', 'current_mining_rate',
+        'slot_1__template__mining_rate', 'slot_2__template__mining_rate', 'slot_3__template__mining_rate')
+    changed = []
+    user_ids = []
+    for pk, user_id, level, current, *slot_rates in rows:
+        rate = PlayerProfile.rate_for(sum(filter(None, slot_rates)), level)
+        if rate != current:
+            changed.append(PlayerProfile(pk=pk, current_mining_rate=rate))
+            user_ids.append(user_id)
+    if changed:
+        PlayerProfile.objects.bulk_update(changed, ['current_mining_rate'])
+        bump_profile_version(*user_ids)
+    return len(changed)
+
+
+ACTIONS = {
+    'cancel_listings': cancel_listings,
+    'recalculate_mining_rates': recalculate_mining_rates,
+}
+
+
+def iter_pk_chunks(queryset, size=None):
+    """pkهای queryset در تکه‌های مرتب؛ keyset روی pk، پس تغییر ردیف‌ها وسط کار ترتیب را به هم نمی‌زند"""
+    size = size or CHUNK_SIZE
+    queryset = queryset.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        chunk = list((queryset if last is None else queryset.filter(pk__gt=last))[:size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def pk_ranges(queryset):
+    """pkهای queryset به صورت بازه‌های پیوستهٔ [اول، آخر]، مرتب و قابل ذخیره در JSON"""
+    ranges = []
+    for pk in queryset.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=CHUNK_SIZE):
+        if ranges and pk == ranges[-1][1] + 1:
+            ranges[-1][1] = pk
+        else:
+            ranges.append([pk, pk])
+    return ranges
+
+
+def iter_range_chunks(ranges, after=None, size=None):
+    """تکه‌های pk از بازه‌ها، فقط بعد از after؛ بدون کوئری، ردیف‌های حذف‌شده را action خودش رد می‌کند"""
+    size = size or CHUNK_SIZE
+    chunk = []
+    for first, last in ranges:
+        pk = first if after is None else max(first, after + 1)
+        while pk <= last:
+            end = min(last, pk + size - len(chunk) - 1)
+            chunk.extend(range(pk, end + 1))
+            pk = end + 1
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_action(action, queryset, progress=None):
+    """اجرای همزمان action روی کل queryset؛ خروجی تعداد ردیف‌های تغییرکرده"""
+    return run_chunks(action, iter_pk_chunks(queryset), progress)
+
+
+def run_chunks(action, chunks, progress=None):
+    """
+    اجرای action روی تکه‌های pk، هر تکه در یک تراکنش
+    progress(processed, affected, last_pk) داخل تراکنش هر تکه صدا زده می‌شود تا
+    checkpoint همراه با تغییرات همان تکه commit شود
+    """
+    func = ACTIONS[action]
+    affected = 0
+    for chunk in chunks:
+        with transaction.atomic():
+            changed = func(chunk)
+            if progress is not None:
+                progress(len(chunk), changed, chunk[-1])
+        affected += changed
+    return affected
+
+
+def submit(action, queryset, user=None, total=None):
+    """ساخت BulkJob با بازه‌های pk انتخاب و اجرای آن در پس‌زمینه بعد از commit تراکنش فعلی"""
+    if action not in ACTIONS:
+        raise ValueError(f'action ناشناخته: {action}')
+    ranges = pk_ranges(queryset)
+    job = BulkJob.objects.create(
+        action=action, created_by=user, selection=ranges,
+        total=sum(last - first + 1 for first, last in ranges) if total is None else total)
+    transaction.on_commit(lambda: start_thread(job.pk))
+    return job
+
+
+def stale_jobs(stale_after=None):
+    """jobهای در صف یا در حال اجرایی که STALE_AFTER ثانیه پیشرفتی نداشته‌اند (پروسه‌شان مرده)"""
+    cutoff = timezone.now() - datetime.timedelta(seconds=STALE_AFTER if stale_after is None else stale_after)
+    return BulkJob.objects.filter(status__in=('PENDING', 'RUNNING'), updated_at__lt=cutoff,
+                                  selection__isnull=False)
+
+
+def resumable_jobs(stale_after=None):
+    """jobهایی که می‌شود ادامه داد: خطاخورده یا رهاشده"""
+    return (BulkJob.objects.filter(status='FAILED', selection__isnull=False)
+            | stale_jobs(stale_after))
+
+
+def claim(job_id, jobs):
+    """
+    برگرداندن job به صف اگر هنوز در jobs باشد؛ با یک UPDATE شرطی، پس دو پروسه
+    هم‌زمان یک job را برنمی‌دارند. خروجی True اگر job مال این پروسه شد.
+    """
+    return bool(jobs.filter(pk=job_id).update(status='PENDING', error='', finished_at=None,
+                                              updated_at=timezone.now()))
+
+
+def retry(job_id):
+    """ادامهٔ یک job خطاخورده یا رهاشده در پس‌زمینه بعد از commit؛ خروجی False اگر قابل ادامه نبود"""
+    if not claim(job_id, resumable_jobs()):
+        return False
+    transaction.on_commit(lambda: start_thread(job_id))
+    return True
+
+
+def start_thread(job_id):
+    thread = threading.Thread(target=_work, args=(job_id,), name=f'bulk-job-{job_id}', daemon=True)
+    thread.start()
+    return thread
+
+
+def _work(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        # اتصال‌های این thread خودکار بسته نمی‌شوند
+        connections.close_all()
+
+
+def run_job(job_id):
+    """اجرای همزمان job از آخرین checkpoint"""
+    jobs = BulkJob.objects.filter(pk=job_id)
+    job = jobs.get()
+    now = timezone.now()
+    jobs.update(status='RUNNING', started_at=job.started_at or now, updated_at=now)
+
+    def progress(processed, affected, last_pk):
+        jobs.update(processed=F('processed') + processed, affected=F('affected') + affected,
+                    last_pk=last_pk, updated_at=timezone.now())
+
+    try:
+        run_chunks(job.action, iter_range_chunks(job.selection, job.last_pk), progress)
+    except Exception as exc:
+        jobs.update(status='FAILED', error=f'{type(exc).__name__}: {exc}', finished_at=timezone.now(),
+                    updated_at=timezone.now())
+        raise
+    jobs.update(status='DONE', finished_at=timezone.now(), updated_at=timezone.now())
@@ -0,0 +1,103 @@
+"""
+کش نسخه‌دار پروفایل بازیکن
+
+هر بازیکن یک شمارهٔ نسخه در کش دارد و payload پروفایل با همان نسخه ذخیره می‌شود.
+هر view که پروفایل را تغییر می‌دهد نسخه را بالا می‌برد، پس payload قبلی
+خودبه‌خود کنار گذاشته می‌شود و نیازی به پاک کردن دستی کلیدها نیست.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+PROFILE_CACHE_TIMEOUT = getattr(settings, 'GAME_PROFILE_CACHE_TIMEOUT', 300)
+# صفر یعنی کش خلاصهٔ کلکسیون غیرفعال است
+COLLECTION_SUMMARY_CACHE_TIMEOUT = getattr(settings, 'GAME_COLLECTION_SUMMARY_CACHE_TIMEOUT', 300)
+
+
+def _version_key(user_id):
+    return f'game:profile:ver:{user_id}'
+
+
+def _payload_key(user_id, version):
+    return f'game:profile:data:{user_id}:{version}'
+
+
+def get_profile_version(user_id):
+    """نسخهٔ فعلی پروفایل؛ اگر در کش نبود یک نسخهٔ تازه ساخته می‌شود"""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # نسخهٔ جدید بر پایهٔ زمان است تا با payloadهای قدیمی‌ای که هنوز
+        # در کش مانده‌اند (بعد از evict شدن کلید نسخه) برخورد نکند.
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+async def aget_profile_version(user_id):
+    """نسخهٔ async از get_profile_version (برای viewهای async)"""
+    key = _version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(key, version, None):
+            version = await cache.aget(key, version)
+    return version
+
+
+def bump_profile_version(*user_ids):
+    """
+    بالا بردن نسخهٔ پروفایل بعد از commit شدن تراکنش فعلی
+    (بیرون از تراکنش، بلافاصله اجرا می‌شود)
+    """
+    def _bump():
+        for user_id in user_ids:
+            key = _version_key(user_id)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, time.time_ns(), None)
+
+    transaction.on_commit(_bump)
+
+
+def profile_etag(user_id, version):
+    return f'"p{user_id}-{version}"'
+
+
+def get_cached_profile(user_id, version):
+    return cache.get(_payload_key(user_id, version))
+
+
+def set_cached_profile(user_id, version, data):
+    cache.set(_payload_key(user_id, version), data, PROFILE_CACHE_TIMEOUT)
+
+
+async def aget_cached_profile(user_id, version):
+    return await cache.aget(_payload_key(user_id, version))
+
+
+async def aset_cached_profile(user_id, version, data):
+    await cache.aset(_payload_key(user_id, version), data, PROFILE_CACHE_TIMEOUT)
+
+
+# --- خلاصهٔ کلکسیون ---
+# کلید با inventory_seq ساخته می‌شود؛ هر تغییر در کارت‌ها شمارنده را بالا می‌برد
+# و کلید قبلی دیگر خوانده نمی‌شود.
+
+def _summary_key(profile_id, inventory_seq):
+    return f'game:collection:{profile_id}:{inventory_seq}'
+
+
+def get_cached_collection_summary(profile_id, inventory_seq):
+    if not COLLECTION_SUMMARY_CACHE_TIMEOUT:
+        return None
+    return cache.get(_summary_key(profile_id, inventory_seq))
+
+
+def set_cached_collection_summary(profile_id, inventory_seq, data):
+    if COLLECTION_SUMMARY_CACHE_TIMEOUT:
+        cache.set(_summary_key(profile_id, inventory_seq), data, COLLECTION_SUMMARY_CACHE_TIMEOUT)
@@ -0,0 +1,94 @@
+"""
+کاتالوگ ثابت بازی: تمپلیت کارت‌ها، پک‌ها و آواتارها
+
+کاتالوگ یک بار ساخته و در حافظهٔ پروسه نگه داشته می‌شود. نسخهٔ آن hash محتوای
+خودش است، پس URL نسخه‌دار را می‌توان برای همیشه کش کرد. تغییر این مدل‌ها
+(مثلاً ذخیره در ادمین) شمارهٔ نسل را در کش مشترک بالا می‌برد تا همهٔ پروسه‌ها
+کاتالوگ را دوباره بسازند.
+"""
+import hashlib
+import json
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import CardTemplate, Pack, Avatar
+from .serializers import CardTemplateSerializer, PackSerializer, AvatarSerializer
+
+_GENERATION_KEY = 'game:catalog:gen'
+
+_lock = threading.Lock()
+_catalog = None
+
+
+def catalog_generation():
+    """شمارهٔ نسل فعلی کاتالوگ (در کش مشترک)"""
+    generation = cache.get(_GENERATION_KEY)
+    if generation is None:
+        # مثل نسخهٔ پروفایل: بعد از evict شدن، عدد جدید بر پایهٔ زمان ساخته می‌شود
+        generation = time.time_ns()
+        if not cache.add(_GENERATION_KEY, generation, None):
+            generation = cache.get(_GENERATION_KEY, generation)
+    return generation
+
+
+async def acatalog_generation():
+    generation = await cache.aget(_GENERATION_KEY)
+    if generation is None:
+        generation = time.time_ns()
+        if not await cache.aadd(_GENERATION_KEY, generation, None):
+            generation = await cache.aget(_GENERATION_KEY, generation)
+    return generation
+
+
+def invalidate_catalog():
+    """بی‌اعتبار کردن کاتالوگ بعد از commit شدن تراکنش فعلی"""
+    def _invalidate():
+        global _catalog
+        try:
+            cache.incr(_GENERATION_KEY)
+        except ValueError:
+            cache.set(_GENERATION_KEY, time.time_ns(), None)
+        _catalog = None
+
+    transaction.on_commit(_invalidate)
+
+
+def build_catalog():
+    data = {
+        'templates': CardTemplateSerializer(CardTemplate.objects.order_by('id'), many=True).data,
+        'packs': PackSerializer(Pack.objects.order_by('id'), many=True).data,
+        'avatars': AvatarSerializer(Avatar.objects.order_by('id'), many=True).data,
+    }
+    encoded = json.dumps(data, cls=JSONEncoder, sort_keys=True, separators=(',', ':'))
+    data['version'] = hashlib.sha256(encoded.encode()).hexdigest()[:16]
+    return data
+
+
+def get_catalog():
+    """کاتالوگ فعلی؛ فقط وقتی نسل عوض شده باشد دوباره از دیتابیس ساخته می‌شود"""
+    global _catalog
+    generation = catalog_generation()
+    current = _catalog
+    if current is not None and current[0] == generation:
+        return current[1]
+
+    with _lock:
+        if _catalog is not None and _catalog[0] == generation:
+            return _catalog[1]
+        data = build_catalog()
+        _catalog = (generation, data)
+        return data
+
+
+async def aget_catalog():
+    """نسخهٔ async از get_catalog؛ فقط ساختن دوبارهٔ کاتالوگ به thread می‌رود"""
+    generation = await acatalog_generation()
+    current = _catalog
+    if current is not None and current[0] == generation:
+        return current[1]
+    return await sync_to_async(get_catalog)()
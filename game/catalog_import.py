@@ -0,0 +1,223 @@
+"""
+import گروهی کاتالوگ (تمپلیت کارت‌ها و پک‌ها) از فایل CSV یا JSONL
+
+فایل ردیف به ردیف خوانده می‌شود و ردیف‌ها در batchهای ثابت پردازش می‌شوند، پس
+حافظه به اندازهٔ فایل بستگی ندارد. هر ردیف با ستون/کلید type نوعش را مشخص
+می‌کند ('template' یا 'pack') و با name شناخته می‌شود (نام یکتاست):
+
+    type,name,rarity,mining_rate,max_supply,image,price,card_count,chance_common,...
+    template,Ash Knight,EPIC,8,500,cards/ash_knight.png,,,,
+    pack,Starter,,,,packs/starter.png,100,5,60,...
+
+    {"type": "pack", "name": "Starter", "price": 100, "chance_common": 60, ...}
+
+ستون‌های خالی یا کلیدهای غایب مقدار فعلی ردیف موجود را نگه می‌دارند (برای ردیف
+جدید پیش‌فرض مدل). هر batch با یک SELECT مقایسه و با یک
+bulk_create(update_conflicts=True) upsert می‌شود؛ ردیف‌های بدون تغییر نوشته
+نمی‌شوند. اگر نامی چند بار در فایل بیاید، آخرین ردیف برنده است.
+"""
+import csv
+import json
+
+from .models import CardTemplate, Pack
+
+# نوع -> (مدل، {فیلد: تبدیل}، فیلدهای لازم برای ردیف جدید)
+KINDS = {
+    'template': (CardTemplate, {
+        'rarity': str,
+        'mining_rate': int,
+        'max_supply': int,
+        'image': str,
+    }, ('max_supply', 'image')),
+    'pack': (Pack, {
+        'price': int,
+        'currency_type': str,
+        'card_count': int,
+        'description': str,
+        'image': str,
+        'chance_common': int,
+        'chance_rare': int,
+        'chance_epic': int,
+        'chance_legendary': int,
+    }, ('price', 'image')),
+}
+CHANCE_FIELDS = ('chance_common', 'chance_rare', 'chance_epic', 'chance_legendary')
+RARITIES = {rarity for rarity, _ in CardTemplate.RARITY_CHOICES}
+CURRENCIES = {currency for currency, _ in Pack.CURRENCY_CHOICES}
+NAME_LENGTH = 100
+# بیشتر از این تعداد خطا نگه داشته نمی‌شود (فقط شمرده می‌شود)
+MAX_ERRORS = 100
+
+
+def detect_format(path):
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_records(fp, fmt):
+    """(شمارهٔ خط، دیکشنری) برای هر ردیف؛ خط‌های خالی رد می‌شوند"""
+    if fmt == 'csv':
+        reader = csv.DictReader(fp)
+        for record in reader:
+            # مقدار خالی در CSV یعنی «تغییر نده»
+            yield reader.line_num, {key: value for key, value in record.items()
+                                    if key and value is not None and value.strip() != ''}
+        return
+    for line_no, line in enumerate(fp, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield line_no, ValueError(f'JSON نامعتبر: {exc}')
+            continue
+        if not isinstance(record, dict):
+            yield line_no, ValueError('هر خط باید یک آبجکت JSON باشد.')
+            continue
+        yield line_no, {key: value for key, value in record.items() if value is not None}
+
+
+def parse_record(record):
+    """(نوع، نام، مقادیر تبدیل‌شده)؛ ردیف نامعتبر ValueError می‌دهد"""
+    kind = str(record.get('type', '')).strip().lower()
+    if kind not in KINDS:
+        raise ValueError(f"type باید یکی از {', '.join(KINDS)} باشد.")
+    name = str(record.get('name', '')).strip()
+    if not name or len(name) > NAME_LENGTH:
+        raise ValueError(f'name خالی یا بلندتر از {NAME_LENGTH} کاراکتر است.')
+
+    _, fields, _ = KINDS[kind]
+    unknown = set(record) - set(fields) - {'type', 'name'}
+    if unknown:
+        raise ValueError(f"ستون ناشناخته برای {kind}: {', '.join(sorted(unknown))}")
+
+    values = {}
+    for field, convert in fields.items():
+        if field not in record:
+            continue
+        value = record[field]
+        try:
+            if convert is int:
+                if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+                    raise ValueError
+                value = int(value)
+                if value < 0:
+                    raise ValueError
+            else:
+                value = str(value).strip()
+        except (TypeError, ValueError):
+            raise ValueError(f'{field} باید عدد صحیح نامنفی باشد.')
+        values[field] = value
+    return kind, name, values
+
+
+def validate(kind, values, existing):
+    """بررسی مقادیر نهایی (بعد از ادغام با ردیف موجود)"""
+    if kind == 'template':
+        if values['rarity'] not in RARITIES:
+            raise ValueError(f"rarity نامعتبر: {values['rarity']}")
+        minted = existing['minted_count'] if existing else 0
+        if values['max_supply'] < minted:
+            raise ValueError(f"max_supply ({values['max_supply']}) از تعداد ساخته‌شده ({minted}) کمتر است.")
+    else:
+        if values['currency_type'] not in CURRENCIES:
+            raise ValueError(f"currency_type نامعتبر: {values['currency_type']}")
+        if values['card_count'] < 1:
+            raise ValueError('card_count باید حداقل 1 باشد.')
+        total = sum(values[field] for field in CHANCE_FIELDS)
+        if total != 100:
+            raise ValueError(f'مجموع شانس‌ها باید 100 باشد (الان {total}).')
+
+
+class CatalogImporter:
+    """
+    ردیف‌ها را با feed می‌گیرد و هر batch_size ردیف از یک نوع را upsert می‌کند؛ در پایان finish.
+    summary: نوع -> {'created', 'updated', 'unchanged'}؛ errors: لیست (شمارهٔ خط، پیام)
+    on_change(kind, status, name, changed_fields) برای هر ردیف جدید/تغییرکرده صدا زده می‌شود.
+    """
+
+    def __init__(self, batch_size=500, dry_run=False, on_change=None):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.on_change = on_change
+        self.summary = {kind: {'created': 0, 'updated': 0, 'unchanged': 0} for kind in KINDS}
+        self.errors = []
+        self.error_count = 0
+        self._pending = {kind: {} for kind in KINDS}
+
+    def error(self, line_no, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line_no, message))
+
+    def feed(self, line_no, record):
+        if isinstance(record, Exception):
+            self.error(line_no, str(record))
+            return
+        try:
+            kind, name, values = parse_record(record)
+        except ValueError as exc:
+            self.error(line_no, str(exc))
+            return
+        pending = self._pending[kind]
+        # آخرین ردیف با همین نام برنده است (ولی مقادیر قبلی‌اش در همین batch حفظ می‌شوند)
+        previous = pending.pop(name, (None, {}))[1]
+        pending[name] = (line_no, {**previous, **values})
+        if len(pending) >= self.batch_size:
+            self._flush(kind)
+
+    def finish(self):
+        for kind in KINDS:
+            self._flush(kind)
+        return self.summary
+
+    @property
+    def changed(self):
+        return any(counts['created'] or counts['updated'] for counts in self.summary.values())
+
+    def _flush(self, kind):
+        pending, self._pending[kind] = self._pending[kind], {}
+        if not pending:
+            return
+        model, fields, required = KINDS[kind]
+        columns = ['name', *fields] + (['minted_count'] if model is CardTemplate else [])
+        existing = {row['name']: row for row in model.objects.filter(name__in=pending).values(*columns)}
+        defaults = {field: model._meta.get_field(field).get_default() for field in fields}
+
+        objects = []
+        for name, (line_no, values) in pending.items():
+            before = existing.get(name)
+            if before is None:
+                missing = [field for field in required if field not in values]
+                if missing:
+                    self.error(line_no, f"{name}: برای {kind} جدید لازم است: {', '.join(missing)}")
+                    continue
+            merged = {field: (before or defaults)[field] for field in fields}
+            merged.update(values)
+            try:
+                validate(kind, merged, before)
+            except ValueError as exc:
+                self.error(line_no, f'{name}: {exc}')
+                continue
+
+            changed = [field for field in fields if before is not None and before[field] != merged[field]]
+            status = 'created' if before is None else 'updated' if changed else 'unchanged'
+            self.summary[kind][status] += 1
+            if status == 'unchanged':
+                continue
+            if self.on_change is not None:
+                self.on_change(kind, status, name, changed)
+            objects.append(model(name=name, **merged))
+
+        if objects and not self.dry_run:
+            model.objects.bulk_create(objects, update_conflicts=True, unique_fields=['name'],
+                                      update_fields=list(fields))
+
+
+def import_catalog(records, batch_size=500, dry_run=False, on_change=None):
+    """import کامل از iterable ردیف‌های read_records؛ خروجی CatalogImporter (summary و errors)"""
+    importer = CatalogImporter(batch_size, dry_run, on_change)
+    for line_no, record in records:
+        importer.feed(line_no, record)
+    importer.finish()
+    return importer
@@ -0,0 +1,129 @@
+"""
+رویدادهای لحظه‌ای (push) برای بازار و موجودی بازیکن‌ها
+
+viewهای تغییردهنده بعد از commit یک رویداد روی کانال منتشر می‌کنند و endpoint
+SSE (async_views.event_stream) آن را به کلاینت‌های وصل می‌فرستد، پس کلاینت‌ها
+دیگر لازم نیست market_feed و profile/me را مرتب poll کنند.
+
+کانال‌ها:
+    market          عمومی؛ listing_created، listing_sold و listing_removed (لغو توسط ادمین)
+    player:<user>   خصوصی؛ balance بعد از هر تغییر موجودی
+
+LocalBroker داخل پروسه است و فقط به کلاینت‌های وصل به همان پروسه می‌رسد. برای
+چند worker یک broker مشترک (مثلاً روی Redis pub/sub) با همان دو متد publish و
+subscribe بنویسید و مسیرش را در GAME_EVENT_BROKER بگذارید.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+MARKET_CHANNEL = 'market'
+EVENT_QUEUE_SIZE = getattr(settings, 'GAME_EVENT_QUEUE_SIZE', 100)
+
+
+def player_channel(user_id):
+    return f'player:{user_id}'
+
+
+class Subscription:
+    """صف رویدادهای یک اتصال؛ push از هر threadی قابل فراخوانی است"""
+
+    def __init__(self, broker, channels, loop, maxsize):
+        self.broker = broker
+        self.channels = channels
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+
+    def push(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # event loop این اتصال بسته شده است
+            self.close()
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # کلاینت کند؛ رویداد دور ریخته می‌شود و کلاینت با REST همگام می‌شود
+            pass
+
+    async def get(self, timeout=None):
+        """رویداد بعدی، یا None اگر تا timeout ثانیه چیزی نرسید"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LocalBroker:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.push(event)
+
+    def subscribe(self, channels):
+        """باید داخل event loop صدا زده شود"""
+        subscription = Subscription(self, tuple(channels), asyncio.get_running_loop(), EVENT_QUEUE_SIZE)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'GAME_EVENT_BROKER', 'game.events.LocalBroker')
+                _broker = import_string(path)()
+    return _broker
+
+
+def publish(channel, event_type, data):
+    """انتشار رویداد بعد از commit شدن تراکنش فعلی (بیرون از تراکنش، بلافاصله)"""
+    event = {'type': event_type, 'data': data}
+    transaction.on_commit(lambda: get_broker().publish(channel, event))
+
+
+def publish_balance(profile):
+    publish(player_channel(profile.user_id), 'balance', {
+        'coins': profile.coins,
+        'gems': profile.gems,
+        'vow_fragments': profile.vow_fragments,
+        'level': profile.level,
+        'xp': profile.xp,
+    })
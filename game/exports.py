@@ -0,0 +1,174 @@
+"""
+خروجی استریمی جدول‌های بازیکن، کارت و بازار برای تحلیل و پشتیبانی
+
+ردیف‌ها با values_list(...).iterator(chunk_size) خوانده می‌شوند (در PostgreSQL یعنی
+cursor سمت سرور) و خط به خط به CSV یا JSONL تبدیل و در تکه‌های چند کیلوبایتی
+(اختیاری با gzip) تحویل داده می‌شوند؛ پس حافظه به اندازهٔ جدول بستگی ندارد.
+
+ستون‌ها و نوعشان ثابت است (عدد، bool، رشته و زمان ISO 8601 به UTC)، پس خروجی را
+می‌توان مستقیم با pyarrow/duckdb/pandas خواند و به Parquet تبدیل کرد. دستور
+export_data و endpoint ادمین /api/game/export/<dataset>.<csv|jsonl>[.gz] از همین
+ماژول استفاده می‌کنند. خروجی کامل جدول‌های بزرگ کار دستور export_data است؛ endpoint
+یک worker وب را تا پایان دانلود نگه می‌دارد، پس هر درخواستش حداکثر
+EXPORT_PAGE_SIZE ردیف برمی‌گرداند و صفحهٔ بعد با after (آخرین pk) گرفته می‌شود.
+"""
+import csv
+import datetime
+import zlib
+
+from django.conf import settings
+from rest_framework.utils import encoders
+
+from .models import MarketListing, PlayerProfile, UserCard
+from .renderers import FastJSONRenderer
+from .streaming import STREAM_BUFFER_BYTES, STREAM_CHUNK_SIZE
+
+# نام -> (مدل، [(ستون خروجی، lookup)])؛ ایمیل و رمز عمداً خروجی گرفته نمی‌شوند
+DATASETS = {
+    'players': (PlayerProfile, [
+        ('id', 'id'),
+        ('user_id', 'user_id'),
+        ('username', 'user__username'),
+        ('date_joined', 'user__date_joined'),
+        ('level', 'level'),
+        ('xp', 'xp'),
+        ('coins', 'coins'),
+        ('gems', 'gems'),
+        ('vow_fragments', 'vow_fragments'),
+        ('current_mining_rate', 'current_mining_rate'),
+        ('last_claim_time', 'last_claim_time'),
+        ('slot_1_id', 'slot_1_id'),
+        ('slot_2_id', 'slot_2_id'),
+        ('slot_3_id', 'slot_3_id'),
+    ]),
+    'cards': (UserCard, [
+        ('id', 'id'),
+        ('owner_id', 'owner_id'),
+        ('template_id', 'template_id'),
+        ('template_name', 'template__name'),
+        ('rarity', 'template__rarity'),
+        ('serial_number', 'serial_number'),
+        ('is_listed_in_market', 'is_listed_in_market'),
+        ('obtained_at', 'obtained_at'),
+    ]),
+    'trades': (MarketListing, [
+        ('id', 'id'),
+        ('seller_id', 'seller_id'),
+        ('seller_username', 'seller__user__username'),
+        ('card_id', 'card_instance_id'),
+        ('template_id', 'card_instance__template_id'),
+        ('template_name', 'card_instance__template__name'),
+        ('price', 'price'),
+        ('is_active', 'is_active'),
+        ('created_at', 'created_at'),
+    ]),
+}
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+GZIP_CONTENT_TYPE = 'application/gzip'
+EXPORT_PAGE_SIZE = getattr(settings, 'GAME_EXPORT_PAGE_SIZE', 50000)
+
+_drf_encoder = encoders.JSONEncoder()
+
+
+def columns(dataset):
+    return [column for column, _ in DATASETS[dataset][1]]
+
+
+def _rows_queryset(dataset, after=None):
+    model = DATASETS[dataset][0]
+    queryset = model.objects.order_by('pk')
+    return queryset if after is None else queryset.filter(pk__gt=after)
+
+
+def iter_rows(dataset, chunk_size=None, after=None, limit=None):
+    """
+    تاپل‌های ردیف به ترتیب pk، با cursor سمت سرور و بدون کش queryset
+    after/limit برای صفحه‌بندی keyset: حداکثر limit ردیف با pk بزرگ‌تر از after
+    """
+    queryset = _rows_queryset(dataset, after).values_list(*(lookup for _, lookup in DATASETS[dataset][1]))
+    if limit is not None:
+        queryset = queryset[:limit]
+    return queryset.iterator(chunk_size=chunk_size or STREAM_CHUNK_SIZE)
+
+
+def next_after(dataset, after, limit):
+    """pk آخرین ردیف صفحه اگر بعد از آن ردیف دیگری باشد (after صفحهٔ بعد)، وگرنه None"""
+    pks = list(_rows_queryset(dataset, after).values_list('pk', flat=True)[limit - 1:limit + 1])
+    return pks[0] if len(pks) == 2 else None
+
+
+class _Echo:
+    """فایل شبه‌نوشتنی برای csv.writer که خط نوشته‌شده را برمی‌گرداند"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, datetime.datetime):
+        # همان فرمت JSON (…Z)
+        return _drf_encoder.default(value)
+    return value
+
+
+def _buffered(lines):
+    buffer = bytearray()
+    for line in lines:
+        buffer += line
+        if len(buffer) >= STREAM_BUFFER_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def encode(header, rows, fmt):
+    """بایت‌های خروجی CSV (با سطر عنوان) یا JSONL در تکه‌های حدوداً STREAM_BUFFER_BYTES"""
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        lines = (writer.writerow([_csv_value(value) for value in row]).encode() for row in rows)
+        return _buffered(_prepend(writer.writerow(header).encode(), lines))
+    if fmt == 'jsonl':
+        render = FastJSONRenderer().render
+        return _buffered(render(dict(zip(header, row))) + b'\n' for row in rows)
+    raise ValueError(f'فرمت ناشناخته: {fmt}')
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+
+def gzip_chunks(chunks, level=6):
+    """فشرده‌سازی استریمی به فرمت gzip (wbits=31)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export(dataset, fmt='csv', compress=False, chunk_size=None, rows=None, after=None, limit=None):
+    """
+    تکه‌های بایت خروجی یک dataset (بدون after/limit کل جدول)
+    rows اختیاری است (مثلاً iter_rows پیچیده‌شده برای شمردن ردیف‌ها)
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f'dataset ناشناخته: {dataset}')
+    if rows is None:
+        rows = iter_rows(dataset, chunk_size, after, limit)
+    chunks = encode(columns(dataset), rows, fmt)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def filename(dataset, fmt, compress=False):
+    return f"{dataset}.{fmt}{'.gz' if compress else ''}"
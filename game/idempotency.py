@@ -0,0 +1,139 @@
+"""
+کلیدهای idempotency برای endpointهای تغییردهنده
+
+کلاینت برای هر عمل منطقی (باز کردن پک، خرید، ...) یک هدر Idempotency-Key یکتا
+می‌فرستد و در تلاش‌های دوباره همان را تکرار می‌کند. اولین درخواست یک ردیف
+«در حال اجرا» ثبت می‌کند و پاسخش را در همان ردیف ذخیره می‌کند؛ تکرارها بدون
+دست زدن به جدول‌های بازی از همین ردیف جواب می‌گیرند (هدر Idempotent-Replayed).
+
+    - تکرار در حالی که درخواست اصلی هنوز تمام نشده: 409
+    - همان کلید با بدنه/مسیر متفاوت: 422
+    - پاسخ‌های 5xx و exceptionها ذخیره نمی‌شوند و تغییرات view هم rollback می‌شود
+      تا تلاش دوباره واقعاً اجرا شود
+
+view و ذخیرهٔ پاسخ در یک تراکنش اجرا می‌شوند، پس یا هر دو commit می‌شوند یا
+هیچ‌کدام. ردیفی که بیش از GAME_IDEMPOTENCY_PENDING_TIMEOUT ثانیه بدون پاسخ مانده
+مال درخواستی است که وسط کار مرده (تغییراتش rollback شده) و تلاش بعدی آن را
+از نو اجرا می‌کند. هدرهای REPLAYED_HEADERS (مثل Retry-After) هم ذخیره و تکرار می‌شوند.
+
+ردیف‌ها بعد از GAME_IDEMPOTENCY_TTL ثانیه منقضی می‌شوند
+(دستور purge_idempotency_keys آن‌ها را پاک می‌کند).
+"""
+import datetime
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.utils import encoders
+
+from .models import IdempotencyRecord
+
+IDEMPOTENCY_TTL = getattr(settings, 'GAME_IDEMPOTENCY_TTL', 24 * 3600)
+PENDING_TIMEOUT = getattr(settings, 'GAME_IDEMPOTENCY_PENDING_TIMEOUT', 60)
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 64
+REPLAYED_HEADERS = ('Retry-After', 'Location')
+
+
+def expiry_cutoff():
+    return timezone.now() - datetime.timedelta(seconds=IDEMPOTENCY_TTL)
+
+
+def purge_expired():
+    """حذف ردیف‌های منقضی؛ تعداد حذف‌شده را برمی‌گرداند"""
+    deleted, _ = IdempotencyRecord.objects.filter(created_at__lt=expiry_cutoff()).delete()
+    return deleted
+
+
+def request_fingerprint(request):
+    payload = json.dumps(request.data, sort_keys=True, cls=encoders.JSONEncoder)
+    raw = f'{request.method}\n{request.path}\n{payload}'
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _claim(user, key, request_hash):
+    """ثبت ردیف در حال اجرا؛ اگر کلید قبلاً ثبت شده باشد None"""
+    try:
+        with transaction.atomic():
+            return IdempotencyRecord.objects.create(user=user, key=key, request_hash=request_hash)
+    except IntegrityError:
+        return None
+
+
+def _replay(record):
+    response = Response(record.body, status=record.status_code, headers=record.headers or None)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _abandoned(record):
+    """ردیف در حال اجرایی که درخواستش مرده است (بدون پاسخ بعد از PENDING_TIMEOUT)"""
+    return (record.status_code is None
+            and record.created_at < timezone.now() - datetime.timedelta(seconds=PENDING_TIMEOUT))
+
+
+def idempotent(view):
+    """
+    دکوریتور view؛ باید زیر api_view/permission_classes قرار بگیرد تا request.user
+    احراز هویت شده باشد. بدون هدر Idempotency-Key رفتار view تغییری نمی‌کند.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({'error': 'Idempotency-Key بیش از حد طولانی است.'}, status=400)
+
+        request_hash = request_fingerprint(request)
+        record = _claim(request.user, key, request_hash)
+        if record is None:
+            existing = IdempotencyRecord.objects.filter(user=request.user, key=key).first()
+            if existing is not None and existing.created_at < expiry_cutoff():
+                # کلید منقضی شده؛ مثل یک کلید تازه رفتار می‌کنیم
+                existing.delete()
+                existing = None
+                record = _claim(request.user, key, request_hash)
+            if record is None:
+                if existing is None or (existing.status_code is None and not _abandoned(existing)):
+                    return Response({'error': 'درخواست دیگری با همین کلید در حال اجراست.'}, status=409)
+                if existing.request_hash != request_hash:
+                    return Response(
+                        {'error': 'این Idempotency-Key قبلاً برای درخواست دیگری استفاده شده است.'},
+                        status=422)
+                if existing.status_code is not None:
+                    return _replay(existing)
+                # درخواست اصلی مرده؛ پایین‌تر زیر قفل ردیف دوباره بررسی می‌شود
+                record = existing
+
+        try:
+            with transaction.atomic():
+                # قفل ردیف تا پایان تراکنش؛ درخواست دیگری که ردیف را رهاشده فرض کند
+                # (در دیتابیس‌هایی با قفل سطری) تا commit این درخواست صبر می‌کند و پاسخ را replay می‌کند
+                locked = IdempotencyRecord.objects.select_for_update().filter(pk=record.pk).first()
+                if locked is None:
+                    return Response({'error': 'درخواست دیگری با همین کلید در حال اجراست.'}, status=409)
+                if locked.status_code is not None:
+                    return _replay(locked)
+
+                response = view(request, *args, **kwargs)
+                if response.status_code >= 500 or not isinstance(response, Response):
+                    transaction.set_rollback(True)
+                else:
+                    locked.status_code = response.status_code
+                    locked.body = json.loads(json.dumps(response.data, cls=encoders.JSONEncoder))
+                    locked.headers = {name: response[name] for name in REPLAYED_HEADERS if response.has_header(name)}
+                    locked.save(update_fields=['status_code', 'body', 'headers'])
+                    return response
+        except Exception:
+            record.delete()
+            raise
+
+        record.delete()
+        return response
+
+    return wrapper
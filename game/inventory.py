@@ -0,0 +1,98 @@
+"""
+ثبت تغییرات کارت‌ها برای همگام‌سازی افزایشی (delta sync)
+
+هر تغییر در مالکیت یا وضعیت یک UserCard با یک شمارهٔ ترتیبی مخصوص
+همان بازیکن (PlayerProfile.inventory_seq) در InventoryChange ثبت می‌شود.
+کلاینت آخرین شماره‌ای که دیده را نگه می‌دارد و فقط تغییرات بعد از آن را می‌گیرد.
+
+شماره‌های هر بازیکن پشت سر هم هستند (هر تغییر دقیقاً یک ردیف)، پس اگر
+purge_changes ردیف‌های قدیمی را پاک کرده باشد، sync جای خالی بعد از cursor
+کلاینت را از روی تعداد ردیف‌ها می‌فهمد و snapshot کامل برمی‌گرداند.
+"""
+from django.conf import settings
+from django.db.models import Case, F, When
+
+from .models import InventoryChange, PlayerProfile
+
+# تعداد تغییرات اخیر هر بازیکن که purge_inventory_changes نگه می‌دارد
+KEEP_CHANGES = getattr(settings, 'GAME_INVENTORY_CHANGES_KEEP', 1000)
+PURGE_BATCH_SIZE = 10000
+
+
+def record_card_changes(owner_id, card_ids, removed=False):
+    """
+    ثبت تغییر برای کارت‌های یک بازیکن؛ باید داخل transaction.atomic صدا زده شود.
+
+    UPDATE روی ردیف پروفایل تا پایان تراکنش قفل می‌ماند، پس شماره‌ها برای هر
+    بازیکن به ترتیب commit شدن تخصیص داده می‌شوند و هیچ تغییری پشت cursor کلاینت جا نمی‌ماند.
+    """
+    card_ids = list(card_ids)
+    if not card_ids:
+        return
+
+    PlayerProfile.objects.filter(pk=owner_id).update(
+        inventory_seq=F('inventory_seq') + len(card_ids))
+    end = PlayerProfile.objects.filter(pk=owner_id).values_list('inventory_seq', flat=True).get()
+    start = end - len(card_ids)
+
+    InventoryChange.objects.bulk_create([
+        InventoryChange(owner_id=owner_id, seq=start + offset, card_id=card_id, removed=removed)
+        for offset, card_id in enumerate(card_ids, 1)
+    ])
+
+
+def record_many_card_changes(changes, removed=False):
+    """
+    نسخهٔ گروهی record_card_changes برای چند بازیکن با تعداد ثابت کوئری
+    changes: owner_id -> لیست شناسهٔ کارت‌ها؛ باید داخل transaction.atomic صدا زده شود.
+    """
+    changes = {owner_id: list(card_ids) for owner_id, card_ids in changes.items() if card_ids}
+    if not changes:
+        return
+    if len(changes) == 1:
+        [(owner_id, card_ids)] = changes.items()
+        record_card_changes(owner_id, card_ids, removed)
+        return
+
+    # قفل پروفایل‌ها به ترتیب pk (مثل buy_listing) تا دو تراکنش گروهی به deadlock نخورند
+    owners = list(PlayerProfile.objects.select_for_update().filter(pk__in=changes)
+                  .order_by('pk').values_list('pk', flat=True))
+    PlayerProfile.objects.filter(pk__in=owners).update(inventory_seq=Case(
+        *[When(pk=owner_id, then=F('inventory_seq') + len(changes[owner_id])) for owner_id in owners]))
+    ends = dict(PlayerProfile.objects.filter(pk__in=owners).values_list('pk', 'inventory_seq'))
+
+    InventoryChange.objects.bulk_create([
+        InventoryChange(owner_id=owner_id, seq=ends[owner_id] - len(changes[owner_id]) + offset,
+                        card_id=card_id, removed=removed)
+        for owner_id in owners
+        for offset, card_id in enumerate(changes[owner_id], 1)
+    ])
+
+
+def collapse_changes(rows):
+    """
+    از ردیف‌های (card_id, removed) مرتب بر اساس seq، وضعیت نهایی هر کارت را برمی‌گرداند
+    خروجی: (شناسه کارت‌های تغییرکرده، شناسه کارت‌های حذف‌شده)
+    """
+    latest = {}
+    for card_id, removed in rows:
+        latest[card_id] = removed
+    changed = [card_id for card_id, removed in latest.items() if not removed]
+    removed = [card_id for card_id, removed in latest.items() if removed]
+    return changed, removed
+
+
+def purge_changes(keep=None, batch_size=PURGE_BATCH_SIZE):
+    """
+    حذف تغییرات قدیمی‌تر از keep تغییر آخر هر بازیکن در batchهای جدا (هر کدام یک
+    تراکنش کوتاه)؛ خروجی تعداد حذف‌شده. کلاینتی که cursorش از این قدیمی‌تر است
+    در sync بعدی snapshot کامل می‌گیرد که از delta بیش از keep تغییر گران‌تر نیست.
+    """
+    keep = KEEP_CHANGES if keep is None else keep
+    stale = InventoryChange.objects.filter(seq__lte=F('owner__inventory_seq') - keep).order_by('pk')
+    deleted = 0
+    while True:
+        pks = list(stale.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        deleted += InventoryChange.objects.filter(pk__in=pks).delete()[0]
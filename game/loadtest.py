@@ -0,0 +1,276 @@
+"""
+بار مصنوعی روی API واقعی بازی (/api/game/...) با مدل رفتار بازیکن‌ها
+
+هر thread چند بازیکن را شبیه‌سازی می‌کند: بازیکن یک بار لاگین می‌کند (توکن
+می‌گیرد) و بعد در هر قدم یک «رفتار» را با وزن MIX انتخاب می‌کند. برای هر endpoint
+تعداد، خطاها و توزیع زمان پاسخ جمع می‌شود. فقط از کتابخانهٔ استاندارد استفاده
+می‌شود (http.client با اتصال keep-alive برای هر thread) تا روی هر ماشینی اجرا شود.
+
+بازیکن‌ها باید رمز مشترک داشته باشند، مثلاً:
+    python manage.py generate_world --players 5000 --password bench
+    python manage.py loadtest --password bench --duration 60 --concurrency 32
+"""
+import http.client
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+API_PREFIX = '/api/game'
+
+# رفتار -> وزن پیش‌فرض
+DEFAULT_MIX = {
+    'profile': 40,
+    'claim': 10,
+    'open_pack': 5,
+    'market': 25,
+    'buy': 5,
+    'equip': 15,
+}
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def parse_mix(value):
+    """'profile=40,claim=10' -> {'profile': 40, 'claim': 10}"""
+    mix = {}
+    for part in filter(None, (item.strip() for item in value.split(','))):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f'رفتار ناشناخته: {name}')
+        mix[name] = float(weight) if weight else 1.0
+        if mix[name] < 0:
+            raise ValueError(f'وزن منفی برای {name}')
+    if not mix or not sum(mix.values()):
+        raise ValueError('ترکیب رفتارها خالی است.')
+    return mix
+
+
+def percentile(sorted_values, p):
+    """صدک با روش nearest-rank روی لیست مرتب"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Stats:
+    """زمان‌ها و کدهای وضعیت به تفکیک endpoint (امن برای چند thread)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.statuses = {}
+
+    def add(self, endpoint, status, seconds):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            statuses = self.statuses.setdefault(endpoint, {})
+            statuses[status] = statuses.get(status, 0) + 1
+
+    def summary(self, elapsed):
+        """endpoint -> {count, rps, errors, rejected, p50_ms, ..., max_ms}"""
+        result = {}
+        with self._lock:
+            for endpoint, values in sorted(self.latencies.items()):
+                values = sorted(values)
+                statuses = self.statuses[endpoint]
+                row = {
+                    'count': len(values),
+                    'rps': round(len(values) / elapsed, 2) if elapsed else 0,
+                    # 0 یعنی خطای اتصال
+                    'errors': sum(n for code, n in statuses.items() if code == 0 or code >= 500),
+                    # رد شدن‌های عادی بازی (cooldown، موجودی ناکافی، آگهی فروخته‌شده، ...)
+                    'rejected': sum(n for code, n in statuses.items() if 400 <= code < 500),
+                }
+                for p in PERCENTILES:
+                    row[f'p{p}_ms'] = round(percentile(values, p) * 1000, 2)
+                row['max_ms'] = round(values[-1] * 1000, 2)
+                result[endpoint] = row
+        return result
+
+
+def compare_to_baseline(summary, baseline, tolerance):
+    """
+    رگرسیون‌ها نسبت به baseline: لیست (endpoint, متریک, قبلی, فعلی)
+    صدکی که بیش از tolerance (مثلاً 0.2 = بیست درصد) کندتر شده باشد رگرسیون است.
+    """
+    regressions = []
+    for endpoint, previous in baseline.items():
+        current = summary.get(endpoint)
+        if current is None:
+            continue
+        for p in PERCENTILES:
+            key = f'p{p}_ms'
+            if key in previous and current[key] > previous[key] * (1 + tolerance):
+                regressions.append((endpoint, key, previous[key], current[key]))
+    return regressions
+
+
+class Client:
+    """یک اتصال HTTP keep-alive؛ هر thread مال خودش را دارد"""
+
+    def __init__(self, base_url, stats, timeout=30):
+        parts = urlsplit(base_url)
+        self.connection_class = (http.client.HTTPSConnection if parts.scheme == 'https'
+                                 else http.client.HTTPConnection)
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/') + API_PREFIX
+        self.stats = stats
+        self.timeout = timeout
+        self.connection = None
+
+    def request(self, endpoint, method, path, token=None, data=None, headers=None):
+        """(status, body JSON یا None, هدرها)؛ خطای اتصال با status صفر ثبت می‌شود"""
+        headers = dict(headers or {})
+        headers['Accept'] = 'application/json'
+        if token:
+            headers['Authorization'] = f'Token {token}'
+        body = None
+        if data is not None:
+            body = json.dumps(data)
+            headers['Content-Type'] = 'application/json'
+
+        start = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = self.connection_class(self.netloc, timeout=self.timeout)
+            self.connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            raw = response.read()
+        except (OSError, http.client.HTTPException):
+            self.stats.add(endpoint, 0, time.perf_counter() - start)
+            self.close()
+            return 0, None, {}
+        self.stats.add(endpoint, response.status, time.perf_counter() - start)
+
+        if response.getheader('Connection', '').lower() == 'close':
+            self.close()
+        try:
+            payload = json.loads(raw) if raw else None
+        except ValueError:
+            payload = None
+        return response.status, payload, dict(response.getheaders())
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class Player:
+    """وضعیت سمت کلاینت یک بازیکن (مثل فرانت: ETag پروفایل، کارت‌ها، آخرین فید بازار)"""
+
+    def __init__(self, username, password):
+        self.username = username
+        self.password = password
+        self.token = None
+        self.etag = None
+        self.cards = []
+        self.listings = []
+
+    def login(self, client):
+        status, data, _ = client.request('login', 'POST', '/auth/login/',
+                                         data={'username': self.username, 'password': self.password})
+        if status == 200 and data:
+            self.token = data.get('token')
+        return self.token is not None
+
+    def refresh_cards(self, client):
+        status, data, _ = client.request('my_cards', 'GET', '/my-cards/?compact=1&limit=50', self.token)
+        if status == 200 and data:
+            self.cards = [card['id'] for card in data['results']]
+
+    # --- رفتارها ---
+
+    def profile(self, client, rng, context):
+        headers = {'If-None-Match': self.etag} if self.etag else None
+        status, _, response_headers = client.request('profile', 'GET', '/profile/me/', self.token,
+                                                     headers=headers)
+        if status in (200, 304):
+            self.etag = response_headers.get('ETag', self.etag)
+
+    def claim(self, client, rng, context):
+        client.request('claim', 'POST', '/claim/', self.token, data={},
+                       headers={'Idempotency-Key': uuid.uuid4().hex})
+
+    def open_pack(self, client, rng, context):
+        if not context['packs']:
+            return
+        status, _, _ = client.request('open_pack', 'POST', '/open-pack/', self.token,
+                                      data={'pack_id': rng.choice(context['packs'])},
+                                      headers={'Idempotency-Key': uuid.uuid4().hex})
+        if status == 200:
+            self.cards = []
+
+    def market(self, client, rng, context):
+        status, data, _ = client.request('market', 'GET', '/market/?compact=1', self.token)
+        if status == 200 and data:
+            self.listings = [item['listing_id'] for item in data]
+
+    def buy(self, client, rng, context):
+        if not self.listings:
+            self.market(client, rng, context)
+        if not self.listings:
+            return
+        listing_id = self.listings.pop(rng.randrange(len(self.listings)))
+        client.request('buy', 'POST', f'/market/buy/{listing_id}/', self.token,
+                       data={'listing_id': listing_id},
+                       headers={'Idempotency-Key': uuid.uuid4().hex})
+
+    def equip(self, client, rng, context):
+        if not self.cards:
+            self.refresh_cards(client)
+        if not self.cards:
+            return
+        client.request('equip', 'POST', '/equip/', self.token,
+                       data={'card_id': rng.choice(self.cards), 'slot_number': rng.randint(1, 3)})
+
+
+def fetch_packs(base_url, stats):
+    client = Client(base_url, stats)
+    status, data, _ = client.request('packs', 'GET', '/packs/')
+    client.close()
+    return [pack['id'] for pack in data] if status == 200 and data else []
+
+
+def run(base_url, players, mix, duration, concurrency, seed=None, think_time=0.0):
+    """
+    اجرای بار؛ خروجی (Stats، ثانیه‌های واقعی اجرا)
+    players: لیست Player؛ بین threadها تقسیم می‌شوند (هر بازیکن فقط در یک thread)
+    """
+    stats = Stats()
+    context = {'packs': fetch_packs(base_url, stats)}
+    actions = list(mix)
+    weights = [mix[action] for action in actions]
+    deadline = time.monotonic() + duration
+
+    def worker(index):
+        rng = random.Random(None if seed is None else seed + index)
+        own = players[index::concurrency]
+        client = Client(base_url, stats)
+        try:
+            while own and time.monotonic() < deadline:
+                player = rng.choice(own)
+                if player.token is None and not player.login(client):
+                    # رمز اشتباه یا کاربر غیرفعال؛ این بازیکن کنار گذاشته می‌شود
+                    own.remove(player)
+                    continue
+                action = rng.choices(actions, weights)[0]
+                getattr(player, action)(client, rng, context)
+                if think_time:
+                    time.sleep(rng.expovariate(1 / think_time))
+        finally:
+            client.close()
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats, time.monotonic() - started
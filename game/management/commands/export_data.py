@@ -0,0 +1,55 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game import exports
+
+
+class Command(BaseCommand):
+    help = ('خروجی استریمی بازیکن‌ها، کارت‌ها یا آگهی‌های بازار به CSV/JSONL (اختیاری gzip) '
+            'با cursor سمت سرور و حافظهٔ ثابت')
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(exports.DATASETS))
+        parser.add_argument('--output', '-o', default='-', help="فایل خروجی ('-' برای stdout)")
+        parser.add_argument('--format', dest='fmt', choices=sorted(exports.CONTENT_TYPES),
+                            help='پیش‌فرض: از روی پسوند فایل، وگرنه csv')
+        parser.add_argument('--gzip', action='store_true', dest='compress',
+                            help='فشرده‌سازی gzip (برای فایل‌های .gz خودکار)')
+        parser.add_argument('--chunk-size', type=int, default=exports.STREAM_CHUNK_SIZE,
+                            help='تعداد ردیف هر بار خواندن از cursor')
+
+    def handle(self, *args, dataset, output, fmt, compress, chunk_size, **options):
+        if chunk_size < 1:
+            raise CommandError('chunk-size باید مثبت باشد.')
+        name = output[:-3] if output.endswith('.gz') else output
+        compress = compress or output.endswith('.gz')
+        fmt = fmt or ('jsonl' if name.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        count = 0
+
+        def rows():
+            nonlocal count
+            for row in exports.iter_rows(dataset, chunk_size):
+                count += 1
+                yield row
+
+        started = time.perf_counter()
+        try:
+            fp = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        except OSError as exc:
+            raise CommandError(str(exc))
+        try:
+            for chunk in exports.export(dataset, fmt, compress, rows=rows()):
+                fp.write(chunk)
+        finally:
+            if output == '-':
+                fp.flush()
+            else:
+                fp.close()
+
+        # روی stdout خود داده نوشته شده؛ گزارش به stderr می‌رود
+        report = self.stderr if output == '-' else self.stdout
+        report.write(f'{count} ردیف {dataset} در {time.perf_counter() - started:.1f} ثانیه'
+                     + ('' if output == '-' else f' در {output}'))
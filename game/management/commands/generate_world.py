@@ -0,0 +1,173 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from game.catalog import invalidate_catalog
+from game.models import CardTemplate, UserCard, PlayerProfile, MarketListing
+from game.views import STARTER_CHANCES, roll_rarity
+
+# سهم هر کمیابی از تمپلیت‌های ساخته‌شده
+TEMPLATE_SHARES = [('COMMON', 50), ('RARE', 30), ('EPIC', 15), ('LEGENDARY', 5)]
+# ضریب نرخ استخراج هر کمیابی
+RARITY_RATE = {'COMMON': 1, 'RARE': 3, 'EPIC': 8, 'LEGENDARY': 20}
+
+
+class Command(BaseCommand):
+    help = ('ساخت دنیای مصنوعی برای بنچمارک: کاربر و پروفایل، تمپلیت، کارت‌ها با serial و '
+            'minted_count سازگار، اسلات‌های تجهیزشده و آگهی‌های فعال و فروخته‌شده '
+            '(همه با bulk_create تکه‌تکه؛ با seed ثابت خروجی تکرارپذیر است)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=1000)
+        parser.add_argument('--templates', type=int, default=100)
+        parser.add_argument('--cards-per-player', type=int, default=20, help='میانگین کارت هر بازیکن')
+        parser.add_argument('--listed', type=float, default=0.1,
+                            help='سهم بازیکن‌هایی که یک آگهی فعال دارند')
+        parser.add_argument('--sold', type=float, default=0.05,
+                            help='سهم کارت‌هایی که از بازار خریده شده‌اند (آگهی غیرفعال)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='bot_', help='پیشوند نام کاربری و نام تمپلیت‌ها')
+        parser.add_argument('--password', help='رمز مشترک همه (یک بار هش می‌شود)؛ پیش‌فرض: رمز غیرقابل استفاده')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='تعداد بازیکن در هر تراکنش')
+        parser.add_argument('--batch-size', type=int, default=5000, help='batch_size برای bulk_create')
+
+    def handle(self, *args, players, templates, cards_per_player, listed, sold, seed, prefix,
+               password, chunk_size, batch_size, **options):
+        if players < 1 or templates < len(TEMPLATE_SHARES) or cards_per_player < 0:
+            raise CommandError(f'players باید مثبت و templates حداقل {len(TEMPLATE_SHARES)} باشد.')
+        if chunk_size < 1 or batch_size < 1:
+            raise CommandError('chunk-size و batch-size باید مثبت باشند.')
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f'کاربرانی با پیشوند «{prefix}» از قبل وجود دارند؛ --prefix دیگری بدهید.')
+
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        # هش کردن رمز کند است؛ یک بار برای همه
+        self.password = make_password(password) if password else make_password(None)
+        self.templates = self._create_templates(templates, players * cards_per_player, prefix)
+        # تمپلیت‌هایی که هنوز ظرفیت دارند، به تفکیک کمیابی
+        self.available = {}
+        for template in self.templates:
+            self.available.setdefault(template.rarity, []).append(template)
+
+        started = time.perf_counter()
+        totals = {'players': 0, 'cards': 0, 'active': 0, 'sold': 0}
+        for start in range(0, players, chunk_size):
+            count = min(chunk_size, players - start)
+            with transaction.atomic():
+                chunk = self._create_chunk(prefix, start, count, cards_per_player, listed, sold)
+            for key, value in chunk.items():
+                totals[key] += value
+            self.stdout.write(f"{start + count}/{players} بازیکن، {totals['cards']} کارت")
+
+        CardTemplate.objects.bulk_update(self.templates, ['minted_count'], batch_size=batch_size)
+        invalidate_catalog()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['players']} بازیکن، {len(self.templates)} تمپلیت، {totals['cards']} کارت، "
+            f"{totals['active']} آگهی فعال و {totals['sold']} آگهی فروخته‌شده در {elapsed:.1f} ثانیه"))
+
+    def _create_templates(self, count, expected_cards, prefix):
+        specs = []
+        for rarity, share in TEMPLATE_SHARES:
+            specs.extend([rarity] * max(1, round(count * share / 100)))
+        specs = specs[:count]
+        chances = {rarity: chance for rarity, chance in STARTER_CHANCES[:-1]}
+        chances[STARTER_CHANCES[-1][0]] = 100 - sum(chances.values())
+        per_rarity = {rarity: specs.count(rarity) for rarity in chances}
+
+        templates = []
+        for index, rarity in enumerate(specs):
+            # ظرفیت کافی با حاشیه تا fallback به COMMON کم پیش بیاید
+            per_template = expected_cards * chances[rarity] / 100 / per_rarity[rarity]
+            templates.append(CardTemplate(
+                name=f'{prefix}{rarity.lower()}_{index}',
+                image=f'cards/{rarity.lower()}.png',
+                rarity=rarity,
+                mining_rate=self.rng.randint(1, 5) * RARITY_RATE[rarity],
+                max_supply=int(per_template * 2) + 10,
+            ))
+        return CardTemplate.objects.bulk_create(templates, batch_size=self.batch_size)
+
+    def _pick_template(self):
+        """مثل mint_cards: اگر کمیابی انتخاب‌شده تمام شده باشد COMMON"""
+        rarity = roll_rarity(STARTER_CHANCES, roll=self.rng.randint(1, 100))
+        candidates = self.available.get(rarity) or self.available.get('COMMON')
+        if not candidates:
+            candidates = next((pool for pool in self.available.values() if pool), None)
+        if not candidates:
+            raise CommandError('ظرفیت همهٔ تمپلیت‌ها پر شد؛ --templates را بیشتر کنید.')
+        template = self.rng.choice(candidates)
+        template.minted_count += 1
+        if template.minted_count >= template.max_supply:
+            candidates.remove(template)
+        return template
+
+    def _create_chunk(self, prefix, start, count, cards_per_player, listed, sold):
+        users = User.objects.bulk_create([
+            User(username=f'{prefix}{start + i:07d}', password=self.password)
+            for i in range(count)
+        ], batch_size=self.batch_size)
+        profiles = PlayerProfile.objects.bulk_create([
+            PlayerProfile(
+                user=user,
+                coins=self.rng.randint(0, 50000),
+                gems=self.rng.randint(0, 500),
+                vow_fragments=self.rng.randint(0, 5000),
+                level=self.rng.randint(1, 20),
+            )
+            for user in users
+        ], batch_size=self.batch_size)
+
+        cards = []
+        owners = []
+        for profile in profiles:
+            for _ in range(self.rng.randint(0, cards_per_player * 2)):
+                template = self._pick_template()
+                cards.append(UserCard(owner=profile, template=template, serial_number=template.minted_count))
+                owners.append(profile)
+        # یک کارت از بعضی بازیکن‌ها در بازار است (کارت آخر هر بازیکن، تا با اسلات‌ها تداخل نکند)
+        last_card = {}
+        for index, owner in enumerate(owners):
+            last_card[owner.pk] = index
+        listed_indexes = {index for index in last_card.values() if self.rng.random() < listed}
+        for index in listed_indexes:
+            cards[index].is_listed_in_market = True
+        cards = UserCard.objects.bulk_create(cards, batch_size=self.batch_size)
+
+        # اسلات‌ها: سه کارت اول بازیکن که در بازار نیست؛ نرخ استخراج همان فرمول update_mining_rate
+        equipped = {}
+        for card, owner in zip(cards, owners):
+            if not card.is_listed_in_market and len(equipped.setdefault(owner.pk, [])) < 3:
+                equipped[owner.pk].append(card)
+        for profile in profiles:
+            slots = equipped.get(profile.pk, []) + [None] * 3
+            profile.slot_1, profile.slot_2, profile.slot_3 = slots[:3]
+            base_rate = sum(card.template.mining_rate for card in slots[:3] if card)
+            profile.current_mining_rate = int(base_rate * (1 + profile.level * 0.05))
+        PlayerProfile.objects.bulk_update(
+            profiles, ['slot_1', 'slot_2', 'slot_3', 'current_mining_rate'], batch_size=self.batch_size)
+
+        listings = [
+            MarketListing(seller=owners[index], card_instance=cards[index], price=self.rng.randint(10, 1000))
+            for index in sorted(listed_indexes)
+        ]
+        # کارت‌های خریده‌شده: آگهی غیرفعال از فروشنده‌ای دیگر، کارت حالا مال خریدار است
+        sold_count = 0
+        if len(profiles) > 1:
+            for card, owner in zip(cards, owners):
+                if not card.is_listed_in_market and self.rng.random() < sold:
+                    seller = self.rng.choice(profiles)
+                    while seller.pk == owner.pk:
+                        seller = self.rng.choice(profiles)
+                    listings.append(MarketListing(seller=seller, card_instance=card,
+                                                  price=self.rng.randint(10, 1000), is_active=False))
+                    sold_count += 1
+        MarketListing.objects.bulk_create(listings, batch_size=self.batch_size)
+
+        return {'players': len(profiles), 'cards': len(cards),
+                'active': len(listed_indexes), 'sold': sold_count}
@@ -0,0 +1,61 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from game import catalog_import
+from game.catalog import invalidate_catalog
+
+
+class Command(BaseCommand):
+    help = ('import تمپلیت کارت‌ها و پک‌ها از فایل CSV/JSONL به صورت استریمی: اعتبارسنجی (مجموع شانس‌ها '
+            '100)، upsert در batch با bulk_create و گزارش تفاوت‌ها؛ همه در یک تراکنش و با هر خطا rollback')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="فایل CSV یا JSONL ('-' برای stdin)")
+        parser.add_argument('--format', dest='fmt', choices=['csv', 'jsonl'],
+                            help='پیش‌فرض: از روی پسوند فایل')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='فقط اعتبارسنجی و گزارش تفاوت، بدون نوشتن')
+
+    def handle(self, *args, path, fmt, batch_size, dry_run, verbosity, **options):
+        if batch_size < 1:
+            raise CommandError('batch-size باید مثبت باشد.')
+        fmt = fmt or catalog_import.detect_format(path)
+        on_change = self._print_change if verbosity >= 2 else None
+
+        try:
+            fp = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        except OSError as exc:
+            raise CommandError(str(exc))
+        try:
+            with transaction.atomic():
+                importer = catalog_import.import_catalog(
+                    catalog_import.read_records(fp, fmt), batch_size, dry_run, on_change)
+                if importer.error_count or dry_run:
+                    transaction.set_rollback(True)
+                elif importer.changed:
+                    # bulk_create سیگنال post_save نمی‌فرستد
+                    invalidate_catalog()
+        finally:
+            if fp is not sys.stdin:
+                fp.close()
+
+        if importer.error_count:
+            for line_no, message in importer.errors:
+                self.stderr.write(f'خط {line_no}: {message}')
+            raise CommandError(f'{importer.error_count} ردیف نامعتبر؛ هیچ تغییری ذخیره نشد.')
+
+        for kind, counts in importer.summary.items():
+            self.stdout.write(f"{kind}: {counts['created']} جدید، {counts['updated']} تغییر، "
+                              f"{counts['unchanged']} بدون تغییر")
+        if dry_run:
+            self.stdout.write('dry-run: چیزی ذخیره نشد.')
+        else:
+            self.stdout.write(self.style.SUCCESS('کاتالوگ به‌روز شد.'))
+
+    def _print_change(self, kind, status, name, changed):
+        if status == 'created':
+            self.stdout.write(f'+ {kind} {name}')
+        else:
+            self.stdout.write(f"~ {kind} {name}: {', '.join(changed)}")
@@ -0,0 +1,89 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from game import loadtest
+
+
+class Command(BaseCommand):
+    help = ('تست بار روی API بازی در یک سرور در حال اجرا با ترکیب رفتار بازیکن‌ها؛ '
+            'گزارش throughput و صدک‌های زمان پاسخ هر endpoint و مقایسه با baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='آدرس سرور (بدون /api/game)')
+        parser.add_argument('--prefix', default='bot_', help='پیشوند نام کاربری بازیکن‌ها (مثل generate_world)')
+        parser.add_argument('--password', required=True, help='رمز مشترک بازیکن‌ها')
+        parser.add_argument('--players', type=int, default=500, help='حداکثر تعداد بازیکن')
+        parser.add_argument('--duration', type=float, default=30, help='ثانیه')
+        parser.add_argument('--concurrency', type=int, default=16, help='تعداد thread')
+        parser.add_argument('--mix', default=','.join(f'{k}={v}' for k, v in loadtest.DEFAULT_MIX.items()),
+                            help='وزن رفتارها، مثلاً profile=40,claim=10,open_pack=5,market=25,buy=5,equip=15')
+        parser.add_argument('--think-time', type=float, default=0.0,
+                            help='میانگین مکث بین دو درخواست هر thread (ثانیه)')
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--baseline', help='فایل JSON نتیجهٔ قبلی؛ رگرسیون صدک‌ها باعث خطا می‌شود')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='کندی مجاز نسبت به baseline (0.2 = 20٪)')
+        parser.add_argument('--save', help='ذخیرهٔ نتیجه به عنوان baseline در این فایل')
+        parser.add_argument('--json', action='store_true', dest='as_json', help='چاپ نتیجه به صورت JSON')
+
+    def handle(self, *args, url, prefix, password, players, duration, concurrency, mix, think_time, seed,
+               baseline, tolerance, save, as_json, **options):
+        try:
+            mix = loadtest.parse_mix(mix)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if duration <= 0 or concurrency < 1 or players < 1:
+            raise CommandError('duration، concurrency و players باید مثبت باشند.')
+
+        previous = None
+        if baseline:
+            with open(baseline, encoding='utf-8') as fp:
+                previous = json.load(fp)['endpoints']
+
+        usernames = list(User.objects.filter(username__startswith=prefix, is_active=True)
+                         .order_by('id').values_list('username', flat=True)[:players])
+        if not usernames:
+            raise CommandError(f'کاربری با پیشوند «{prefix}» نیست؛ اول generate_world --password را اجرا کنید.')
+        self.stdout.write(f'{len(usernames)} بازیکن، {concurrency} thread، {duration:g} ثانیه روی {url}')
+
+        stats, elapsed = loadtest.run(
+            url, [loadtest.Player(username, password) for username in usernames],
+            mix, duration, concurrency, seed=seed, think_time=think_time)
+        summary = stats.summary(elapsed)
+        result = {
+            'url': url,
+            'duration': round(elapsed, 2),
+            'concurrency': concurrency,
+            'mix': mix,
+            'total_rps': round(sum(row['count'] for row in summary.values()) / elapsed, 2),
+            'endpoints': summary,
+        }
+
+        if as_json:
+            self.stdout.write(json.dumps(result, indent=2))
+        else:
+            self._print(result)
+
+        if save:
+            with open(save, 'w', encoding='utf-8') as fp:
+                json.dump(result, fp, indent=2)
+            self.stdout.write(f'نتیجه در {save} ذخیره شد.')
+
+        if not summary or all(row['errors'] == row['count'] for row in summary.values()):
+            raise CommandError('هیچ درخواست موفقی انجام نشد؛ سرور در دسترس است؟')
+        if previous is not None:
+            regressions = loadtest.compare_to_baseline(summary, previous, tolerance)
+            for endpoint, metric, before, after in regressions:
+                self.stderr.write(f'{endpoint} {metric}: {before} -> {after} ms')
+            if regressions:
+                raise CommandError(f'{len(regressions)} صدک بیش از {tolerance:.0%} از baseline کندتر شده است.')
+            self.stdout.write(self.style.SUCCESS('رگرسیونی نسبت به baseline نیست.'))
+
+    def _print(self, result):
+        columns = ['count', 'rps', 'errors', 'rejected'] + [f'p{p}_ms' for p in loadtest.PERCENTILES] + ['max_ms']
+        self.stdout.write(f"{'endpoint':<12}" + ''.join(f'{column:>10}' for column in columns))
+        for endpoint, row in result['endpoints'].items():
+            line = f'{endpoint:<12}' + ''.join(f'{row[column]:>10}' for column in columns)
+            self.stdout.write(self.style.ERROR(line) if row['errors'] else line)
+        self.stdout.write(f"total: {result['total_rps']} req/s در {result['duration']} ثانیه")
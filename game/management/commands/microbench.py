@@ -0,0 +1,195 @@
+import datetime
+import fnmatch
+import json
+import platform
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from game import microbench
+from game.models import CardTemplate, UserCard, PlayerProfile, MarketListing, Pack
+from game.serializers import (
+    UserCardSerializer, PlayerProfileSerializer, MarketListingSerializer, player_profile_data, user_cards_data,
+)
+from game.views import (
+    MARKET_FEED_COLUMNS, STARTER_CHANCES, add_xp, market_feed_item, mint_cards, pack_chances, roll_rarity,
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('میکروبنچمارک مدل‌ها، سریالایزرها و مسیر roll/mint با warmup، تکرار و مقایسهٔ آماری با '
+            'baseline (داده‌های تست داخل یک تراکنش ساخته و در پایان rollback می‌شوند)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+                            help='تعداد ردیف برای بنچمارک‌های سریالایزر و فید بازار '
+                                 '(پیش‌فرض 1000 10000 100000؛ برای اجرای سریع مثلاً --sizes 10 100)')
+        parser.add_argument('--filter', dest='patterns', action='append',
+                            help='فقط بنچمارک‌های منطبق (الگوی glob، قابل تکرار)')
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--min-time', type=float, default=0.05, help='حداقل زمان هر تکرار (ثانیه)')
+        parser.add_argument('--baseline', help='فایل JSON نتیجهٔ قبلی برای مقایسه')
+        parser.add_argument('--tolerance', type=float, default=0.1, help='تغییر قابل چشم‌پوشی (0.1 = 10٪)')
+        parser.add_argument('--save', help='ذخیرهٔ نتیجه در این فایل JSON')
+        parser.add_argument('--json', action='store_true', dest='as_json', help='چاپ نتیجه به صورت JSON')
+
+    def handle(self, *args, sizes, patterns, warmup, repeat, min_time, baseline, tolerance, save, as_json,
+               **options):
+        if repeat < 2 or warmup < 0 or min_time <= 0 or not sizes or min(sizes) < 1:
+            raise CommandError('repeat باید حداقل 2 و sizes و min-time مثبت باشند.')
+
+        previous = None
+        if baseline:
+            with open(baseline, encoding='utf-8') as fp:
+                previous = json.load(fp)['results']
+
+        results = {}
+        try:
+            with transaction.atomic():
+                for name, func, setup, teardown in self._benchmarks(self._seed(max(sizes)), sorted(sizes)):
+                    if patterns and not any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                        continue
+                    results[name] = microbench.measure(func, warmup, repeat, min_time, setup, teardown)
+                    if not as_json:
+                        self._print_row(name, results[name])
+                raise _Rollback
+        except _Rollback:
+            pass
+        if not results:
+            raise CommandError('هیچ بنچمارکی با --filter منطبق نشد.')
+
+        output = {
+            'meta': {
+                'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'warmup': warmup,
+                'repeat': repeat,
+            },
+            'results': results,
+        }
+        comparison = None
+        if previous is not None:
+            comparison = microbench.compare(results, previous, tolerance)
+            output['comparison'] = comparison
+
+        if as_json:
+            self.stdout.write(json.dumps(output, indent=2))
+        elif comparison:
+            self._print_comparison(comparison)
+
+        if save:
+            with open(save, 'w', encoding='utf-8') as fp:
+                json.dump(output, fp, indent=2)
+
+        slower = [name for name, row in (comparison or {}).items() if row['verdict'] == 'slower']
+        if slower:
+            raise CommandError(f"کندتر از baseline: {', '.join(slower)}")
+
+    # --- داده‌ها ---
+
+    def _seed(self, count):
+        user = User.objects.create(username='__microbench__')
+        profile = PlayerProfile.objects.create(user=user, level=5)
+        templates = CardTemplate.objects.bulk_create([
+            CardTemplate(name=f'Bench {rarity}', image=f'cards/bench_{rarity.lower()}.png',
+                         rarity=rarity, mining_rate=index + 1, max_supply=10 ** 9)
+            for index, (rarity, _) in enumerate(CardTemplate.RARITY_CHOICES)
+        ])
+        cards = UserCard.objects.bulk_create([
+            UserCard(owner=profile, template=templates[i % len(templates)], serial_number=i // len(templates) + 1)
+            for i in range(count)
+        ], batch_size=5000)
+        for template in templates:
+            template.minted_count = sum(1 for card in cards if card.template_id == template.pk)
+        CardTemplate.objects.bulk_update(templates, ['minted_count'])
+        MarketListing.objects.bulk_create([
+            MarketListing(seller=profile, card_instance=card, price=10 + i % 90)
+            for i, card in enumerate(cards)
+        ], batch_size=5000)
+        profile.slot_1, profile.slot_2, profile.slot_3 = cards[:3]
+        profile.save(update_fields=['slot_1', 'slot_2', 'slot_3'])
+        return profile
+
+    def _benchmarks(self, profile, sizes):
+        """(نام، تابع، setup، teardown)"""
+        pack = Pack(name='Bench', price=1, card_count=5, chance_common=60, chance_rare=25, chance_epic=10)
+        chances = pack_chances(pack)
+        yield 'roll_rarity', lambda: roll_rarity(chances), None, None
+        yield 'roll_rarity[starter]', lambda: roll_rarity(STARTER_CHANCES), None, None
+
+        xp_profile = PlayerProfile(level=1, xp=0)
+
+        def level_up():
+            # XP یک claim هشت‌ساعته با چند لول آپ پشت سر هم
+            xp_profile.level, xp_profile.xp = 1, 0
+            add_xp(xp_profile, 50_000)
+        yield 'claim.add_xp', level_up, None, None
+
+        yield 'PlayerProfile.update_mining_rate', profile.update_mining_rate, None, None
+
+        # هر اجرا داخل یک savepoint که بعدش rollback می‌شود، تا minted_count بی‌نهایت بالا نرود
+        savepoints = []
+
+        def begin():
+            savepoints.append(transaction.savepoint())
+
+        def rollback():
+            transaction.savepoint_rollback(savepoints.pop())
+
+        for count in (1, pack.card_count):
+            rarities = [roll_rarity(chances) for _ in range(count)]
+            yield f'mint_cards[{count}]', lambda rarities=rarities: mint_cards(profile, rarities), begin, rollback
+
+        loaded_profile = PlayerProfile.objects.select_related(
+            'user', 'avatar', 'slot_1__template', 'slot_2__template', 'slot_3__template').get(pk=profile.pk)
+        yield 'PlayerProfileSerializer', lambda: PlayerProfileSerializer(loaded_profile).data, None, None
+        yield 'player_profile_data', lambda: player_profile_data(loaded_profile), None, None
+
+        for size in sizes:
+            cards = list(UserCard.objects.filter(owner=profile).select_related('template').order_by('id')[:size])
+            listings = list(MarketListing.objects.filter(seller=profile).select_related(
+                'seller__user', 'card_instance__template').order_by('id')[:size])
+            rows = list(MarketListing.objects.filter(seller=profile).order_by('id')
+                        .values_list(*MARKET_FEED_COLUMNS)[:size])
+            yield (f'UserCardSerializer[{size}]',
+                   lambda cards=cards: UserCardSerializer(cards, many=True).data, None, None)
+            yield (f'MarketListingSerializer[{size}]',
+                   lambda listings=listings: MarketListingSerializer(listings, many=True).data, None, None)
+
+            # مسیر سریع values_list خودش کوئری می‌زند، پس در مقابل سریالایزر با کوئری
+            # (نام «, query») مقایسه می‌شود نه با لیست از قبل لودشده
+            card_query = UserCard.objects.filter(owner=profile).order_by('id')[:size]
+            if user_cards_data(card_query) != list(UserCardSerializer(cards, many=True).data):
+                raise CommandError('user_cards_data: خروجی مسیر سریع با سریالایزر یکسان نیست')
+            yield (f'UserCardSerializer[{size}, query]',
+                   lambda qs=card_query: UserCardSerializer(qs.select_related('template'), many=True).data,
+                   None, None)
+            yield f'user_cards_data[{size}]', lambda qs=card_query: user_cards_data(qs), None, None
+            yield (f'market_feed_item[{size}]',
+                   lambda rows=rows: [market_feed_item(row) for row in rows], None, None)
+            yield (f'market_feed_item[{size}, compact]',
+                   lambda rows=rows: [market_feed_item(row, compact=True) for row in rows], None, None)
+
+    # --- خروجی ---
+
+    def _print_row(self, name, row):
+        self.stdout.write(
+            f"{name:<36}{row['mean'] * 1e6:>12.2f} µs ±{row['stdev'] / row['mean'] * 100 if row['mean'] else 0:>5.1f}%"
+            f"  median {row['median'] * 1e6:.2f} µs  min {row['min'] * 1e6:.2f} µs"
+            f"  ({row['n']}×{row['number']})")
+
+    def _print_comparison(self, comparison):
+        self.stdout.write('')
+        for name, row in comparison.items():
+            line = f"{name:<36}{row['change']:>+8.1%}  t={row['t']:>7}  {row['verdict']}"
+            style = {'slower': self.style.ERROR, 'faster': self.style.SUCCESS}.get(row['verdict'])
+            self.stdout.write(style(line) if style else line)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from game.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'حذف پاسخ‌های ذخیره‌شدهٔ Idempotency-Key که از GAME_IDEMPOTENCY_TTL قدیمی‌ترند'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'{deleted} کلید منقضی حذف شد.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from game.inventory import KEEP_CHANGES, purge_changes
+
+
+class Command(BaseCommand):
+    help = ('حذف لاگ تغییرات کارت‌ها (InventoryChange) به جز --keep تغییر آخر هر بازیکن؛ '
+            'کلاینت‌هایی که cursor قدیمی‌تری دارند در sync بعدی snapshot کامل می‌گیرند')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=KEEP_CHANGES,
+                            help='تعداد تغییرات اخیر هر بازیکن که نگه داشته می‌شود')
+
+    def handle(self, *args, keep, **options):
+        if keep < 0:
+            raise CommandError('keep نمی‌تواند منفی باشد.')
+        deleted = purge_changes(keep)
+        self.stdout.write(self.style.SUCCESS(f'{deleted} تغییر قدیمی حذف شد.'))
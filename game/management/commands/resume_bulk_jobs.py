@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from game import bulk
+
+
+class Command(BaseCommand):
+    help = ('ادامهٔ jobهای گروهی ادمین که پروسه‌شان وسط کار بسته شده (PENDING/RUNNING بدون پیشرفت '
+            'در --stale-after ثانیه) از آخرین تکهٔ commit‌شده؛ مثلاً بعد از هر deploy یا با cron')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-after', type=int, default=bulk.STALE_AFTER,
+                            help='ثانیه‌های بدون پیشرفت تا job رهاشده حساب شود')
+        parser.add_argument('--failed', action='store_true', help='jobهای FAILED را هم دوباره اجرا کن')
+
+    def handle(self, *args, stale_after, failed, **options):
+        if stale_after < 0:
+            raise CommandError('stale-after نمی‌تواند منفی باشد.')
+        jobs = bulk.resumable_jobs(stale_after) if failed else bulk.stale_jobs(stale_after)
+
+        resumed = failures = 0
+        for job_id in list(jobs.values_list('pk', flat=True)):
+            # ممکن است پروسهٔ دیگری همین حالا آن را برداشته باشد
+            if not bulk.claim(job_id, jobs):
+                continue
+            try:
+                bulk.run_job(job_id)
+            except Exception as exc:
+                failures += 1
+                self.stderr.write(f'job #{job_id}: {type(exc).__name__}: {exc}')
+                continue
+            resumed += 1
+            self.stdout.write(f'job #{job_id} تمام شد.')
+
+        if failures:
+            raise CommandError(f'{failures} job دوباره خطا داد (جزئیات در صفحهٔ عملیات‌های گروهی).')
+        self.stdout.write(self.style.SUCCESS(f'{resumed} job ادامه داده شد.'))
@@ -0,0 +1,38 @@
+import datetime
+import json
+
+from django.core.management.base import BaseCommand
+
+from game.slowlog import MIRROR_TO_CACHE, clear_slow_queries, get_slow_queries
+
+
+class Command(BaseCommand):
+    help = ('نمایش کوئری‌های کند ثبت‌شده (game.slowlog)؛ از پروسهٔ دیگری فقط با '
+            'GAME_SLOW_QUERY_CACHE=True و کش مشترک قابل خواندن است')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='فقط کوئری‌های این نام URL')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--json', action='store_true', dest='as_json', help='خروجی JSON (هر ردیف در یک خط)')
+        parser.add_argument('--clear', action='store_true', help='پاک کردن بافر بعد از نمایش')
+
+    def handle(self, *args, view, limit, as_json, clear, **options):
+        entries = get_slow_queries(view=view, limit=limit)
+        if not entries and not MIRROR_TO_CACHE:
+            self.stderr.write('بافر این پروسه خالی است؛ برای دیدن کوئری‌های سرور GAME_SLOW_QUERY_CACHE را روشن کنید.')
+
+        for entry in entries:
+            if as_json:
+                self.stdout.write(json.dumps(entry, ensure_ascii=False))
+                continue
+            at = datetime.datetime.fromtimestamp(entry['at']).strftime('%Y-%m-%d %H:%M:%S')
+            self.stdout.write(self.style.WARNING(
+                f"{at}  {entry['duration_ms']:.1f} ms  {entry['view'] or '-'}  {entry['origin'] or '-'}"))
+            self.stdout.write(f"  {entry['sql']}")
+            self.stdout.write(f"  params: {entry['params']}")
+            for frame in entry['stack']:
+                self.stdout.write(f'    {frame}')
+
+        if clear:
+            clear_slow_queries()
+
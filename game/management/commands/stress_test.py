@@ -0,0 +1,260 @@
+import random
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, F, Sum
+from rest_framework.authtoken.models import Token
+
+from game.loadtest import Client, Stats
+from game.models import CardTemplate, UserCard, PlayerProfile, MarketListing, Pack
+
+SCENARIOS = ('exchange', 'open_pack', 'buy')
+
+
+class Command(BaseCommand):
+    help = ('تست همزمانی روی یک سرور در حال اجرا: درخواست‌های موازی روی یک پروفایل و یک آگهی، '
+            'سپس بررسی invariantها (موجودی منفی، پایستگی Vow Fragments، minted_count، '
+            'کارت فروخته‌شده به دو نفر) و گزارش throughput. باید به همان دیتابیس سرور وصل باشد؛ '
+            'فقط روی دیتابیس آزمایشی اجرا کنید (کارت‌های پک از تمپلیت‌های موجود ساخته می‌شوند).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='آدرس سرور (بدون /api/game)')
+        parser.add_argument('--scenario', choices=SCENARIOS, action='append',
+                            help='سناریو (قابل تکرار)؛ پیش‌فرض: همه')
+        parser.add_argument('--concurrency', type=int, default=16, help='تعداد thread')
+        parser.add_argument('--requests', type=int, default=20, help='تعداد درخواست هر thread')
+        parser.add_argument('--buyers', type=int, default=8, help='تعداد خریدار/فروشنده در سناریوی buy')
+        parser.add_argument('--prefix', default='stress_', help='پیشوند کاربران و تمپلیت‌های آزمایشی')
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--keep', action='store_true', help='داده‌های آزمایشی پاک نشوند')
+
+    def handle(self, *args, url, scenario, concurrency, requests, buyers, prefix, seed, keep, **options):
+        if concurrency < 1 or requests < 1 or buyers < 2:
+            raise CommandError('concurrency و requests باید مثبت و buyers حداقل 2 باشد.')
+        self.url = url
+        self.prefix = prefix
+        self.rng = random.Random(seed)
+
+        self._cleanup()
+        self.template = CardTemplate.objects.create(
+            name=f'{prefix}card', image='cards/stress.png', rarity='COMMON', max_supply=10 ** 9)
+        failures = []
+        try:
+            for name in scenario or SCENARIOS:
+                self.stdout.write(self.style.MIGRATE_HEADING(f'== {name}'))
+                before = self._template_counts()
+                problems = getattr(self, f'_run_{name}')(concurrency, requests, buyers)
+                problems += self._global_invariants(before)
+                for problem in problems:
+                    self.stderr.write(self.style.ERROR(f'  ✗ {problem}'))
+                if not problems:
+                    self.stdout.write(self.style.SUCCESS('  همهٔ invariantها برقرارند'))
+                failures += [f'{name}: {problem}' for problem in problems]
+        finally:
+            if not keep:
+                self._cleanup()
+
+        if failures:
+            raise CommandError(f'{len(failures)} invariant نقض شد.')
+
+    # --- داده‌های آزمایشی ---
+
+    def _player(self, name, **balances):
+        user = User.objects.create(username=f'{self.prefix}{name}')
+        profile = PlayerProfile.objects.create(user=user, **balances)
+        return profile, Token.objects.create(user=user).key
+
+    def _cards(self, profile, count):
+        """کارت با serial و minted_count سازگار (مثل mint_cards)"""
+        # پک‌های باز شده در سناریوهای قبلی هم از این تمپلیت کارت ساخته‌اند
+        self.template.refresh_from_db(fields=['minted_count'])
+        start = self.template.minted_count
+        self.template.minted_count += count
+        self.template.save(update_fields=['minted_count'])
+        return UserCard.objects.bulk_create(
+            UserCard(owner=profile, template=self.template, serial_number=start + i + 1)
+            for i in range(count)
+        )
+
+    def _cleanup(self):
+        profiles = PlayerProfile.objects.filter(user__username__startswith=self.prefix)
+        MarketListing.objects.filter(seller__in=profiles).delete()
+        MarketListing.objects.filter(card_instance__template__name__startswith=self.prefix).delete()
+        UserCard.objects.filter(template__name__startswith=self.prefix).delete()
+        UserCard.objects.filter(owner__in=profiles).delete()
+        User.objects.filter(username__startswith=self.prefix).delete()
+        CardTemplate.objects.filter(name__startswith=self.prefix).delete()
+        Pack.objects.filter(name__startswith=self.prefix).delete()
+
+    # --- اجرای موازی ---
+
+    def _hammer(self, concurrency, requests, step):
+        """step(client, thread_index, request_index) در concurrency thread موازی؛ خروجی (Stats، ثانیه)"""
+        stats = Stats()
+        barrier = threading.Barrier(concurrency)
+
+        def worker(index):
+            client = Client(self.url, stats)
+            try:
+                barrier.wait()  # همه با هم شروع کنند
+                for number in range(requests):
+                    step(client, index, number)
+            finally:
+                client.close()
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        self._report(stats, elapsed)
+        return stats, elapsed
+
+    def _report(self, stats, elapsed):
+        for endpoint, row in stats.summary(elapsed).items():
+            statuses = ', '.join(f'{code}×{n}' for code, n in sorted(stats.statuses[endpoint].items()))
+            self.stdout.write(
+                f"  {endpoint}: {row['count']} درخواست، {row['rps']} req/s، "
+                f"p50 {row['p50_ms']} ms، p99 {row['p99_ms']} ms ({statuses})")
+
+    @staticmethod
+    def _ok(stats, endpoint):
+        return stats.statuses.get(endpoint, {}).get(200, 0)
+
+    # --- سناریوها ---
+
+    def _run_exchange(self, concurrency, requests, buyers):
+        """همهٔ threadها با یک پروفایل سکه به الماس تبدیل می‌کنند؛ سکه فقط برای نصف درخواست‌ها کافی است"""
+        budget = concurrency * requests // 2
+        profile, token = self._player('exchanger', coins=budget * 1000, gems=0)
+
+        stats, _ = self._hammer(concurrency, requests, lambda client, i, n: client.request(
+            'exchange', 'POST', '/exchange/', token, data={'coins': 1000}))
+
+        profile.refresh_from_db()
+        succeeded = self._ok(stats, 'exchange')
+        problems = []
+        if succeeded > budget:
+            problems.append(f'{succeeded} تبدیل موفق با سکهٔ کافی برای {budget}')
+        if profile.coins != (budget - succeeded) * 1000 or profile.gems != succeeded * 25:
+            problems.append(f'موجودی نهایی coins={profile.coins} gems={profile.gems} '
+                            f'با {succeeded} تبدیل موفق نمی‌خواند')
+        return problems
+
+    def _run_open_pack(self, concurrency, requests, buyers):
+        """باز کردن پک موازی با یک پروفایل؛ الماس فقط برای نصف درخواست‌ها کافی است"""
+        pack = Pack.objects.create(name=f'{self.prefix}pack', image='packs/stress.png', price=10,
+                                   card_count=3, chance_common=100, chance_rare=0, chance_epic=0)
+        budget = concurrency * requests // 2
+        profile, token = self._player('opener', gems=budget * pack.price)
+
+        stats, _ = self._hammer(concurrency, requests, lambda client, i, n: client.request(
+            'open_pack', 'POST', '/open-pack/', token, data={'pack_id': pack.pk}))
+
+        profile.refresh_from_db()
+        succeeded = self._ok(stats, 'open_pack')
+        owned = UserCard.objects.filter(owner=profile).count()
+        problems = []
+        if succeeded > budget:
+            problems.append(f'{succeeded} پک باز شد با الماس کافی برای {budget}')
+        if profile.gems != (budget - succeeded) * pack.price:
+            problems.append(f'الماس نهایی {profile.gems} با {succeeded} پک موفق نمی‌خواند')
+        if owned != succeeded * pack.card_count:
+            problems.append(f'{owned} کارت برای {succeeded} پک {pack.card_count}تایی')
+        if stats.statuses.get('open_pack', {}).get(429):
+            self.stdout.write('  (بخشی از درخواست‌ها throttle شد؛ برای فشار بیشتر GAME_THROTTLE_BUCKETS '
+                              'سرور را بازتر کنید)')
+        return problems
+
+    def _run_buy(self, concurrency, requests, buyers):
+        """
+        همه به یک آگهی هجوم می‌برند، بعد بازیکن‌ها کارت‌های همدیگر را به صورت متقابل
+        می‌خرند (خرید A از B همزمان با B از A برای پیدا کردن بن‌بست)
+        """
+        price = 100
+        players = [self._player(f'trader{i}', vow_fragments=price * requests) for i in range(buyers)]
+        listings = []
+        for profile, _ in players:
+            for card in self._cards(profile, max(1, requests // 2)):
+                card.is_listed_in_market = True
+                card.save(update_fields=['is_listed_in_market'])
+                listings.append(MarketListing.objects.create(seller=profile, card_instance=card, price=price))
+        hot = listings[0]
+        profiles = [profile for profile, _ in players]
+        total_before = self._vow(profiles)
+
+        # 1. همه یک آگهی را می‌خرند
+        def rush(client, index, number):
+            _, token = players[1 + index % (buyers - 1)]
+            client.request('buy_same', 'POST', f'/market/buy/{hot.pk}/', token, data={'listing_id': hot.pk})
+
+        stats, _ = self._hammer(concurrency, 1, rush)
+        problems = []
+        if self._ok(stats, 'buy_same') != 1:
+            problems.append(f"آگهی {hot.pk} {self._ok(stats, 'buy_same')} بار فروخته شد")
+
+        # 2. خرید متقابل همهٔ آگهی‌ها به ترتیب تصادفی
+        orders = []
+        for index in range(concurrency):
+            order = listings[1:]
+            self.rng.shuffle(order)
+            orders.append(order)
+
+        def trade(client, index, number):
+            _, token = players[index % buyers]
+            listing = orders[index][number % len(orders[index])]
+            client.request('buy', 'POST', f'/market/buy/{listing.pk}/', token, data={'listing_id': listing.pk})
+
+        stats, _ = self._hammer(concurrency, requests, trade)
+
+        sold = MarketListing.objects.filter(pk__in=[listing.pk for listing in listings], is_active=False)
+        total_after = self._vow(profiles)
+        if total_after != total_before:
+            problems.append(f'مجموع Vow Fragments از {total_before} به {total_after} رسید')
+        if sold.filter(card_instance__owner=F('seller')).exists():
+            problems.append('کارت فروخته‌شده هنوز مال فروشنده است')
+        if sold.filter(card_instance__is_listed_in_market=True).exists():
+            problems.append('کارت فروخته‌شده هنوز در بازار علامت خورده است')
+        changed_hands = UserCard.objects.filter(
+            pk__in=[listing.card_instance_id for listing in listings]).exclude(
+            market_listing__seller=F('owner')).count()
+        if changed_hands != sold.count():
+            problems.append(f'{changed_hands} کارت جابه‌جا شده برای {sold.count()} فروش')
+        return problems
+
+    @staticmethod
+    def _vow(profiles):
+        return PlayerProfile.objects.filter(pk__in=[p.pk for p in profiles]).aggregate(
+            total=Sum('vow_fragments'))['total']
+
+    # --- invariantهای کلی ---
+
+    @staticmethod
+    def _template_counts():
+        return {pk: (minted, cards) for pk, minted, cards in
+                CardTemplate.objects.annotate(cards=Count('instances')).values_list('pk', 'minted_count', 'cards')}
+
+    def _global_invariants(self, before):
+        problems = []
+        profiles = PlayerProfile.objects.filter(user__username__startswith=self.prefix)
+        negative = profiles.filter(coins__lt=0) | profiles.filter(gems__lt=0) | profiles.filter(vow_fragments__lt=0)
+        for username in negative.values_list('user__username', flat=True):
+            problems.append(f'موجودی منفی برای {username}')
+
+        # پک‌ها از همهٔ تمپلیت‌ها کارت می‌سازند؛ پس تغییر minted_count هر تمپلیت باید با
+        # تعداد کارت‌های جدیدش برابر باشد (نه خود مقدارها، چون دادهٔ قبلی ممکن است فاصله داشته باشد)
+        for pk, (minted, cards) in self._template_counts().items():
+            old_minted, old_cards = before.get(pk, (0, 0))
+            if minted - old_minted != cards - old_cards:
+                problems.append(f'تمپلیت {pk}: minted_count {minted - old_minted} بالا رفت '
+                                f'ولی {cards - old_cards} کارت ساخته شد')
+
+        duplicates = (UserCard.objects.filter(template__name__startswith=self.prefix)
+                      .values('template', 'serial_number').annotate(n=Count('id')).filter(n__gt=1))
+        if duplicates.exists():
+            problems.append('serial تکراری')
+        return problems
@@ -0,0 +1,106 @@
+"""
+هیستوگرام‌های داخل پروسه برای زمان پاسخ endpointها (فرمت متنی Prometheus)
+
+PerformanceMiddleware برای هر درخواست به viewهای game تعداد کوئری، زمان
+دیتابیس، زمان encode و کل زمان را اینجا ثبت می‌کند و endpoint metrics/ آن را
+برای Prometheus خروجی می‌دهد. زمان encode فقط کار renderer است (تبدیل data به
+بایت)؛ ساختن data با سریالایزر داخل view و جزو کل زمان حساب می‌شود. داده‌ها مال همین پروسه است؛ با چند worker
+Prometheus باید هر worker را جدا scrape کند (یا جمع آن‌ها را با sum by گرفت).
+"""
+import bisect
+import threading
+
+# ثانیه
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    """هیستوگرام تجمعی با bucketهای ثابت"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # آخری: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+# نام متریک -> (توضیح، bucketها)
+HISTOGRAMS = {
+    'game_request_duration_seconds': ('Total request latency', LATENCY_BUCKETS),
+    'game_request_db_seconds': ('Time spent in database queries', LATENCY_BUCKETS),
+    'game_request_encode_seconds': ('Time spent encoding response data to bytes (renderer only)', LATENCY_BUCKETS),
+    'game_request_queries': ('Database queries per request', QUERY_BUCKETS),
+}
+
+_lock = threading.Lock()
+_histograms = {}  # (name, view) -> Histogram
+_requests = {}  # (view, status) -> count
+
+
+def observe_request(view, status, duration, db_time, encode_time, queries):
+    values = {
+        'game_request_duration_seconds': duration,
+        'game_request_db_seconds': db_time,
+        'game_request_encode_seconds': encode_time,
+        'game_request_queries': queries,
+    }
+    with _lock:
+        for name, value in values.items():
+            histogram = _histograms.get((name, view))
+            if histogram is None:
+                histogram = _histograms[(name, view)] = Histogram(HISTOGRAMS[name][1])
+            histogram.observe(value)
+        _requests[(view, status)] = _requests.get((view, status), 0) + 1
+
+
+def reset_metrics():
+    with _lock:
+        _histograms.clear()
+        _requests.clear()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    """همهٔ متریک‌ها در Prometheus text exposition format 0.0.4"""
+    with _lock:
+        histograms = {key: (list(h.cumulative()), h.sum, h.count) for key, h in _histograms.items()}
+        requests = dict(_requests)
+
+    lines = [
+        '# HELP game_requests_total Requests handled per view and status code',
+        '# TYPE game_requests_total counter',
+    ]
+    for (view, status), count in sorted(requests.items()):
+        lines.append(f'game_requests_total{{view="{_label(view)}",status="{status}"}} {count}')
+
+    for name, (help_text, _buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for (metric, view), (buckets, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            view = _label(view)
+            for bound, cumulative in buckets:
+                lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{view="{view}"}} {_number(total)}')
+            lines.append(f'{name}_count{{view="{view}"}} {count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,102 @@
+"""
+میکروبنچمارک با warmup، تکرار و مقایسهٔ آماری با baseline
+
+هر بنچمارک یک تابع بدون ورودی است. اول تعداد اجرای داخلی (number) طوری تنظیم
+می‌شود که هر تکرار حداقل min_time طول بکشد (مثل timeit)، بعد warmup دور بدون
+ثبت و repeat دور با ثبت اجرا می‌شود. نتیجه زمان هر اجرا (ثانیه) است.
+
+مقایسه با baseline با آزمون t ولش (Welch) روی میانگین تکرارها انجام می‌شود:
+تغییری «کندتر/سریع‌تر» حساب می‌شود که هم از tolerance بزرگ‌تر باشد و هم از نظر
+آماری معنادار (|t| > T_CRITICAL)، تا نویز ماشین رگرسیون گزارش نشود.
+"""
+import math
+import statistics
+import time
+
+# تقریباً سطح اطمینان 95٪ برای تعداد تکرار معمول (10 به بالا)
+T_CRITICAL = 2.0
+MAX_NUMBER = 1_000_000
+
+
+def _run(func, number, setup=None, teardown=None):
+    """زمان کل number اجرا؛ با setup/teardown هر اجرا جدا زمان گرفته می‌شود و خودشان حساب نمی‌شوند"""
+    if setup is None and teardown is None:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        return time.perf_counter() - start
+
+    total = 0.0
+    for _ in range(number):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        try:
+            func()
+        finally:
+            total += time.perf_counter() - start
+            if teardown is not None:
+                teardown()
+    return total
+
+
+def calibrate(func, min_time, setup=None, teardown=None):
+    number = 1
+    while number < MAX_NUMBER:
+        elapsed = _run(func, number, setup, teardown)
+        if elapsed >= min_time:
+            break
+        # رساندن به min_time با یک حدس (حداکثر 10 برابر در هر قدم)
+        number = min(MAX_NUMBER, number * min(10, max(2, math.ceil(min_time / max(elapsed, 1e-9)))))
+    return number
+
+
+def measure(func, warmup=2, repeat=10, min_time=0.05, setup=None, teardown=None):
+    number = calibrate(func, min_time, setup, teardown)
+    for _ in range(warmup):
+        _run(func, number, setup, teardown)
+    samples = [_run(func, number, setup, teardown) / number for _ in range(repeat)]
+    return summarize(samples, number)
+
+
+def summarize(samples, number):
+    return {
+        'n': len(samples),
+        'number': number,
+        'mean': statistics.fmean(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'max': max(samples),
+    }
+
+
+def welch_t(a, b):
+    """t ولش برای دو خلاصهٔ summarize؛ مثبت یعنی a کندتر از b"""
+    variance = a['stdev'] ** 2 / a['n'] + b['stdev'] ** 2 / b['n']
+    if variance == 0:
+        difference = a['mean'] - b['mean']
+        return 0.0 if difference == 0 else math.copysign(math.inf, difference)
+    return (a['mean'] - b['mean']) / math.sqrt(variance)
+
+
+def compare(current, baseline, tolerance):
+    """
+    نام -> {change, t, verdict} برای بنچمارک‌های مشترک
+    verdict: 'slower'، 'faster' یا 'same'
+    """
+    result = {}
+    for name, now in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = now['mean'] / before['mean'] - 1 if before['mean'] else 0.0
+        t = welch_t(now, before)
+        if change > tolerance and t > T_CRITICAL:
+            verdict = 'slower'
+        elif change < -tolerance and t < -T_CRITICAL:
+            verdict = 'faster'
+        else:
+            verdict = 'same'
+        result[name] = {'change': round(change, 4), 't': round(t, 2), 'verdict': verdict}
+    return result
@@ -0,0 +1,159 @@
+import time
+from contextlib import ExitStack
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+from .authentication import aget_session_user, get_session_user
+from . import slowlog
+from .metrics import observe_request
+
+
+def _get_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = get_session_user(request)
+    return request._cached_user
+
+
+async def _auser(request):
+    if not hasattr(request, '_acached_user'):
+        if hasattr(request, '_cached_user'):
+            request._acached_user = request._cached_user
+        else:
+            request._acached_user = await aget_session_user(request)
+    return request._acached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware با کاربر کش‌شده (game.authentication)"""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: _get_user(request))
+        request.auser = partial(_auser, request)
+
+
+class QueryStats:
+    """execute_wrapper که تعداد و زمان کوئری‌های یک درخواست را می‌شمارد"""
+
+    def __init__(self, request):
+        self.request = request
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+
+
+class SlowQueryMiddleware:
+    """
+    ثبت کوئری‌های کند هر درخواست در game.slowlog، مستقل از PerformanceMiddleware
+    (با GAME_PERF_METRICS=False هم کار می‌کند)؛ با GAME_SLOW_QUERY_MS=0 نصب نمی‌شود
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'GAME_SLOW_QUERY_MS', 100):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with slowlog.capture_slow_queries(request=request):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with slowlog.capture_slow_queries(request=request):
+            return await self.get_response(request)
+
+
+def _game_views():
+    # مقایسه با خود view (نه فقط نام URL) چون نام‌هایی مثل login در admin هم هستند
+    from . import urls
+    return {pattern.callback for pattern in urls.urlpatterns if getattr(pattern, 'name', None)}
+
+
+class PerformanceMiddleware:
+    """
+    برای هر درخواست به endpointهای game.urls تعداد کوئری، زمان دیتابیس، زمان encode
+    و کل زمان را در game.metrics ثبت می‌کند و هدر Server-Timing می‌فرستد.
+    زمان encode فقط تبدیل response.data به بایت (renderer) است؛ ساختن data (سریالایزر
+    یا مسیرهای سریع) داخل view انجام می‌شود و جزو زمان view است.
+    باید اولین middleware باشد تا کل زمان را ببیند. کوئری‌ها و زمان پاسخ‌های
+    استریم بعد از برگشتن response (هنگام ارسال بدنه) شمرده نمی‌شوند.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'GAME_PERF_METRICS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.game_views = None
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        stats = QueryStats(request)
+        with self._wrap_connections(stats):
+            response = self.get_response(request)
+        return self._finish(request, response, start, stats)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        stats = QueryStats(request)
+        with self._wrap_connections(stats):
+            response = await self.get_response(request)
+        return self._finish(request, response, start, stats)
+
+    def _wrap_connections(self, stats):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        return stack
+
+    def process_template_response(self, request, response):
+        # پاسخ‌های DRF درست بعد از این متد رندر (encode) می‌شوند
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._game_encode_time = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def _finish(self, request, response, start, stats):
+        match = getattr(request, 'resolver_match', None)
+        if self.game_views is None:
+            self.game_views = _game_views()
+        if match is None or match.func not in self.game_views:
+            return response
+
+        duration = time.perf_counter() - start
+        encode_time = getattr(request, '_game_encode_time', 0.0)
+        observe_request(match.url_name, response.status_code, duration, stats.time, encode_time, stats.count)
+        response['Server-Timing'] = (
+            f'db;dur={stats.time * 1000:.1f};desc="{stats.count} queries", '
+            f'encode;dur={encode_time * 1000:.1f}, '
+            f'total;dur={duration * 1000:.1f}'
+        )
+        return response
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0011_alter_marketlisting_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='usercard',
+            name='game_userca_owner_i_21d4cf_idx',
+        ),
+        migrations.AddIndex(
+            model_name='usercard',
+            index=models.Index(fields=['owner', 'is_listed_in_market', 'id'], name='game_userca_owner_i_284fc9_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0012_usercard_inventory_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerprofile',
+            name='inventory_seq',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='شمارنده تغییرات کارت\u200cها'),
+        ),
+        migrations.CreateModel(
+            name='InventoryChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveBigIntegerField()),
+                ('card_id', models.BigIntegerField()),
+                ('removed', models.BooleanField(default=False)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_changes', to='game.playerprofile')),
+            ],
+            options={
+                'unique_together': {('owner', 'seq')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0014_idempotency_record'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='playerprofile',
+            index=models.Index(fields=['-coins', '-id'], name='game_player_coins_dc2a5c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='playerprofile',
+            index=models.Index(fields=['-current_mining_rate', '-coins'], name='game_player_current_5aa0b0_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0015_profile_ordering_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(max_length=50, verbose_name='عملیات')),
+                ('status', models.CharField(choices=[('PENDING', 'در صف'), ('RUNNING', 'در حال اجرا'), ('DONE', 'تمام شد'), ('FAILED', 'خطا')], default='PENDING', max_length=10, verbose_name='وضعیت')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='کل ردیف\u200cها')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='بررسی\u200cشده')),
+                ('affected', models.PositiveIntegerField(default=0, verbose_name='تغییرکرده')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'عملیات گروهی',
+                'verbose_name_plural': 'عملیات\u200cهای گروهی',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
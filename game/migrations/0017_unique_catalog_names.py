@@ -0,0 +1,41 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:13
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def rename_duplicate_names(apps, schema_editor):
+    """
+    قبل از محدودیت unique: از هر نام تکراری قدیمی‌ترین ردیف (کمترین pk) نامش را
+    نگه می‌دارد و بقیه «نام (#pk)» می‌شوند؛ کارت‌ها با FK به تمپلیت وصل‌اند پس چیزی گم نمی‌شود
+    """
+    for model_name in ('CardTemplate', 'Pack'):
+        model = apps.get_model('game', model_name)
+        duplicates = (model.objects.values('name').annotate(count=Count('pk'))
+                      .filter(count__gt=1).values_list('name', flat=True))
+        for name in list(duplicates):
+            for obj in model.objects.filter(name=name).order_by('pk')[1:]:
+                suffix = f' (#{obj.pk})'
+                obj.name = name[:100 - len(suffix)] + suffix
+                obj.save(update_fields=['name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0016_bulk_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_names, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cardtemplate',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='pack',
+            name='name',
+            field=models.CharField(max_length=100, unique=True, verbose_name='نام پک'),
+        ),
+    ]
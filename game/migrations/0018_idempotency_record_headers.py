@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0017_unique_catalog_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencyrecord',
+            name='headers',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
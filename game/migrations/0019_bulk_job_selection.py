@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0018_idempotency_record_headers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkjob',
+            name='last_pk',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bulkjob',
+            name='selection',
+            field=models.JSONField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='bulkjob',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
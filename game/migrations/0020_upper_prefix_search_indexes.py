@@ -0,0 +1,42 @@
+# Generated by Django 5.2.9 on 2026-10-19 19:20
+
+from django.conf import settings
+from django.db import migrations
+
+# جستجوی istartswith در PostgreSQL به UPPER(col::text) LIKE UPPER(%s) تبدیل می‌شود؛
+# ایندکس باید روی همین عبارت با text_pattern_ops باشد تا در هر locale برای LIKE
+# استفاده شود. SQLite و MySQL خودشان LIKE را بدون حساسیت به حروف روی ایندکس عادی اجرا می‌کنند.
+INDEXES = [
+    (settings.AUTH_USER_MODEL, 'username', 'game_user_username_upper_like'),
+    ('game.CardTemplate', 'name', 'game_cardtemplate_name_upper_like'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    quote = schema_editor.quote_name
+    for model, field, name in INDEXES:
+        meta = apps.get_model(model)._meta
+        column = meta.get_field(field).column
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {quote(name)} ON {quote(meta.db_table)} '
+                              f'(UPPER({quote(column)}::text) text_pattern_ops)')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model, field, name in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(name)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0019_bulk_job_selection'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
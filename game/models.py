@@ -37,6 +37,17 @@ class PlayerProfile(models.Model):
     level = models.PositiveIntegerField(default=1, verbose_name="سطح")
     xp = models.BigIntegerField(default=0, verbose_name="تجربه")
 
+    # شمارندهٔ تغییرات کارت‌ها (برای delta sync)؛ فقط با F() بالا می‌رود
+    inventory_seq = models.PositiveBigIntegerField(default=0, verbose_name="شمارنده تغییرات کارت‌ها")
+
+    class Meta:
+        indexes = [
+            # مرتب‌سازی ادمین (-coins و pk برای ترتیب قطعی)
+            models.Index(fields=['-coins', '-id']),
+            # leaderboard: ده ردیف اول بدون sort روی کل جدول
+            models.Index(fields=['-current_mining_rate', '-coins']),
+        ]
+
     def __str__(self):
         return self.user.username
 
@@ -46,22 +57,26 @@ class PlayerProfile(models.Model):
 
     def update_mining_rate(self):
         """محاسبهٔ نرخ استخراج بر اساس کارت‌های تجهیزشده و level"""
+        # یک کوئری برای هر سه اسلات، به جای بارگذاری جداگانهٔ کارت و تمپلیت هر اسلات
+        slot_ids = [pk for pk in (self.slot_1_id, self.slot_2_id, self.slot_3_id) if pk]
         base_rate = 0
-        if self.slot_1 and self.slot_1.template:
-            base_rate += self.slot_1.template.mining_rate
-        if self.slot_2 and self.slot_2.template:
-            base_rate += self.slot_2.template.mining_rate
-        if self.slot_3 and self.slot_3.template:
-            base_rate += self.slot_3.template.mining_rate
-        
-        # ضریب: هر لول 5 درصد اضافه می‌کند
-        multiplier = 1 + (self.level * 0.05)
-        final_rate = int(base_rate * multiplier)
+        if slot_ids:
+            base_rate = UserCard.objects.filter(pk__in=slot_ids).aggregate(
+                total=models.Sum('template__mining_rate'))['total'] or 0
         
+        final_rate = self.rate_for(base_rate, self.level)
+
         self.current_mining_rate = final_rate
         self.save(update_fields=['current_mining_rate'])
         return final_rate
     
+    @staticmethod
+    def rate_for(base_rate, level):
+        """نرخ نهایی از مجموع نرخ کارت‌های تجهیزشده (برای محاسبهٔ گروهی هم استفاده می‌شود)"""
+        # ضریب: هر لول 5 درصد اضافه می‌کند
+        multiplier = 1 + (level * 0.05)
+        return int(base_rate * multiplier)
+
     @property
     def mining_rate_display(self):
         return self.current_mining_rate
@@ -74,7 +89,8 @@ class Pack(models.Model):
         ('COINS', 'سکه'),
     ]
 
-    name = models.CharField(max_length=100, verbose_name="نام پک")
+    # یکتا تا import_catalog بتواند بر اساس نام upsert کند
+    name = models.CharField(max_length=100, unique=True, verbose_name="نام پک")
     image = models.ImageField(upload_to='packs/', verbose_name="تصویر پک")
     price = models.PositiveIntegerField(verbose_name="قیمت")
     currency_type = models.CharField(max_length=10, choices=CURRENCY_CHOICES, default='GEMS', verbose_name="نوع ارز")
@@ -100,7 +116,8 @@ class CardTemplate(models.Model):
         ('EPIC', 'حماسی'),
         ('LEGENDARY', 'افسانه‌ای'),
     ]
-    name = models.CharField(max_length=100)
+    # یکتا تا import_catalog بتواند بر اساس نام upsert کند
+    name = models.CharField(max_length=100, unique=True)
     image = models.ImageField(upload_to='cards/')
     rarity = models.CharField(
         max_length=20, choices=RARITY_CHOICES, default='COMMON')
@@ -123,7 +140,8 @@ class UserCard(models.Model):
     
     class Meta:
         unique_together = ('template', 'serial_number')
-        indexes = [models.Index(fields=['owner', 'is_listed_in_market'])]
+        # ایندکس صفحه‌بندی keyset در inventory: (owner, is_listed_in_market, id)
+        indexes = [models.Index(fields=['owner', 'is_listed_in_market', 'id'])]
 
     def __str__(self):
         return f"{self.template.name} #{self.serial_number}"
@@ -162,3 +180,92 @@ class MarketListing(models.Model):
     
     def __str__(self):
         return f"{self.card_instance.template.name} - {self.price} Vow Fragments"
+
+
+class InventoryChange(models.Model):
+    """
+    لاگ تغییرات کارت‌های هر بازیکن برای همگام‌سازی افزایشی (delta sync)
+    هر ردیف یعنی کارت card_id در شمارهٔ seq اضافه/تغییر کرده یا از دست بازیکن خارج شده است
+    """
+    owner = models.ForeignKey(
+        PlayerProfile, on_delete=models.CASCADE, related_name='inventory_changes')
+    seq = models.PositiveBigIntegerField()
+    # FK نیست چون کارت ممکن است حذف شده باشد و tombstone باید بماند
+    card_id = models.BigIntegerField()
+    removed = models.BooleanField(default=False)
+
+    class Meta:
+        # ایندکس یکتای (owner, seq) همان range scan مورد نیاز sync است
+        unique_together = ('owner', 'seq')
+
+    def __str__(self):
+        action = 'removed' if self.removed else 'changed'
+        return f"{self.owner_id}#{self.seq}: card {self.card_id} {action}"
+
+
+class IdempotencyRecord(models.Model):
+    """
+    پاسخ ذخیره‌شدهٔ یک درخواست با هدر Idempotency-Key
+    status_code خالی یعنی درخواست اصلی هنوز در حال اجراست
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_records')
+    key = models.CharField(max_length=64)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    body = models.JSONField(null=True, blank=True)
+    # هدرهایی از پاسخ که در replay هم لازم‌اند (مثل Retry-After)
+    headers = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        return f"{self.user_id}:{self.key} ({self.status_code or 'pending'})"
+
+
+class BulkJob(models.Model):
+    """
+    اجرای پس‌زمینهٔ یک action ادمین روی انتخاب‌های بزرگ (game.bulk)
+    processed تعداد ردیف‌های بررسی‌شده و affected تعداد ردیف‌های واقعاً تغییرکرده است
+    selection بازه‌های pk انتخاب ([[اول، آخر], ...]) و last_pk آخرین pk تکهٔ commit‌شده
+    است تا job بعد از بسته شدن پروسه از همان‌جا ادامه پیدا کند؛ updated_at با هر تکه جلو می‌رود
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'در صف'),
+        ('RUNNING', 'در حال اجرا'),
+        ('DONE', 'تمام شد'),
+        ('FAILED', 'خطا'),
+    ]
+
+    action = models.CharField(max_length=50, verbose_name="عملیات")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING', verbose_name="وضعیت")
+    total = models.PositiveIntegerField(default=0, verbose_name="کل ردیف‌ها")
+    processed = models.PositiveIntegerField(default=0, verbose_name="بررسی‌شده")
+    affected = models.PositiveIntegerField(default=0, verbose_name="تغییرکرده")
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    selection = models.JSONField(null=True, editable=False)
+    last_pk = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "عملیات گروهی"
+        verbose_name_plural = "عملیات‌های گروهی"
+
+    def __str__(self):
+        return f"{self.action} #{self.pk} ({self.status})"
+
+    @property
+    def is_running(self):
+        return self.status in ('PENDING', 'RUNNING')
+
+    @property
+    def percent(self):
+        if not self.total:
+            return 100 if not self.is_running else 0
+        return min(100, int(self.processed * 100 / self.total))
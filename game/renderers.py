@@ -0,0 +1,82 @@
+"""
+رندررها و پارسرهای سریع برای API
+
+FastJSONRenderer همان بایت‌های JSONRenderer پیش‌فرض DRF را تولید می‌کند ولی با
+orjson؛ برای datetime و Decimal و بقیهٔ نوع‌های خاص از همان encoder خود DRF
+استفاده می‌شود تا کلاینت‌ها تفاوتی نبینند. اگر orjson نصب نباشد یا نتواند داده
+را encode کند، به JSONRenderer معمولی برمی‌گردد.
+
+MessagePack با هدر Accept: application/msgpack انتخاب می‌شود و بدنهٔ درخواست
+با Content-Type: application/msgpack هم پذیرفته می‌شود.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+_drf_encoder = encoders.JSONEncoder()
+
+if orjson is not None:
+    # datetime ها به encoder خود DRF سپرده می‌شوند (فرمت ...Z به جای +00:00)
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    return _drf_encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # خروجی تورفته (مثلاً Browsable API) همان مسیر قدیمی را می‌رود
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            # مثلاً عدد صحیح بزرگ‌تر از 64 بیت
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # مثل JSONRenderer: \u2028 و \u2029 همیشه escape می‌شوند
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if msgpack is None:
+            raise ImproperlyConfigured('MessagePackRenderer requires the msgpack package.')
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if msgpack is None:
+            raise ImproperlyConfigured('MessagePackParser requires the msgpack package.')
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except Exception as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
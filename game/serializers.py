@@ -11,6 +11,13 @@ class AvatarSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'image', 'is_premium']
 
 
+class CardTemplateSerializer(serializers.ModelSerializer):
+    # minted_count عمداً نیست: با هر باز شدن پک تغییر می‌کند و کاتالوگ را بی‌اعتبار می‌کرد
+    class Meta:
+        model = CardTemplate
+        fields = ['id', 'name', 'image', 'rarity', 'mining_rate', 'max_supply']
+
+
 class UserCardSerializer(serializers.ModelSerializer):
     # این فیلدها را از مدل Template می‌کشیم بیرون تا مستقیم در دسترس باشند
     card_name = serializers.CharField(source='template.name', read_only=True)
@@ -27,6 +34,15 @@ class UserCardSerializer(serializers.ModelSerializer):
                   'mining_rate', 'rarity', 'is_listed_in_market', 'max_supply']
 
 
+class UserCardCompactSerializer(serializers.ModelSerializer):
+    """نسخهٔ فشرده: اطلاعات تمپلیت فقط با شناسه، بقیه از کاتالوگ خوانده می‌شود"""
+    template_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = UserCard
+        fields = ['id', 'serial_number', 'template_id', 'is_listed_in_market']
+
+
 class PlayerProfileSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     # آواتار را به صورت کامل می‌فرستیم تا عکسش را داشته باشیم
@@ -127,3 +143,111 @@ class PackSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'price', 'currency_type', 'image', 'description']
 
 
+# ---------------------------------------------------------
+# مسیرهای سریع فقط‌خواندنی برای endpointهای پرترافیک
+# خروجی دقیقاً همان سریالایزرهای بالاست، ولی به جای ساختن مدل و پیمودن
+# source='template.x' برای هر فیلد، مستقیم از .values_list() ساخته می‌شود.
+# ---------------------------------------------------------
+
+_card_image_field = CardTemplate._meta.get_field('image')
+_avatar_image_field = Avatar._meta.get_field('image')
+
+USER_CARD_COLUMNS = (
+    'id', 'serial_number', 'template__name', 'template__image', 'template__mining_rate',
+    'template__rarity', 'is_listed_in_market', 'template__max_supply',
+)
+
+
+def _image_url(field, name):
+    # همان رفتار ImageField در DRF بدون request: مسیر نسبی storage یا None
+    return field.storage.url(name) if name else None
+
+
+def _card_row(row):
+    pk, serial, name, image, mining_rate, rarity, listed, max_supply = row
+    return {
+        'id': pk,
+        'serial_number': serial,
+        'card_name': name,
+        'image': _image_url(_card_image_field, image),
+        'mining_rate': mining_rate,
+        'rarity': rarity,
+        'is_listed_in_market': listed,
+        'max_supply': max_supply,
+    }
+
+
+def iter_user_cards(queryset, chunk_size=None):
+    """معادل UserCardSerializer(queryset, many=True).data به صورت generator"""
+    rows = queryset.values_list(*USER_CARD_COLUMNS)
+    if chunk_size:
+        rows = rows.iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield _card_row(row)
+
+
+def iter_user_cards_compact(queryset, chunk_size=None):
+    """معادل UserCardCompactSerializer(queryset, many=True).data به صورت generator"""
+    rows = queryset.values_list('id', 'serial_number', 'template_id', 'is_listed_in_market')
+    if chunk_size:
+        rows = rows.iterator(chunk_size=chunk_size)
+    for pk, serial, template_id, listed in rows:
+        yield {
+            'id': pk,
+            'serial_number': serial,
+            'template_id': template_id,
+            'is_listed_in_market': listed,
+        }
+
+
+def user_cards_data(queryset):
+    return list(iter_user_cards(queryset))
+
+
+def _card_instance(card):
+    if card is None:
+        return None
+    template = card.template
+    return {
+        'id': card.id,
+        'serial_number': card.serial_number,
+        'card_name': template.name,
+        'image': _image_url(_card_image_field, template.image.name),
+        'mining_rate': template.mining_rate,
+        'rarity': template.rarity,
+        'is_listed_in_market': card.is_listed_in_market,
+        'max_supply': template.max_supply,
+    }
+
+
+def player_profile_data(profile):
+    """
+    معادل PlayerProfileSerializer(profile).data
+    پروفایل باید با select_related روی user، avatar و slot_n__template خوانده شده باشد
+    """
+    slot_cards = [profile.slot_1, profile.slot_2, profile.slot_3]
+    slot_data = [_card_instance(card) for card in slot_cards]
+
+    slots = []
+    for slot_num, data in enumerate(slot_data, 1):
+        if data is not None:
+            slots.append({**data, 'slot': slot_num, 'is_equipped': True})
+
+    avatar = profile.avatar
+    return {
+        'username': profile.user.username,
+        'coins': profile.coins,
+        'gems': profile.gems,
+        'vow_fragments': profile.vow_fragments,
+        'avatar_url': _image_url(_avatar_image_field, avatar.image.name) if avatar else None,
+        'avatar_id': avatar.id if avatar else None,
+        'slot_1': slot_data[0],
+        'slot_2': slot_data[1],
+        'slot_3': slot_data[2],
+        'slots': slots,
+        'total_mining_rate': profile.current_mining_rate,
+        'level': profile.level,
+        'xp': profile.xp,
+        'next_level_xp': profile.get_next_level_xp(),
+        'mining_multiplier': round(1 + (profile.level * 0.05), 2),
+    }
@@ -0,0 +1,47 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token, invalidate_user
+from .catalog import invalidate_catalog
+from .models import CardTemplate, Pack, Avatar, PlayerProfile
+
+
+@receiver(post_save, sender=CardTemplate)
+@receiver(post_save, sender=Pack)
+@receiver(post_save, sender=Avatar)
+def catalog_model_saved(sender, instance, update_fields=None, **kwargs):
+    # باز شدن پک فقط minted_count را ذخیره می‌کند که در کاتالوگ نیست
+    if update_fields and set(update_fields) <= {'minted_count'}:
+        return
+    invalidate_catalog()
+
+
+@receiver(post_delete, sender=CardTemplate)
+@receiver(post_delete, sender=Pack)
+@receiver(post_delete, sender=Avatar)
+def catalog_model_deleted(sender, instance, **kwargs):
+    invalidate_catalog()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # یک بار همین حالا و یک بار بعد از commit، تا درخواستی که وسط تراکنش
+    # کاربر قدیمی را دوباره کش کرده باشد هم پاک شود
+    invalidate_user(instance.pk)
+    transaction.on_commit(lambda: invalidate_user(instance.pk))
+
+
+@receiver(post_save, sender=PlayerProfile)
+def profile_created(sender, instance, created, **kwargs):
+    # کاربری که پیش از ساخته شدن پروفایل کش شده، profile_id ندارد
+    if created:
+        invalidate_user(instance.user_id)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_token(instance.key)
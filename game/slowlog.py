@@ -0,0 +1,164 @@
+"""
+ثبت کوئری‌های کند با view و stack مبدأ
+
+SlowQueryMiddleware (مستقل از متریک‌های PerformanceMiddleware) هر کوئری
+درخواست‌ها را زمان می‌گیرد؛ کوئری‌هایی که از
+GAME_SLOW_QUERY_MS کندترند (با نرخ نمونه‌برداری GAME_SLOW_QUERY_SAMPLE_RATE)
+همراه با نام URL، تابع مبدأ در game و یک stack کوتاه‌شده در یک ring buffer
+محدود نگه داشته می‌شوند. مقدار پارامترها ذخیره نمی‌شود، فقط شکل آن‌ها
+(نوع و طول)، تا دادهٔ کاربران در لاگ نماند.
+
+بافر داخل پروسه است؛ با GAME_SLOW_QUERY_CACHE=True در کش هم (به شکل ring buffer
+با شمارندهٔ مشترک) نوشته می‌شود تا دستور slow_queries و صفحهٔ ادمین در
+پروسه‌های دیگر هم آن را ببینند (این حالت به کش مشترک مثل Redis نیاز دارد).
+"""
+import random
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+SLOW_QUERY_MS = getattr(settings, 'GAME_SLOW_QUERY_MS', 100)
+SAMPLE_RATE = getattr(settings, 'GAME_SLOW_QUERY_SAMPLE_RATE', 1.0)
+BUFFER_SIZE = getattr(settings, 'GAME_SLOW_QUERY_BUFFER', 500)
+MIRROR_TO_CACHE = getattr(settings, 'GAME_SLOW_QUERY_CACHE', False)
+
+MAX_SQL_LENGTH = 2000
+STACK_DEPTH = 8
+# ماژول‌هایی که «تابع مبدأ» از بین آن‌ها انتخاب می‌شود
+ORIGIN_MODULES = ('game.views', 'game.async_views', 'game.admin')
+# فریم‌های خود ابزار اندازه‌گیری در stack نمی‌آیند
+SKIPPED_MODULES = ('game.slowlog', 'game.middleware')
+
+_CACHE_SEQ_KEY = 'game:slowlog:seq'
+_CACHE_TIMEOUT = 7 * 24 * 3600
+
+_lock = threading.Lock()
+_buffer = deque(maxlen=BUFFER_SIZE)
+
+
+def is_slow(duration):
+    return SLOW_QUERY_MS and duration * 1000 >= SLOW_QUERY_MS
+
+
+def params_shape(params, many=False):
+    """شکل پارامترها بدون مقدارشان: ['int', 'str', 'list[3]', ...]"""
+    if params is None:
+        return None
+    if many:
+        params = list(params)
+        return {'rows': len(params), 'row': params_shape(params[0]) if params else None}
+    if isinstance(params, dict):
+        return {key: params_shape([value])[0] for key, value in params.items()}
+    shape = []
+    for value in params:
+        if isinstance(value, (list, tuple)):
+            shape.append(f'{type(value).__name__}[{len(value)}]')
+        else:
+            shape.append(type(value).__name__)
+    return shape
+
+
+def _project_stack():
+    """(stack کوتاه‌شده از فریم‌های کد پروژه، تابع مبدأ در game)"""
+    base_dir = str(settings.BASE_DIR)
+    frames = []
+    origin = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        module = frame.f_globals.get('__name__', '')
+        if filename.startswith(base_dir) and 'site-packages' not in filename and module not in SKIPPED_MODULES:
+            if origin is None and module in ORIGIN_MODULES:
+                origin = f'{module}.{frame.f_code.co_name}'
+            if len(frames) < STACK_DEPTH:
+                frames.append(f'{filename[len(base_dir) + 1:]}:{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return frames, origin
+
+
+def record(sql, params, many, duration, view=None):
+    """ثبت یک کوئری کند (فقط وقتی از آستانه کندتر باشد و در نمونه بیفتد)"""
+    if not is_slow(duration) or random.random() >= SAMPLE_RATE:
+        return None
+    stack, origin = _project_stack()
+    entry = {
+        'at': time.time(),
+        'duration_ms': round(duration * 1000, 2),
+        'view': view,
+        'origin': origin,
+        'sql': sql[:MAX_SQL_LENGTH],
+        'params': params_shape(params, many),
+        'stack': stack,
+    }
+    with _lock:
+        _buffer.append(entry)
+    if MIRROR_TO_CACHE:
+        try:
+            seq = cache.incr(_CACHE_SEQ_KEY)
+        except ValueError:
+            cache.add(_CACHE_SEQ_KEY, 0, None)
+            seq = cache.incr(_CACHE_SEQ_KEY)
+        cache.set(f'game:slowlog:{seq % BUFFER_SIZE}', entry, _CACHE_TIMEOUT)
+    return entry
+
+
+def get_slow_queries(view=None, limit=None):
+    """کوئری‌های کند، جدیدترین اول"""
+    if MIRROR_TO_CACHE:
+        keys = [f'game:slowlog:{slot}' for slot in range(BUFFER_SIZE)]
+        entries = list(cache.get_many(keys).values())
+    else:
+        with _lock:
+            entries = list(_buffer)
+    if view:
+        entries = [entry for entry in entries if entry['view'] == view]
+    entries.sort(key=lambda entry: entry['at'], reverse=True)
+    return entries[:limit] if limit else entries
+
+
+def clear_slow_queries():
+    with _lock:
+        _buffer.clear()
+    if MIRROR_TO_CACHE:
+        cache.delete_many([f'game:slowlog:{slot}' for slot in range(BUFFER_SIZE)])
+
+
+class SlowQueryWrapper:
+    """
+    execute_wrapper ثبت کوئری‌های کند؛ با request نام URL درخواست (بعد از resolve)
+    و بدون آن view داده‌شده (مثلاً برای دستورات مدیریتی) ثبت می‌شود
+    """
+
+    def __init__(self, view=None, request=None):
+        self.view = view
+        self.request = request
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            if is_slow(elapsed):
+                record(sql, params, many, elapsed, self._view())
+
+    def _view(self):
+        if self.request is None:
+            return self.view
+        match = getattr(self.request, 'resolver_match', None)
+        return match.url_name if match else self.request.path
+
+
+@contextmanager
+def capture_slow_queries(view=None, request=None):
+    with ExitStack() as stack:
+        wrapper = SlowQueryWrapper(view, request)
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
-import { useAuthStore } from './store';
+import { useAuthStore, useGameStore } from './store';
 import { Notifications } from './components/Notification';
 import { LoadingSpinner, HomeIcon, CardIcon, ShopIcon, TrendingUpIcon, UserIcon, TrophyIcon } from './components/Icons';
 
@@ -21,10 +21,19 @@ const App: React.FC = () => {
   const [currentPage, setCurrentPage] = useState<Page>('dashboard');
   const [isSidebarOpen, setIsSidebarOpen] = useState(false);
 
+  const fetchBootstrap = useGameStore((state) => state.fetchBootstrap);
+
   useEffect(() => {
     checkAuth();
   }, [checkAuth]);
 
+  // Load profile, cards, packs, avatars, leaderboard and market in one go
+  useEffect(() => {
+    if (isAuthenticated) {
+      fetchBootstrap().catch(() => undefined);
+    }
+  }, [isAuthenticated, fetchBootstrap]);
+
   // Get current page path to determine initial page
   useEffect(() => {
     const path = window.location.pathname;
@@ -1,5 +1,5 @@
 import axios, { AxiosError, type AxiosInstance, type InternalAxiosRequestConfig } from 'axios';
-import type { APIError, PaginatedResponse } from './types';
+import type { APIError, CursorPage } from './types';
 
 const API_BASE_URL = '/api/game';
 
@@ -152,8 +152,92 @@ export function parseError(error: unknown): APIError {
   };
 }
 
+// Listings per market page (the server embeds the first page into base.html)
+const MARKET_PAGE_SIZE = 50;
+
+// Keys of the /bootstrap/ payload; base.html embeds EMBEDDED_BOOTSTRAP_KEYS
+export type BootstrapKey = 'profile' | 'cards' | 'packs' | 'avatars' | 'leaderboard' | 'market';
+export const BOOTSTRAP_KEYS: BootstrapKey[] = ['profile', 'cards', 'packs', 'avatars', 'leaderboard', 'market'];
+export const EMBEDDED_BOOTSTRAP_KEYS: BootstrapKey[] = ['profile', 'market'];
+
+// Initial game data embedded by the server into base.html (read once)
+let embeddedBootstrapConsumed = false;
+
+export function consumeEmbeddedBootstrap(): any | null {
+  if (embeddedBootstrapConsumed || typeof document === 'undefined') return null;
+  embeddedBootstrapConsumed = true;
+  const element = document.getElementById('game-bootstrap');
+  if (!element || !element.textContent) return null;
+  try {
+    return JSON.parse(element.textContent);
+  } catch {
+    return null;
+  }
+}
+
+// Mutations that must not run twice (opening packs, buying, claiming...).
+// One Idempotency-Key per user action; network failures and 409 (the first
+// attempt is still running) are retried with the same key, so the server
+// either runs the action once or replays its stored response.
+function newIdempotencyKey(): string {
+  if (typeof crypto !== 'undefined' && 'randomUUID' in crypto) {
+    return crypto.randomUUID();
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+async function postIdempotent(url: string, data?: unknown, retries = 2) {
+  const headers = { 'Idempotency-Key': newIdempotencyKey() };
+  for (let attempt = 0; ; attempt += 1) {
+    try {
+      const response = await apiClient.post(url, data, { headers });
+      return response.data;
+    } catch (error) {
+      const status = axios.isAxiosError(error) ? error.response?.status : -1;
+      const retryable = status === undefined || status === 409;
+      if (!retryable || attempt >= retries) throw error;
+      await new Promise((resolve) => setTimeout(resolve, 500 * (attempt + 1)));
+    }
+  }
+}
+
+// Server push (SSE): market events for everyone, balance events for the
+// logged-in player. Returns a function that closes the connection. onError
+// fires when the stream is unavailable (e.g. the server runs under WSGI) so
+// callers can fall back to polling.
+export type GameEvent =
+  | { type: 'listing_created'; data: Record<string, unknown> }
+  | { type: 'listing_sold'; data: { listing_id: number } }
+  | { type: 'listing_removed'; data: { listing_id: number } }
+  | { type: 'balance'; data: { coins: number; gems: number; vow_fragments: number; level: number; xp: number } };
+
+export function subscribeToEvents(onEvent: (event: GameEvent) => void, onError?: () => void): () => void {
+  if (typeof EventSource === 'undefined') {
+    onError?.();
+    return () => undefined;
+  }
+  const source = new EventSource(`${API_BASE_URL}/events/`, { withCredentials: true });
+  for (const type of ['listing_created', 'listing_sold', 'listing_removed', 'balance'] as const) {
+    source.addEventListener(type, (message) => {
+      onEvent({ type, data: JSON.parse((message as MessageEvent).data) } as GameEvent);
+    });
+  }
+  source.onerror = () => {
+    // CLOSED means the browser gave up reconnecting
+    if (source.readyState === EventSource.CLOSED) onError?.();
+  };
+  return () => source.close();
+}
+
 // API endpoints
 export const api = {
+  // Everything the game needs on first load, in one request; `only` limits it to
+  // the keys the page did not embed
+  getBootstrap: async (only?: BootstrapKey[]) => {
+    const response = await apiClient.get('/bootstrap/', { params: only ? { only: only.join(',') } : undefined });
+    return response.data;
+  },
+
   // Auth
   login: async (username: string, password: string) => {
     const response = await apiClient.post<{ token: string; user: any }>('/auth/login/', { username, password });
@@ -182,19 +266,24 @@ export const api = {
 
   // Mining
   claimMiningReward: async () => {
-    const response = await apiClient.post('/claim/');
-    return response.data;
+    return postIdempotent('/claim/');
   },
 
   exchangeCurrency: async (amount: number) => {
-    const response = await apiClient.post('/exchange/', { amount });
-    return response.data;
+    return postIdempotent('/exchange/', { amount });
   },
 
   // Cards
   getMyCards: async () => {
-    const response = await apiClient.get<PaginatedResponse<any>>('/my-cards/');
-    return response.data.results;
+    // Walk the keyset pages until the server stops returning a next cursor
+    const cards: any[] = [];
+    let url: string | null = '/my-cards/?limit=200';
+    while (url) {
+      const response: { data: CursorPage<any> } = await apiClient.get<CursorPage<any>>(url);
+      cards.push(...response.data.results);
+      url = response.data.next;
+    }
+    return cards;
   },
 
   equipCard: async (cardId: number, slot: number) => {
@@ -214,8 +303,7 @@ export const api = {
   },
 
   openPack: async (packId: number) => {
-    const response = await apiClient.post('/open-pack/', { pack_id: packId });
-    return response.data;
+    return postIdempotent('/open-pack/', { pack_id: packId });
   },
 
   // Marketplace
@@ -224,14 +312,21 @@ export const api = {
     return response.data;
   },
 
+  // One page of active listings, newest first; pass the previous page's `next` URL to continue
+  getMarketPage: async (next?: string | null) => {
+    const response = next
+      ? await apiClient.get(next)
+      : await apiClient.get('/market/', { params: { limit: MARKET_PAGE_SIZE } });
+    return response.data as { next: string | null; results: any[] };
+  },
+
   listCard: async (cardId: number, price: number, currency: string) => {
     const response = await apiClient.post('/market/create/', { card_id: cardId, price, currency });
     return response.data;
   },
 
   buyListing: async (listingId: number) => {
-    const response = await apiClient.post(`/market/buy/${listingId}/`);
-    return response.data;
+    return postIdempotent(`/market/buy/${listingId}/`);
   },
 
   // Leaderboard
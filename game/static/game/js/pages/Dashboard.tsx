@@ -1,25 +1,39 @@
 import React, { useEffect } from 'react';
 import { motion } from 'framer-motion';
 import { useGameStore, useNotificationStore } from '../store';
+import { subscribeToEvents } from '../api';
 import { formatCurrency, formatNumber, formatXPProgress, calculateLevelProgress } from '../utils';
 import { CoinsIcon, GemsIcon } from '../components/Icons';
 import Button from '../components/Button';
 
 const Dashboard: React.FC = () => {
-  const { profile, fetchProfile, claimMiningReward, exchangeCurrency, isLoading } = useGameStore();
+  const {
+    profile, loaded, isBootstrapping, fetchProfile, applyBalance, claimMiningReward, exchangeCurrency, isLoading,
+  } = useGameStore();
   const { addNotification } = useNotificationStore();
 
+  // The bootstrap already loads the profile; only fetch it when it is missing
   useEffect(() => {
-    fetchProfile();
-  }, [fetchProfile]);
+    if (!loaded.profile && !isBootstrapping) fetchProfile();
+  }, [loaded.profile, isBootstrapping, fetchProfile]);
 
-  // Auto-refresh profile every 30 seconds
+  // Balance updates are pushed by the server; poll every 30 seconds only
+  // when the event stream is not available
   useEffect(() => {
-    const interval = setInterval(() => {
-      fetchProfile();
-    }, 30000);
-    return () => clearInterval(interval);
-  }, [fetchProfile]);
+    let interval: ReturnType<typeof setInterval> | undefined;
+    const close = subscribeToEvents(
+      (event) => {
+        if (event.type === 'balance') applyBalance(event.data);
+      },
+      () => {
+        if (!interval) interval = setInterval(() => fetchProfile(), 30000);
+      }
+    );
+    return () => {
+      close();
+      if (interval) clearInterval(interval);
+    };
+  }, [fetchProfile, applyBalance]);
 
   const handleClaimReward = async () => {
     try {
@@ -6,12 +6,12 @@ import Button from '../components/Button';
 import { getRarityClass } from '../utils';
 
 const Inventory: React.FC = () => {
-  const { cards, fetchCards, isLoading, equipCard, unequipCard, profile } = useGameStore();
+  const { cards, loaded, isBootstrapping, fetchCards, isLoading, equipCard, unequipCard, profile } = useGameStore();
   const { addNotification } = useNotificationStore();
 
   useEffect(() => {
-    fetchCards();
-  }, [fetchCards]);
+    if (!loaded.cards && !isBootstrapping) fetchCards();
+  }, [loaded.cards, isBootstrapping, fetchCards]);
 
   const handleEquipCard = async (cardId: number, slot: number) => {
     try {
@@ -5,11 +5,11 @@ import { formatNumber } from '../utils';
 import { TrophyIcon } from '../components/Icons';
 
 const Leaderboard: React.FC = () => {
-  const { leaderboard, fetchLeaderboard, isLoading } = useGameStore();
+  const { leaderboard, loaded, isBootstrapping, fetchLeaderboard, isLoading } = useGameStore();
 
   useEffect(() => {
-    fetchLeaderboard();
-  }, [fetchLeaderboard]);
+    if (!loaded.leaderboard && !isBootstrapping) fetchLeaderboard();
+  }, [loaded.leaderboard, isBootstrapping, fetchLeaderboard]);
 
   const getRankBadge = (rank: number) => {
     if (rank === 1) return '🥇';
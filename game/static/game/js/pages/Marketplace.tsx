@@ -1,18 +1,43 @@
 import React, { useEffect, useState } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { useGameStore, useNotificationStore } from '../store';
+import { subscribeToEvents } from '../api';
 import Card from '../components/Card';
 import Button from '../components/Button';
 import { formatCurrency, formatNumber } from '../utils';
+import type { MarketListing } from '../types';
 
 const Marketplace: React.FC = () => {
-  const { marketListings, fetchMarketListings, buyListing, isLoading } = useGameStore();
+  const {
+    marketListings,
+    marketNext,
+    loaded,
+    isBootstrapping,
+    fetchMarketListings,
+    fetchMoreMarketListings,
+    addMarketListing,
+    removeMarketListing,
+    buyListing,
+    isLoading,
+  } = useGameStore();
   const { addNotification } = useNotificationStore();
   const [selectedListing, setSelectedListing] = useState<number | null>(null);
 
+  // The first page comes with the bootstrap; later changes arrive as events below
   useEffect(() => {
-    fetchMarketListings();
-  }, [fetchMarketListings]);
+    if (!loaded.market && !isBootstrapping) fetchMarketListings();
+  }, [loaded.market, isBootstrapping, fetchMarketListings]);
+
+  // New listings and sales are pushed by the server and applied to the local list;
+  // refetching the whole market on every event would cost one GET per connected client per trade
+  useEffect(() => {
+    return subscribeToEvents((event) => {
+      if (event.type === 'listing_created') addMarketListing(event.data as unknown as MarketListing);
+      else if (event.type === 'listing_sold' || event.type === 'listing_removed') {
+        removeMarketListing(event.data.listing_id);
+      }
+    });
+  }, [addMarketListing, removeMarketListing]);
 
   const handleBuyListing = async (listingId: number) => {
     try {
@@ -96,6 +121,13 @@ const Marketplace: React.FC = () => {
             ))}
           </div>
         )}
+        {marketNext && !isLoading && (
+          <div className="mt-4">
+            <Button variant="secondary" fullWidth onClick={() => fetchMoreMarketListings()}>
+              آگهی‌های بیشتر
+            </Button>
+          </div>
+        )}
       </motion.div>
     </div>
   );
@@ -7,15 +7,18 @@ import { LogoutIcon } from '../components/Icons';
 
 const Profile: React.FC = () => {
   const { user, logout } = useAuthStore();
-  const { profile, avatars, fetchProfile, fetchAvatars, updateProfile, isLoading } = useGameStore();
+  const {
+    profile, avatars, loaded, isBootstrapping, fetchProfile, fetchAvatars, updateProfile, isLoading,
+  } = useGameStore();
   const { addNotification } = useNotificationStore();
   const [username, setUsername] = useState('');
   const [selectedAvatar, setSelectedAvatar] = useState<number | null>(null);
 
   useEffect(() => {
-    fetchProfile();
-    fetchAvatars();
-  }, [fetchProfile, fetchAvatars]);
+    if (isBootstrapping) return;
+    if (!loaded.profile) fetchProfile();
+    if (!loaded.avatars) fetchAvatars();
+  }, [loaded.profile, loaded.avatars, isBootstrapping, fetchProfile, fetchAvatars]);
 
   useEffect(() => {
     if (profile) {
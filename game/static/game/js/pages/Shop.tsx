@@ -5,15 +5,15 @@ import Button from '../components/Button';
 import { formatCurrency, formatNumber } from '../utils';
 
 const Shop: React.FC = () => {
-  const { packs, fetchPacks, openPack, isLoading } = useGameStore();
+  const { packs, loaded, isBootstrapping, fetchPacks, openPack, isLoading } = useGameStore();
   const { addNotification } = useNotificationStore();
   const [openingPack, setOpeningPack] = useState<number | null>(null);
   const [showOpeningAnimation, setShowOpeningAnimation] = useState(false);
   const [openedCard, setOpenedCard] = useState<any>(null);
 
   useEffect(() => {
-    fetchPacks();
-  }, [fetchPacks]);
+    if (!loaded.packs && !isBootstrapping) fetchPacks();
+  }, [loaded.packs, isBootstrapping, fetchPacks]);
 
   const handleOpenPack = async (packId: number) => {
     try {
@@ -1,7 +1,14 @@
 import { create } from 'zustand';
 import { persist } from 'zustand/middleware';
 import type { AuthState, UserProfile, CardInstance, Pack, MarketListing, LeaderboardEntry, Avatar, Notification } from './types';
-import { api, parseError } from './api';
+import {
+  api,
+  parseError,
+  consumeEmbeddedBootstrap,
+  BOOTSTRAP_KEYS,
+  EMBEDDED_BOOTSTRAP_KEYS,
+  type BootstrapKey,
+} from './api';
 
 interface AuthStore extends AuthState {
   login: (username: string, password: string) => Promise<void>;
@@ -116,16 +123,25 @@ interface GameStore {
   cards: CardInstance[];
   packs: Pack[];
   marketListings: MarketListing[];
+  marketNext: string | null;
   leaderboard: LeaderboardEntry[];
   avatars: Avatar[];
   selectedCard: CardInstance | null;
+  // Slices already in the store; pages only fetch on mount what is still missing
+  loaded: Record<BootstrapKey, boolean>;
+  isBootstrapping: boolean;
   isLoading: boolean;
   error: string | null;
 
+  fetchBootstrap: () => Promise<void>;
   fetchProfile: () => Promise<void>;
+  applyBalance: (balance: Partial<UserProfile>) => void;
   fetchCards: () => Promise<void>;
   fetchPacks: () => Promise<void>;
   fetchMarketListings: () => Promise<void>;
+  fetchMoreMarketListings: () => Promise<void>;
+  addMarketListing: (listing: MarketListing) => void;
+  removeMarketListing: (listingId: number) => void;
   fetchLeaderboard: () => Promise<void>;
   fetchAvatars: () => Promise<void>;
   equipCard: (cardId: number, slot: number) => Promise<void>;
@@ -140,22 +156,65 @@ interface GameStore {
   clearError: () => void;
 }
 
-export const useGameStore = create<GameStore>((set) => ({
+const markLoaded = (loaded: Record<BootstrapKey, boolean>, keys: BootstrapKey[]) =>
+  keys.reduce((result, key) => ({ ...result, [key]: true }), loaded);
+
+export const useGameStore = create<GameStore>((set, get) => ({
   profile: null,
   cards: [],
   packs: [],
   marketListings: [],
+  marketNext: null,
   leaderboard: [],
   avatars: [],
   selectedCard: null,
+  loaded: { profile: false, cards: false, packs: false, avatars: false, leaderboard: false, market: false },
+  isBootstrapping: false,
   isLoading: false,
   error: null,
 
+  fetchBootstrap: async () => {
+    set({ isLoading: true, isBootstrapping: true, error: null });
+    try {
+      // The page embeds the profile and the first market page; one /bootstrap/ call fetches the rest
+      const embedded = consumeEmbeddedBootstrap();
+      if (embedded) {
+        set((state) => ({
+          profile: embedded.profile,
+          marketListings: embedded.market,
+          marketNext: embedded.market_next,
+          loaded: markLoaded(state.loaded, EMBEDDED_BOOTSTRAP_KEYS),
+        }));
+      }
+      const keys = embedded ? BOOTSTRAP_KEYS.filter((key) => !EMBEDDED_BOOTSTRAP_KEYS.includes(key)) : BOOTSTRAP_KEYS;
+      const data = await api.getBootstrap(embedded ? keys : undefined);
+      set((state) => ({
+        ...('profile' in data && { profile: data.profile }),
+        ...('cards' in data && { cards: data.cards }),
+        ...('packs' in data && { packs: data.packs }),
+        ...('avatars' in data && { avatars: data.avatars }),
+        ...('leaderboard' in data && { leaderboard: data.leaderboard }),
+        ...('market' in data && { marketListings: data.market, marketNext: data.market_next }),
+        loaded: markLoaded(state.loaded, keys),
+        isLoading: false,
+        isBootstrapping: false,
+      }));
+    } catch (error) {
+      const parsedError = parseError(error);
+      set({ error: parsedError.message, isLoading: false, isBootstrapping: false });
+      throw parsedError;
+    }
+  },
+
+  applyBalance: (balance) => {
+    set((state) => (state.profile ? { profile: { ...state.profile, ...balance } } : {}));
+  },
+
   fetchProfile: async () => {
     set({ isLoading: true, error: null });
     try {
       const profile = await api.getProfile();
-      set({ profile, isLoading: false });
+      set((state) => ({ profile, loaded: markLoaded(state.loaded, ['profile']), isLoading: false }));
     } catch (error) {
       const parsedError = parseError(error);
       set({ error: parsedError.message, isLoading: false });
@@ -167,7 +226,7 @@ export const useGameStore = create<GameStore>((set) => ({
     set({ isLoading: true, error: null });
     try {
       const cards = await api.getMyCards();
-      set({ cards, isLoading: false });
+      set((state) => ({ cards, loaded: markLoaded(state.loaded, ['cards']), isLoading: false }));
     } catch (error) {
       const parsedError = parseError(error);
       set({ error: parsedError.message, isLoading: false });
@@ -179,7 +238,7 @@ export const useGameStore = create<GameStore>((set) => ({
     set({ isLoading: true, error: null });
     try {
       const packs = await api.getPacks();
-      set({ packs, isLoading: false });
+      set((state) => ({ packs, loaded: markLoaded(state.loaded, ['packs']), isLoading: false }));
     } catch (error) {
       const parsedError = parseError(error);
       set({ error: parsedError.message, isLoading: false });
@@ -190,8 +249,13 @@ export const useGameStore = create<GameStore>((set) => ({
   fetchMarketListings: async () => {
     set({ isLoading: true, error: null });
     try {
-      const listings = await api.getMarketListings();
-      set({ marketListings: listings, isLoading: false });
+      const page = await api.getMarketPage();
+      set((state) => ({
+        marketListings: page.results,
+        marketNext: page.next,
+        loaded: markLoaded(state.loaded, ['market']),
+        isLoading: false,
+      }));
     } catch (error) {
       const parsedError = parseError(error);
       set({ error: parsedError.message, isLoading: false });
@@ -199,11 +263,37 @@ export const useGameStore = create<GameStore>((set) => ({
     }
   },
 
+  fetchMoreMarketListings: async () => {
+    const next = get().marketNext;
+    if (!next) return;
+    try {
+      const page = await api.getMarketPage(next);
+      set((state) => ({ marketListings: [...state.marketListings, ...page.results], marketNext: page.next }));
+    } catch (error) {
+      const parsedError = parseError(error);
+      set({ error: parsedError.message });
+      throw parsedError;
+    }
+  },
+
+  // Market events from the server (SSE) update the local list without refetching it
+  addMarketListing: (listing) => {
+    set((state) =>
+      state.marketListings.some((item) => item.listing_id === listing.listing_id)
+        ? {}
+        : { marketListings: [listing, ...state.marketListings] }
+    );
+  },
+
+  removeMarketListing: (listingId) => {
+    set((state) => ({ marketListings: state.marketListings.filter((item) => item.listing_id !== listingId) }));
+  },
+
   fetchLeaderboard: async () => {
     set({ isLoading: true, error: null });
     try {
       const leaderboard = await api.getLeaderboard();
-      set({ leaderboard, isLoading: false });
+      set((state) => ({ leaderboard, loaded: markLoaded(state.loaded, ['leaderboard']), isLoading: false }));
     } catch (error) {
       const parsedError = parseError(error);
       set({ error: parsedError.message, isLoading: false });
@@ -215,7 +305,7 @@ export const useGameStore = create<GameStore>((set) => ({
     set({ isLoading: true, error: null });
     try {
       const avatars = await api.getAvatars();
-      set({ avatars, isLoading: false });
+      set((state) => ({ avatars, loaded: markLoaded(state.loaded, ['avatars']), isLoading: false }));
     } catch (error) {
       const parsedError = parseError(error);
       set({ error: parsedError.message, isLoading: false });
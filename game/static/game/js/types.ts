@@ -119,6 +119,8 @@ export interface Pack {
 
 export interface MarketListing {
   id: number;
+  // id in market/ and SSE payloads
+  listing_id?: number;
   card_instance: CardInstance;
   seller_name: string;
   price: number;
@@ -183,3 +185,8 @@ export interface PaginatedResponse<T> {
   previous: string | null;
   results: T[];
 }
+
+export interface CursorPage<T> {
+  next: string | null;
+  results: T[];
+}
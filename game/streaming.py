@@ -0,0 +1,43 @@
+"""
+پاسخ‌های JSON استریمی برای لیست‌های بزرگ
+
+آیتم‌ها یکی‌یکی encode و در تکه‌های چند کیلوبایتی فرستاده می‌شوند، پس مصرف
+حافظه به تعداد ردیف‌ها بستگی ندارد. منبع آیتم‌ها باید generator باشد
+(مثلاً values_list(...).iterator(chunk_size=...)) تا کل queryset هم در حافظه ساخته نشود.
+"""
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from .renderers import FastJSONRenderer
+
+# تعداد ردیفی که هر بار از cursor سمت سرور خوانده می‌شود
+STREAM_CHUNK_SIZE = getattr(settings, 'GAME_STREAM_CHUNK_SIZE', 2000)
+# اندازهٔ تقریبی هر تکهٔ ارسالی به کلاینت
+STREAM_BUFFER_BYTES = 64 * 1024
+
+
+def wants_stream(request):
+    return request.query_params.get('stream') in ('1', 'true')
+
+
+def iter_json_array(items):
+    """تولید بایت‌های یک آرایهٔ JSON از روی iterable آیتم‌ها"""
+    render = FastJSONRenderer().render
+    buffer = bytearray(b'[')
+    first = True
+    for item in items:
+        if not first:
+            buffer += b','
+        buffer += render(item)
+        first = False
+        if len(buffer) >= STREAM_BUFFER_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += b']'
+    yield bytes(buffer)
+
+
+def streaming_json_response(items):
+    response = StreamingHttpResponse(iter_json_array(items), content_type='application/json')
+    response['Cache-Control'] = 'no-store'
+    return response
@@ -0,0 +1,18 @@
+"""
+URLconf تست‌های AsyncReadViewTest و EventStreamTest
+
+GAME_ASYNC_READ_VIEWS فقط موقع import شدن game.urls خوانده می‌شود، پس تست‌ها
+endpointهای async را از این ماژول می‌گیرند (override_settings روی ROOT_URLCONF).
+"""
+from django.urls import path
+
+from . import async_views
+
+urlpatterns = [
+    path('api/game/profile/me/', async_views.get_my_profile),
+    path('api/game/leaderboard/', async_views.leaderboard),
+    path('api/game/avatars/', async_views.get_avatars),
+    path('api/game/packs/', async_views.get_packs),
+    path('api/game/market/', async_views.market_feed),
+    path('api/game/events/', async_views.event_stream),
+]
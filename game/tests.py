@@ -1,6 +1,52 @@
-from django.test import TestCase
+import csv
+import datetime
+import decimal
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+from unittest import mock, skipUnless
+
+import msgpack
+from asgiref.sync import sync_to_async
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from .models import PlayerProfile, CardTemplate, UserCard, MarketListing
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from . import bulk, events, exports, loadtest, microbench, slowlog, views
+from .authentication import clear_auth_cache
+from .inventory import record_card_changes
+from .management.commands.stress_test import Command as StressTestCommand
+from .metrics import reset_metrics
+from .pagination import encode_cursor
+from .renderers import FastJSONRenderer
+from .throttling import reset_throttles
+from .models import (
+    PlayerProfile, CardTemplate, UserCard, MarketListing, Pack, Avatar, IdempotencyRecord, InventoryChange, BulkJob,
+)
+from .serializers import (
+    UserCardSerializer, PlayerProfileSerializer,
+    user_cards_data, player_profile_data,
+)
+
+
+class RecordingBroker:
+    def __init__(self):
+        self.events = []
+
+    def publish(self, channel, event):
+        self.events.append((channel, event['type'], event['data']))
+
 
 class MarketplaceVowFragmentsTest(TestCase):
     """Test that marketplace only uses Vow Fragments"""
@@ -105,3 +151,1596 @@ class MarketplaceVowFragmentsTest(TestCase):
         self.user_card.refresh_from_db()
         self.assertEqual(self.user_card.owner, buyer_profile)
         self.assertFalse(self.user_card.is_listed_in_market)
+
+
+class ProfileCacheTest(TestCase):
+    """Test the versioned profile cache behind get_my_profile"""
+
+    def setUp(self):
+        cache.clear()
+        clear_auth_cache()
+        self.user = User.objects.create_user(username='cacheuser', password='testpass')
+        self.profile = PlayerProfile.objects.create(user=self.user, coins=5000, gems=10)
+        self.client.login(username='cacheuser', password='testpass')
+
+    def test_second_read_skips_profile_queries(self):
+        first = self.client.get('/api/game/profile/me/')
+        self.assertEqual(first.status_code, 200)
+
+        # Session, user and profile all come from caches
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/game/profile/me/')
+        self.assertEqual(second.json(), first.json())
+
+    def test_conditional_get_returns_304(self):
+        first = self.client.get('/api/game/profile/me/')
+        etag = first['ETag']
+
+        response = self.client.get('/api/game/profile/me/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_mutation_invalidates_cached_profile(self):
+        first = self.client.get('/api/game/profile/me/')
+        self.assertEqual(first.json()['gems'], 10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/game/exchange/', {'coins': 1000},
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        second = self.client.get('/api/game/profile/me/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.json()['gems'], 35)
+        self.assertEqual(second.json()['coins'], 4000)
+
+    def test_rejected_update_saves_nothing(self):
+        self.client.get('/api/game/profile/me/')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/game/profile/update/', {'username': 'renamed', 'password': '123'},
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.username, 'cacheuser')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/game/profile/update/', {'username': 'renamed'},
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/game/profile/me/').json()['username'], 'renamed')
+
+
+class InventoryPaginationTest(TestCase):
+    """Test keyset pagination and filters on get_my_cards"""
+
+    def setUp(self):
+        cache.clear()
+        clear_auth_cache()
+        self.user = User.objects.create_user(username='collector', password='testpass')
+        self.profile = PlayerProfile.objects.create(user=self.user)
+        self.common = CardTemplate.objects.create(
+            name='Common Card', rarity='COMMON', mining_rate=1, max_supply=100)
+        self.epic = CardTemplate.objects.create(
+            name='Epic Card', rarity='EPIC', mining_rate=20, max_supply=100)
+        for serial in range(1, 6):
+            UserCard.objects.create(owner=self.profile, template=self.common, serial_number=serial)
+        for serial in range(1, 4):
+            UserCard.objects.create(owner=self.profile, template=self.epic, serial_number=serial)
+        self.client.login(username='collector', password='testpass')
+
+    def test_legacy_response_is_a_list(self):
+        response = self.client.get('/api/game/my-cards/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 8)
+
+    def test_pages_cover_every_card_once(self):
+        seen = []
+        url = '/api/game/my-cards/?limit=3&ordering=-mining_rate'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(card['id'] for card in response.json()['results'])
+            url = response.json()['next']
+        self.assertEqual(len(seen), 8)
+        self.assertEqual(len(set(seen)), 8)
+        first = UserCard.objects.get(id=seen[0])
+        self.assertEqual(first.template, self.epic)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.client.get('/api/game/my-cards/?limit=1')
+        # with warm auth caches only the joined page query remains
+        with self.assertNumQueries(1):
+            self.client.get('/api/game/my-cards/?limit=2')
+        with self.assertNumQueries(1):
+            self.client.get('/api/game/my-cards/?limit=8')
+
+    def test_rarity_filter(self):
+        response = self.client.get('/api/game/my-cards/?rarity=epic&limit=10')
+        results = response.json()['results']
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(card['rarity'] == 'EPIC' for card in results))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/game/my-cards/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+
+    def test_crafted_cursor_values_are_rejected(self):
+        for value in ([1], {'a': 1}, True, None, 'abc'):
+            cursor = encode_cursor(value, 5)
+            for ordering in ('serial', 'mining_rate', '-serial'):
+                response = self.client.get(f'/api/game/my-cards/?ordering={ordering}&cursor={cursor}')
+                self.assertEqual(response.status_code, 400, (value, ordering))
+
+
+class InventorySyncTest(TestCase):
+    """Test delta sync of cards since a client cursor"""
+
+    def setUp(self):
+        cache.clear()
+        clear_auth_cache()
+        self.seller_user = User.objects.create_user(username='seller', password='testpass')
+        self.seller = PlayerProfile.objects.create(user=self.seller_user)
+        self.buyer_user = User.objects.create_user(username='syncbuyer', password='testpass')
+        self.buyer = PlayerProfile.objects.create(user=self.buyer_user, vow_fragments=1000)
+        self.template = CardTemplate.objects.create(
+            name='Sync Card', rarity='COMMON', mining_rate=1, max_supply=100)
+        self.card = UserCard.objects.create(owner=self.seller, template=self.template, serial_number=1)
+
+    def sync(self, username, since=''):
+        self.client.login(username=username, password='testpass')
+        response = self.client.get(f'/api/game/my-cards/sync/?since={since}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_first_sync_is_full_snapshot(self):
+        data = self.sync('seller')
+        self.assertTrue(data['full'])
+        self.assertEqual([card['id'] for card in data['changed']], [self.card.id])
+
+    def test_sale_produces_tombstone_for_seller(self):
+        seller_cursor = self.sync('seller')['cursor']
+        buyer_cursor = self.sync('syncbuyer')['cursor']
+
+        self.client.login(username='seller', password='testpass')
+        self.client.post('/api/game/market/create/', {'card_id': self.card.id, 'price': 100},
+                         content_type='application/json')
+        listing = MarketListing.objects.get(card_instance=self.card)
+        self.client.login(username='syncbuyer', password='testpass')
+        response = self.client.post(f'/api/game/market/buy/{listing.id}/', {'listing_id': listing.id},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        seller_delta = self.sync('seller', seller_cursor)
+        self.assertFalse(seller_delta['full'])
+        self.assertEqual(seller_delta['changed'], [])
+        self.assertEqual(seller_delta['removed'], [self.card.id])
+
+        buyer_delta = self.sync('syncbuyer', buyer_cursor)
+        self.assertEqual([card['id'] for card in buyer_delta['changed']], [self.card.id])
+        self.assertEqual(buyer_delta['removed'], [])
+
+    def test_steady_state_sync_has_no_change_queries(self):
+        self.client.login(username='seller', password='testpass')
+        self.client.post('/api/game/market/create/', {'card_id': self.card.id, 'price': 100},
+                         content_type='application/json')
+        cursor = self.sync('seller')['cursor']
+
+        # profile only (session and user are cached)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/game/my-cards/sync/?since={cursor}')
+        self.assertEqual(response.json()['changed'], [])
+        self.assertEqual(response.json()['removed'], [])
+
+    def test_purged_changes_force_a_snapshot(self):
+        cursor = self.sync('seller')['cursor']
+        cards = [UserCard.objects.create(owner=self.seller, template=self.template, serial_number=n)
+                 for n in range(2, 5)]
+        with transaction.atomic():
+            record_card_changes(self.seller.pk, [card.id for card in cards])
+
+        out = io.StringIO()
+        call_command('purge_inventory_changes', keep=2, stdout=out)
+        self.assertIn('1 ', out.getvalue())
+        self.assertEqual(list(InventoryChange.objects.filter(owner=self.seller).values_list('seq', flat=True)
+                              .order_by('seq')), [cursor + 2, cursor + 3])
+
+        stale = self.sync('seller', cursor)
+        self.assertTrue(stale['full'])
+        self.assertEqual(len(stale['changed']), 4)
+        recent = self.sync('seller', cursor + 1)
+        self.assertFalse(recent['full'])
+        self.assertEqual([card['id'] for card in recent['changed']], [card.id for card in cards[1:]])
+
+
+class CollectionSummaryTest(TestCase):
+    """Test the per-template collection summary"""
+
+    def setUp(self):
+        cache.clear()
+        clear_auth_cache()
+        self.user = User.objects.create_user(username='summary', password='testpass')
+        self.profile = PlayerProfile.objects.create(user=self.user)
+        self.common = CardTemplate.objects.create(
+            name='Common Card', rarity='COMMON', mining_rate=2, max_supply=100)
+        self.rare = CardTemplate.objects.create(
+            name='Rare Card', rarity='RARE', mining_rate=5, max_supply=100)
+        for serial in (7, 3, 9):
+            UserCard.objects.create(owner=self.profile, template=self.common, serial_number=serial)
+        UserCard.objects.create(owner=self.profile, template=self.rare, serial_number=4,
+                                is_listed_in_market=True)
+        self.client.login(username='summary', password='testpass')
+
+    def test_summary_groups_cards_by_template(self):
+        response = self.client.get('/api/game/my-cards/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'template_id': self.common.id, 'card_name': 'Common Card', 'rarity': 'COMMON',
+             'owned': 3, 'listed': 0, 'best_serial': 3, 'total_mining_rate': 6},
+            {'template_id': self.rare.id, 'card_name': 'Rare Card', 'rarity': 'RARE',
+             'owned': 1, 'listed': 1, 'best_serial': 4, 'total_mining_rate': 5},
+        ])
+
+    def test_cached_summary_skips_aggregate_query(self):
+        self.client.get('/api/game/my-cards/summary/')
+        # profile only (session and user are cached)
+        with self.assertNumQueries(1):
+            self.client.get('/api/game/my-cards/summary/')
+
+
+class CachedAuthTest(TestCase):
+    """Test cached token/session authentication and its invalidation"""
+
+    def setUp(self):
+        cache.clear()
+        clear_auth_cache()
+        self.user = User.objects.create_user(username='authuser', password='testpass')
+        self.profile = PlayerProfile.objects.create(user=self.user)
+        self.token = Token.objects.create(user=self.user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+
+    def test_repeat_token_request_needs_no_auth_queries(self):
+        self.client.get('/api/game/my-cards/?limit=1', **self.auth)
+        # only the page query itself
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/game/my-cards/?limit=1', **self.auth)
+        self.assertEqual(response.status_code, 200)
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get('/api/game/profile/me/', **self.auth)
+        self.token.delete()
+        response = self.client.get('/api/game/profile/me/', **self.auth)
+        self.assertEqual(response.status_code, 403)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get('/api/game/profile/me/', **self.auth)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/game/profile/me/', **self.auth)
+        self.assertEqual(response.status_code, 403)
+
+    def test_password_change_invalidates_other_sessions(self):
+        other = self.client_class()
+        other.login(username='authuser', password='testpass')
+        self.assertEqual(other.get('/api/game/profile/me/').status_code, 200)
+
+        self.client.login(username='authuser', password='testpass')
+        response = self.client.post('/api/game/profile/update/', {'password': 'newpass123'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        # the session that changed the password stays logged in, the other one does not
+        self.assertEqual(self.client.get('/api/game/profile/me/').status_code, 200)
+        self.assertEqual(other.get('/api/game/profile/me/').status_code, 403)
+
+    def test_logout_clears_session_user(self):
+        self.client.login(username='authuser', password='testpass')
+        self.assertEqual(self.client.get('/api/game/profile/me/').status_code, 200)
+        self.client.post('/api/game/auth/logout/')
+        self.assertEqual(self.client.get('/api/game/profile/me/').status_code, 403)
+
+
+class ThrottleTest(TestCase):
+    """Test token-bucket throttling and the claim cooldown"""
+
+    def setUp(self):
+        cache.clear()
+        clear_auth_cache()
+        reset_throttles()
+        self.user = User.objects.create_user(username='throttled', password='testpass')
+        self.profile = PlayerProfile.objects.create(user=self.user, current_mining_rate=60)
+        PlayerProfile.objects.filter(pk=self.profile.pk).update(
+            last_claim_time=timezone.now() - datetime.timedelta(hours=2))
+        self.client.login(username='throttled', password='testpass')
+
+    @override_settings(GAME_THROTTLE_BUCKETS={'open_pack': {'rate': '1/min', 'burst': 2}})
+    def test_open_pack_bucket_rejects_with_retry_after(self):
+        for _ in range(2):
+            self.assertEqual(self.client.post('/api/game/open-pack/').status_code, 400)
+        response = self.client.post('/api/game/open-pack/')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    @override_settings(GAME_THROTTLE_BUCKETS={})
+    def test_repeat_claim_is_rejected_without_queries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.client.post('/api/game/claim/')
+        self.assertEqual(first.status_code, 200)
+
+        with self.assertNumQueries(0):
+            second = self.client.post('/api/game/claim/')
+        self.assertEqual(second.status_code, 400)
+        self.assertLessEqual(int(second['Retry-After']), 60)
+
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.coins, 120)
+
+
+class IdempotencyTest(TestCase):
+    """Test Idempotency-Key handling on mutating endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        clear_auth_cache()
+        self.user = User.objects.create_user(username='retrier', password='testpass')
+        self.profile = PlayerProfile.objects.create(user=self.user, coins=5000, gems=0)
+        self.client.login(username='retrier', password='testpass')
+
+    def exchange(self, coins, key):
+        return self.client.post('/api/game/exchange/', {'coins': coins}, content_type='application/json',
+                                HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_is_replayed_without_touching_game_tables(self):
+        first = self.exchange(2000, 'abc-1')
+        self.assertEqual(first.status_code, 200)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.exchange(2000, 'abc-1')
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.json(), first.json())
+        self.assertFalse(any('game_playerprofile' in q['sql'] for q in queries.captured_queries))
+
+        self.profile.refresh_from_db()
+        self.assertEqual((self.profile.coins, self.profile.gems), (3000, 50))
+
+    def test_reused_key_with_different_body_is_rejected(self):
+        self.exchange(2000, 'abc-2')
+        self.assertEqual(self.exchange(1000, 'abc-2').status_code, 422)
+
+    def test_in_flight_duplicate_gets_conflict(self):
+        IdempotencyRecord.objects.create(user=self.user, key='abc-3', request_hash='x')
+        self.assertEqual(self.exchange(2000, 'abc-3').status_code, 409)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.coins, 5000)
+
+    def test_without_header_nothing_is_stored(self):
+        self.client.post('/api/game/exchange/', {'coins': 1000}, content_type='application/json')
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+    def abandon(self, key, age):
+        # ردیف پاسخ‌نگرفتهٔ درخواستی که وسط کار مرده؛ تغییراتش با تراکنش rollback شده
+        IdempotencyRecord.objects.filter(key=key).update(
+            status_code=None, body=None, created_at=timezone.now() - datetime.timedelta(seconds=age))
+        PlayerProfile.objects.filter(pk=self.profile.pk).update(coins=5000, gems=0)
+
+    def test_abandoned_pending_key_is_executed_again(self):
+        self.exchange(2000, 'abc-4')
+        self.abandon('abc-4', age=3600)
+
+        response = self.exchange(2000, 'abc-4')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.profile.refresh_from_db()
+        self.assertEqual((self.profile.coins, self.profile.gems), (3000, 50))
+        self.assertEqual(IdempotencyRecord.objects.get(key='abc-4').status_code, 200)
+
+    def test_recent_pending_key_still_conflicts(self):
+        self.exchange(2000, 'abc-5')
+        self.abandon('abc-5', age=1)
+        self.assertEqual(self.exchange(2000, 'abc-5').status_code, 409)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.coins, 5000)
+
+    def test_replay_keeps_retry_after_header(self):
+        PlayerProfile.objects.filter(pk=self.profile.pk).update(current_mining_rate=10, last_claim_time=timezone.now())
+        first = self.client.post('/api/game/claim/', HTTP_IDEMPOTENCY_KEY='abc-6')
+        self.assertEqual(first.status_code, 400)
+        cache.clear()
+        second = self.client.post('/api/game/claim/', HTTP_IDEMPOTENCY_KEY='abc-6')
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second['Retry-After'], first['Retry-After'])
+
+    def test_failed_view_rolls_back_and_frees_the_key(self):
+        PlayerProfile.objects.filter(pk=self.profile.pk).update(
+            current_mining_rate=10, last_claim_time=timezone.now() - datetime.timedelta(hours=1))
+        with mock.patch('game.views.add_xp', side_effect=RuntimeError('boom')), \
+                self.assertRaises(RuntimeError):
+            self.client.post('/api/game/claim/', HTTP_IDEMPOTENCY_KEY='abc-7')
+        self.assertFalse(IdempotencyRecord.objects.filter(key='abc-7').exists())
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.coins, 5000)
+
+
+@override_settings(ROOT_URLCONF='game.test_urls')
+class AsyncReadViewTest(TestCase):
+    """Test the async read endpoints against their DRF counterparts"""
+
+    def setUp(self):
+        cache.clear()
+        clear_auth_cache()
+        self.user = User.objects.create_user(username='asyncreader', password='testpass')
+        self.profile = PlayerProfile.objects.create(user=self.user, coins=700, current_mining_rate=5)
+        self.token = Token.objects.create(user=self.user)
+        self.headers = {'Authorization': f'Token {self.token.key}'}
+        template = CardTemplate.objects.create(name='Async Card', rarity='RARE', mining_rate=5, max_supply=10)
+        card = UserCard.objects.create(owner=self.profile, template=template, serial_number=1,
+                                       is_listed_in_market=True)
+        MarketListing.objects.create(seller=self.profile, card_instance=card, price=40)
+
+    async def test_leaderboard_matches_sync_view(self):
+        response = await self.async_client.get('/api/game/leaderboard/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), await sync_to_async(views.leaderboard_data)())
+
+    async def test_market_feed_is_public(self):
+        listings = MarketListing.objects.filter(is_active=True).order_by('-created_at')
+        response = await self.async_client.get('/api/game/market/?compact=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(),
+                         await sync_to_async(views.market_feed_data)(listings, compact=True))
+
+    async def test_profile_etag_and_session_auth(self):
+        await self.async_client.alogin(username='asyncreader', password='testpass')
+        first = await self.async_client.get('/api/game/profile/me/')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['coins'], 700)
+        second = await self.async_client.get('/api/game/profile/me/', headers={'If-None-Match': first['ETag']})
+        self.assertEqual(second.status_code, 304)
+
+    async def test_authentication_is_required(self):
+        response = await self.async_client.get('/api/game/avatars/')
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.get('/api/game/avatars/', headers={'Authorization': 'Token nope'})
+        self.assertEqual(response.status_code, 403)
+
+    async def test_msgpack_negotiation(self):
+        response = await self.async_client.get('/api/game/packs/', headers={'Accept': 'application/msgpack'})
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), [])
+
+
+class EventPublishTest(TestCase):
+    """Test that mutating views publish push events after commit"""
+
+    def setUp(self):
+        cache.clear()
+        clear_auth_cache()
+        reset_throttles()
+        self.broker = events._broker = RecordingBroker()
+        self.addCleanup(setattr, events, '_broker', None)
+        self.seller_user = User.objects.create_user(username='pushseller', password='testpass')
+        self.seller = PlayerProfile.objects.create(user=self.seller_user)
+        self.buyer_user = User.objects.create_user(username='pushbuyer', password='testpass')
+        self.buyer = PlayerProfile.objects.create(user=self.buyer_user, vow_fragments=500)
+        template = CardTemplate.objects.create(name='Push Card', rarity='EPIC', mining_rate=3, max_supply=10)
+        self.card = UserCard.objects.create(owner=self.seller, template=template, serial_number=2)
+
+    def test_listing_and_sale_events(self):
+        self.client.login(username='pushseller', password='testpass')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/game/market/create/', {'card_id': self.card.id, 'price': 120},
+                             content_type='application/json')
+        listing = MarketListing.objects.get(card_instance=self.card)
+        self.assertEqual(self.broker.events, [
+            ('market', 'listing_created', views.market_feed_data(MarketListing.objects.filter(pk=listing.pk))[0]),
+        ])
+
+        self.broker.events.clear()
+        self.client.login(username='pushbuyer', password='testpass')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/game/market/buy/{listing.id}/', {'listing_id': listing.id},
+                             content_type='application/json')
+        published = {(channel, event_type): data for channel, event_type, data in self.broker.events}
+        self.assertEqual(published[('market', 'listing_sold')], {'listing_id': listing.id})
+        self.assertEqual(published[(f'player:{self.buyer_user.pk}', 'balance')]['vow_fragments'], 380)
+        self.assertEqual(published[(f'player:{self.seller_user.pk}', 'balance')]['vow_fragments'], 120)
+
+    def test_failed_request_publishes_nothing(self):
+        self.client.login(username='pushbuyer', password='testpass')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/game/open-pack/', {'pack_id': 999}, content_type='application/json')
+        self.assertEqual(self.broker.events, [])
+
+
+@override_settings(ROOT_URLCONF='game.test_urls')
+class EventStreamTest(TestCase):
+    """Test the local broker and the SSE endpoint"""
+
+    def setUp(self):
+        self.addCleanup(setattr, events, '_broker', None)
+        events._broker = events.LocalBroker()
+
+    async def test_local_broker_delivers_to_channel_subscribers(self):
+        broker = events.LocalBroker()
+        with broker.subscribe(['market']) as market, broker.subscribe(['player:1']) as player:
+            await sync_to_async(broker.publish)('market', {'type': 'listing_sold', 'data': {}})
+            self.assertEqual((await market.get(timeout=1))['type'], 'listing_sold')
+            self.assertIsNone(await player.get(timeout=0.01))
+        self.assertEqual(broker._subscribers, {})
+
+    async def test_stream_sends_published_events(self):
+        response = await self.async_client.get('/api/game/events/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 5000\n\n')
+
+        events.get_broker().publish('market', {'type': 'listing_sold', 'data': {'listing_id': 7}})
+        self.assertEqual(await anext(chunks), b'event: listing_sold\ndata: {"listing_id":7}\n\n')
+        await chunks.aclose()
+
+    def test_wsgi_is_rejected(self):
+        self.assertEqual(self.client.get('/api/game/events/').status_code, 501)
+
+
+class PerformanceMetricsTest(TestCase):
+    """Test Server-Timing headers and the Prometheus metrics endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        clear_auth_cache()
+        reset_metrics()
+        self.user = User.objects.create_user(username='measured', password='testpass')
+        PlayerProfile.objects.create(user=self.user)
+        self.client.login(username='measured', password='testpass')
+
+    def test_server_timing_reports_queries(self):
+        self.client.get('/api/game/profile/me/')
+        response = self.client.get('/api/game/profile/me/')
+        self.assertRegex(response['Server-Timing'],
+                         r'^db;dur=[\d.]+;desc="0 queries", encode;dur=[\d.]+, total;dur=[\d.]+$')
+
+        response = self.client.get('/api/game/leaderboard/')
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    def test_non_game_routes_are_not_measured(self):
+        response = self.client.get('/admin/login/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(GAME_METRICS_TOKEN='scrape-me')
+    def test_metrics_endpoint(self):
+        self.client.get('/api/game/leaderboard/')
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/game/metrics/').status_code, 403)
+
+        response = self.client.get('/api/game/metrics/', headers={'Authorization': 'Bearer scrape-me'})
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('game_requests_total{view="leaderboard",status="200"} 1', body)
+        self.assertIn('game_request_queries_count{view="leaderboard"} 1', body)
+        self.assertIn('game_request_duration_seconds_count{view="leaderboard"} 1', body)
+
+
+@mock.patch.object(slowlog, 'SLOW_QUERY_MS', 1e-6)
+class SlowQueryLogTest(TestCase):
+    """Test slow-query capture with view and stack attribution"""
+
+    def setUp(self):
+        slowlog.clear_slow_queries()
+        self.user = User.objects.create_user(username='slowpoke', password='testpass', is_staff=True)
+        PlayerProfile.objects.create(user=self.user)
+        self.client.login(username='slowpoke', password='testpass')
+
+    def test_queries_are_attributed_to_view(self):
+        self.client.get('/api/game/my-cards/?rarity=epic')
+        entries = slowlog.get_slow_queries(view='my-cards')
+        card_query = next(entry for entry in entries if 'game_usercard' in entry['sql'])
+        self.assertEqual(card_query['origin'], 'game.views.get_my_cards')
+        self.assertTrue(all(shape in ('int', 'str', 'bool') for shape in card_query['params']))
+        self.assertTrue(any(frame.startswith('game/views.py:') for frame in card_query['stack']))
+
+    @override_settings(GAME_PERF_METRICS=False)
+    def test_recorded_with_metrics_disabled(self):
+        response = self.client.get('/api/game/my-cards/')
+        self.assertFalse(response.has_header('Server-Timing'))
+        entries = slowlog.get_slow_queries(view='my-cards')
+        self.assertTrue(any('game_usercard' in entry['sql'] for entry in entries))
+
+    def test_command_and_admin_page(self):
+        self.client.get('/api/game/leaderboard/')
+        out = io.StringIO()
+        call_command('slow_queries', '--view', 'leaderboard', '--json', stdout=out)
+        self.assertIn('game_playerprofile', out.getvalue())
+
+        response = self.client.get('/admin/game/slow-queries/?view=leaderboard')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'game.views.leaderboard')
+
+
+class AdminListingsMixin:
+    """Logged-in superuser plus a helper that lists cards for new sellers"""
+
+    def setUp(self):
+        cache.clear()
+        clear_auth_cache()
+        self.admin = User.objects.create_superuser(username='boss', password='testpass')
+        self.client.login(username='boss', password='testpass')
+        self.template = CardTemplate.objects.create(name='Admin Card', rarity='RARE', mining_rate=10,
+                                                    max_supply=10000)
+
+    def add_listings(self, sellers, per_seller=1):
+        profiles = []
+        start = User.objects.count()
+        for i in range(start, start + sellers):
+            profile = PlayerProfile.objects.create(user=User.objects.create_user(username=f'vendor{i}'))
+            for _ in range(per_seller):
+                self.template.minted_count += 1
+                card = UserCard.objects.create(owner=profile, template=self.template,
+                                               serial_number=self.template.minted_count, is_listed_in_market=True)
+                MarketListing.objects.create(seller=profile, card_instance=card, price=10)
+            profiles.append(profile)
+        self.template.save(update_fields=['minted_count'])
+        return profiles
+
+
+class AdminScalabilityTest(AdminListingsMixin, TestCase):
+    """Test that game admin changelists stay constant-query and avoid full counts"""
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        urls = ['/admin/game/marketlisting/', '/admin/game/usercard/', '/admin/game/playerprofile/']
+        self.add_listings(3)
+        # the first request also loads the staff user's auth cache
+        self.client.get(urls[0])
+        before = [self.changelist_queries(url) for url in urls]
+        self.add_listings(30)
+        after = [self.changelist_queries(url) for url in urls]
+        self.assertEqual(after, before)
+
+    def test_search_uses_prefix_match(self):
+        self.add_listings(2)
+        # prefix match ignores case, like the icontains search it replaced
+        for query, count in [('vendor', 2), ('Vendor', 2), ('VENDOR1', 1), ('endor', 0)]:
+            response = self.client.get('/admin/game/playerprofile/', {'q': query})
+            self.assertEqual(response.context['cl'].result_count, count, query)
+        response = self.client.get('/admin/game/usercard/', {'q': 'ADMIN'})
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+    def test_estimated_count_only_for_unfiltered_large_tables(self):
+        self.add_listings(2)
+        with mock.patch('game.pagination.estimated_row_count', return_value=5_000_000):
+            response = self.client.get('/admin/game/marketlisting/')
+            self.assertEqual(response.context['cl'].result_count, 5_000_000)
+            response = self.client.get('/admin/game/marketlisting/', {'is_active__exact': '1'})
+            self.assertEqual(response.context['cl'].result_count, 2)
+        with mock.patch('game.pagination.estimated_row_count', return_value=50):
+            response = self.client.get('/admin/game/marketlisting/')
+            self.assertEqual(response.context['cl'].result_count, 2)
+        # SQLite has no table statistics, so the count is exact
+        response = self.client.get('/admin/game/marketlisting/')
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+
+class BulkAdminActionTest(AdminListingsMixin, TestCase):
+    """Test that admin bulk actions are set-based and large selections run as background jobs"""
+
+    def post_action(self, url, action):
+        # select_across = «انتخاب همه» در changelist
+        return self.client.post(url, {'action': action, 'select_across': '1', 'index': '0',
+                                      '_selected_action': ['0']}, follow=True)
+
+    def test_cancel_listings(self):
+        profiles = self.add_listings(3, per_seller=2)
+        MarketListing.objects.filter(pk=MarketListing.objects.order_by('pk')[0].pk).update(is_active=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post_action('/admin/game/marketlisting/', 'cancel_listings')
+        self.assertContains(response, '5 آگهی لغو شد')
+        self.assertFalse(MarketListing.objects.filter(is_active=True).exists())
+        self.assertEqual(UserCard.objects.filter(is_listed_in_market=True).count(), 1)
+
+        for profile in profiles:
+            profile.refresh_from_db()
+            seqs = list(InventoryChange.objects.filter(owner=profile).order_by('seq').values_list('seq', flat=True))
+            self.assertEqual(seqs, list(range(1, profile.inventory_seq + 1)))
+        self.assertEqual(InventoryChange.objects.count(), 5)
+
+    def test_cancel_listings_publishes_removals_after_commit(self):
+        self.add_listings(2, per_seller=2)
+        broker = events._broker = RecordingBroker()
+        self.addCleanup(setattr, events, '_broker', None)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            cancelled = bulk.run_action('cancel_listings', MarketListing.objects.all())
+            self.assertEqual(broker.events, [])
+        self.assertEqual(cancelled, 4)
+        self.assertTrue(callbacks)
+        self.assertEqual(broker.events, [(events.MARKET_CHANNEL, 'listing_removed', {'listing_id': pk})
+                                         for pk in MarketListing.objects.order_by('pk').values_list('pk', flat=True)])
+
+    def test_cancel_listings_queries_do_not_grow_with_rows(self):
+        def queries(sellers):
+            MarketListing.objects.all().delete()
+            UserCard.objects.all().delete()
+            self.add_listings(sellers, per_seller=2)
+            self.client.get('/admin/game/marketlisting/')
+            with CaptureQueriesContext(connection) as captured:
+                self.post_action('/admin/game/marketlisting/', 'cancel_listings')
+            return len(captured)
+
+        self.assertEqual(queries(2), queries(10))
+
+    def test_recalculate_mining_rates_matches_model(self):
+        profiles = self.add_listings(3, per_seller=3)
+        for level, profile in enumerate(profiles, 1):
+            cards = list(profile.cards.order_by('pk'))
+            profile.level = level * 4
+            profile.slot_1, profile.slot_2 = cards[0], cards[level % 2 + 1]
+            profile.current_mining_rate = 0
+            profile.save()
+        with mock.patch.object(bulk, 'CHUNK_SIZE', 2):
+            response = self.post_action('/admin/game/playerprofile/', 'recalculate_mining_rates')
+        self.assertContains(response, 'نرخ استخراج 3 کاربر بروزرسانی شد.')
+
+        for profile in PlayerProfile.objects.all():
+            rate = profile.current_mining_rate
+            self.assertEqual(profile.update_mining_rate(), rate)
+            self.assertGreater(rate, 0)
+
+    def test_large_selection_runs_as_background_job(self):
+        self.add_listings(3, per_seller=2)
+        with mock.patch.object(bulk, 'BACKGROUND_THRESHOLD', 4), mock.patch.object(bulk, 'CHUNK_SIZE', 4), \
+                mock.patch('game.bulk.start_thread') as start_thread:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.post_action('/admin/game/marketlisting/', 'cancel_listings')
+            job = BulkJob.objects.get()
+            self.assertContains(response, reverse('admin:game_bulkjob_change', args=[job.pk]))
+            self.assertEqual((job.action, job.status, job.total, job.created_by), ('cancel_listings', 'PENDING', 6,
+                                                                                   self.admin))
+            self.assertTrue(MarketListing.objects.filter(is_active=True).exists())
+
+            # اجرای همان کاری که thread انجام می‌دهد، همزمان
+            job_id, = start_thread.call_args.args
+            response = self.client.get(reverse('admin:game_bulkjob_change', args=[job.pk]))
+            self.assertContains(response, 'http-equiv="refresh"')
+            bulk.run_job(job_id)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.affected, job.percent), ('DONE', 6, 6, 100))
+        self.assertFalse(MarketListing.objects.filter(is_active=True).exists())
+        response = self.client.get(reverse('admin:game_bulkjob_change', args=[job.pk]))
+        self.assertNotContains(response, 'http-equiv="refresh"')
+
+    def submit(self, queryset):
+        with mock.patch('game.bulk.start_thread'), self.captureOnCommitCallbacks(execute=True):
+            return bulk.submit('cancel_listings', queryset, self.admin)
+
+    def test_failed_job_is_recorded(self):
+        self.add_listings(1, per_seller=2)
+        job = self.submit(MarketListing.objects.all())
+        with mock.patch.dict(bulk.ACTIONS, cancel_listings=mock.Mock(side_effect=RuntimeError('boom'))):
+            with self.assertRaises(RuntimeError):
+                bulk.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('FAILED', 'RuntimeError: boom'))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_selection_is_stored_as_pk_ranges(self):
+        self.add_listings(3, per_seller=2)
+        pks = list(MarketListing.objects.order_by('pk').values_list('pk', flat=True))
+        job = self.submit(MarketListing.objects.exclude(pk=pks[2]))
+        job.refresh_from_db()
+        self.assertEqual(job.selection, [[pks[0], pks[1]], [pks[3], pks[5]]])
+        self.assertEqual(job.total, 5)
+        self.assertEqual(list(bulk.iter_range_chunks(job.selection, size=2)),
+                         [[pks[0], pks[1]], [pks[3], pks[4]], [pks[5]]])
+        self.assertEqual(list(bulk.iter_range_chunks(job.selection, after=pks[3], size=2)),
+                         [[pks[4], pks[5]]])
+
+    def test_interrupted_job_resumes_from_last_chunk(self):
+        profiles = self.add_listings(3, per_seller=2)
+        job = self.submit(MarketListing.objects.filter(seller__in=profiles[:2]))
+        calls = []
+
+        def killed_after_first_chunk(pks):
+            calls.append(pks)
+            if len(calls) > 1:
+                # worker وسط کار بسته می‌شود؛ run_job فقط Exception را FAILED ثبت می‌کند
+                raise SystemExit
+            return bulk.cancel_listings(pks)
+
+        with mock.patch.object(bulk, 'CHUNK_SIZE', 2), self.assertRaises(SystemExit), \
+                mock.patch.dict(bulk.ACTIONS, cancel_listings=killed_after_first_chunk):
+            bulk.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.affected), ('RUNNING', 2, 2))
+
+        # هنوز تازه است و ممکن است پروسهٔ دیگری رویش کار کند
+        call_command('resume_bulk_jobs', stdout=io.StringIO())
+        self.assertEqual(BulkJob.objects.get().status, 'RUNNING')
+
+        BulkJob.objects.update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+        with mock.patch.object(bulk, 'CHUNK_SIZE', 2):
+            call_command('resume_bulk_jobs', stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.affected), ('DONE', 4, 4))
+        # فقط انتخاب ذخیره‌شده لغو شده است
+        self.assertEqual(list(MarketListing.objects.filter(is_active=True).values_list('seller_id', flat=True)),
+                         [profiles[2].pk] * 2)
+
+    def test_retry_action_restarts_failed_job(self):
+        self.add_listings(1, per_seller=2)
+        job = self.submit(MarketListing.objects.all())
+        BulkJob.objects.update(status='FAILED', error='RuntimeError: boom')
+        url = reverse('admin:game_bulkjob_change', args=[job.pk])
+        self.assertContains(self.client.get(url), 'value="retry_jobs"')
+
+        with mock.patch('game.bulk.start_thread') as start_thread, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/admin/game/bulkjob/', {'action': 'retry_jobs',
+                                                                 '_selected_action': [job.pk]}, follow=True)
+        self.assertContains(response, '1 عملیات از آخرین تکه ادامه پیدا می‌کند.')
+        start_thread.assert_called_once_with(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('PENDING', ''))
+        self.assertNotContains(self.client.get(url), 'value="retry_jobs"')
+
+
+class GenerateWorldTest(TestCase):
+    """Test the synthetic world generator used for benchmarks"""
+
+    def generate(self, **options):
+        options = {'players': 30, 'templates': 8, 'cards_per_player': 5, 'listed': 0.5, 'sold': 0.2,
+                   'chunk_size': 7, 'stdout': io.StringIO(), **options}
+        call_command('generate_world', **options)
+
+    def test_world_is_consistent(self):
+        self.generate()
+        self.assertEqual(PlayerProfile.objects.count(), 30)
+        for template in CardTemplate.objects.all():
+            serials = sorted(template.instances.values_list('serial_number', flat=True))
+            self.assertEqual(serials, list(range(1, template.minted_count + 1)))
+            self.assertLessEqual(template.minted_count, template.max_supply)
+
+        for profile in PlayerProfile.objects.all():
+            rate = profile.current_mining_rate
+            self.assertEqual(profile.update_mining_rate(), rate)
+
+        active = MarketListing.objects.filter(is_active=True)
+        self.assertTrue(active.exists())
+        self.assertFalse(active.exclude(card_instance__is_listed_in_market=True).exists())
+        self.assertFalse(active.exclude(card_instance__owner=F('seller')).exists())
+        sold = MarketListing.objects.filter(is_active=False)
+        self.assertTrue(sold.exists())
+        self.assertFalse(sold.filter(card_instance__owner=F('seller')).exists())
+        self.assertFalse(UserCard.objects.filter(is_listed_in_market=True, market_listing=None).exists())
+
+    def test_same_seed_same_world(self):
+        self.generate(prefix='a_')
+        self.generate(prefix='b_')
+
+        def world(prefix):
+            cards = UserCard.objects.filter(owner__user__username__startswith=prefix)
+            return (
+                list(PlayerProfile.objects.filter(user__username__startswith=prefix)
+                     .order_by('id').values_list('coins', 'level', 'current_mining_rate')),
+                list(cards.order_by('id').values_list('template__rarity', 'serial_number')),
+            )
+        self.assertEqual(world('a_'), world('b_'))
+
+    def test_passwords(self):
+        with mock.patch('game.management.commands.generate_world.make_password',
+                        wraps=make_password) as hasher:
+            self.generate(players=5, password='secret')
+        hasher.assert_called_once_with('secret')
+        self.assertTrue(all(user.check_password('secret') for user in User.objects.all()))
+
+        self.generate(players=5, prefix='nopass_')
+        self.assertFalse(any(user.has_usable_password()
+                             for user in User.objects.filter(username__startswith='nopass_')))
+
+
+class LoadTestHelpersTest(SimpleTestCase):
+    """Test the pure parts of the load-testing harness"""
+
+    def test_parse_mix(self):
+        self.assertEqual(loadtest.parse_mix('profile=3, buy=1'), {'profile': 3.0, 'buy': 1.0})
+        with self.assertRaises(ValueError):
+            loadtest.parse_mix('teleport=1')
+        with self.assertRaises(ValueError):
+            loadtest.parse_mix('profile=0')
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(loadtest.percentile(values, 50), 50)
+        self.assertEqual(loadtest.percentile(values, 99), 99)
+        self.assertEqual(loadtest.percentile([7], 99), 7)
+        self.assertIsNone(loadtest.percentile([], 50))
+
+    def test_compare_to_baseline(self):
+        baseline = {'profile': {'p50_ms': 10, 'p99_ms': 50}, 'gone': {'p50_ms': 1}}
+        current = {'profile': {'p50_ms': 11.9, 'p90_ms': 30, 'p95_ms': 40, 'p99_ms': 61}}
+        self.assertEqual(loadtest.compare_to_baseline(current, baseline, 0.2),
+                         [('profile', 'p99_ms', 50, 61)])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoadTestCommandTest(LiveServerTestCase):
+    """Drive a live server with the loadtest command"""
+
+    def setUp(self):
+        cache.clear()
+        clear_auth_cache()
+        reset_throttles()
+        call_command('generate_world', players=4, templates=4, cards_per_player=3, listed=1,
+                     password='bench', stdout=io.StringIO())
+        Pack.objects.create(name='Load Pack', image='packs/load.png', price=1, card_count=2)
+        PlayerProfile.objects.update(gems=1000, vow_fragments=100000)
+
+    def test_reports_every_endpoint_in_mix(self):
+        baseline = os.path.join(tempfile.mkdtemp(), 'baseline.json')
+        mix = 'profile=1,claim=1,open_pack=1,market=1,buy=1,equip=1'
+        # One thread: the test database is SQLite, which serialises writers
+        call_command('loadtest', url=self.live_server_url, password='bench', duration=2,
+                     concurrency=1, seed=1, mix=mix, save=baseline, stdout=io.StringIO())
+        with open(baseline) as fp:
+            saved = json.load(fp)
+        endpoints = saved['endpoints']
+        for endpoint in ('login', 'profile', 'claim', 'open_pack', 'market', 'buy', 'equip'):
+            self.assertIn(endpoint, endpoints)
+        self.assertFalse(any(row['errors'] for row in endpoints.values()), endpoints)
+
+        # A baseline far faster than anything achievable must fail the run
+        for row in endpoints.values():
+            for p in loadtest.PERCENTILES:
+                row[f'p{p}_ms'] = 0.001
+        with open(baseline, 'w') as fp:
+            json.dump(saved, fp)
+        with self.assertRaises(CommandError):
+            call_command('loadtest', url=self.live_server_url, password='bench', duration=0.5,
+                         concurrency=1, mix='profile=1', baseline=baseline, stdout=io.StringIO(),
+                         stderr=io.StringIO())
+
+
+class StressTestCommandTest(LiveServerTestCase):
+    """Run the concurrency stress harness end to end against a live server"""
+
+    def setUp(self):
+        cache.clear()
+        clear_auth_cache()
+        reset_throttles()
+
+    def test_invariants_hold_and_data_is_cleaned_up(self):
+        out = io.StringIO()
+        # One thread: the test database is SQLite, which serialises writers
+        call_command('stress_test', url=self.live_server_url, concurrency=1, requests=4, buyers=3,
+                     seed=1, stdout=out, stderr=io.StringIO())
+        self.assertEqual(out.getvalue().count('همهٔ invariantها برقرارند'), 3)
+        self.assertFalse(User.objects.filter(username__startswith='stress_').exists())
+        self.assertFalse(CardTemplate.objects.filter(name__startswith='stress_').exists())
+
+    @skipUnless(connection.vendor == 'postgresql', 'needs a database with row locks and concurrent writers')
+    def test_invariants_hold_under_concurrency(self):
+        # Real races: parallel requests on one profile and one listing, each on its own connection
+        out = io.StringIO()
+        call_command('stress_test', url=self.live_server_url, concurrency=8, requests=10, buyers=4,
+                     seed=1, stdout=out, stderr=io.StringIO())
+        self.assertEqual(out.getvalue().count('همهٔ invariantها برقرارند'), 3)
+        self.assertFalse(User.objects.filter(username__startswith='stress_').exists())
+
+    def test_broken_invariant_fails_the_run(self):
+        # Pretend more exchanges succeeded than the balance allowed (a double spend)
+        with mock.patch.object(StressTestCommand, '_ok', return_value=99):
+            with self.assertRaises(CommandError):
+                call_command('stress_test', url=self.live_server_url, scenario=['exchange'],
+                             concurrency=1, requests=2, stdout=io.StringIO(), stderr=io.StringIO())
+
+
+class MicrobenchTest(TestCase):
+    """Test the microbenchmark statistics and command"""
+
+    def test_compare_needs_size_and_significance(self):
+        baseline = {
+            'steady': microbench.summarize([1.0, 1.01, 0.99, 1.0], 10),
+            'noisy': microbench.summarize([1.0, 2.0, 0.5, 1.5], 10),
+            'sped_up': microbench.summarize([1.0, 1.01, 0.99, 1.0], 10),
+        }
+        current = {
+            'steady': microbench.summarize([1.5, 1.51, 1.49, 1.5], 10),
+            'noisy': microbench.summarize([1.6, 3.0, 0.6, 1.8], 10),
+            'sped_up': microbench.summarize([0.5, 0.51, 0.49, 0.5], 10),
+            'new': microbench.summarize([1.0, 1.0], 10),
+        }
+        verdicts = {name: row['verdict'] for name, row in microbench.compare(current, baseline, 0.1).items()}
+        self.assertEqual(verdicts, {'steady': 'slower', 'noisy': 'same', 'sped_up': 'faster'})
+
+    def test_measure_excludes_setup(self):
+        # Each setup sleeps 1 ms; the measured call itself is trivial
+        result = microbench.measure(lambda: None, warmup=1, repeat=3, min_time=1e-5,
+                                    setup=lambda: time.sleep(0.001))
+        self.assertLess(result['mean'], 0.0005)
+        self.assertEqual(result['n'], 3)
+
+    def test_command_emits_json_and_rolls_back(self):
+        out = io.StringIO()
+        call_command('microbench', sizes=[5], repeat=2, warmup=0, min_time=0.001,
+                     patterns=['roll_rarity', 'mint_cards*', 'UserCardSerializer*'], as_json=True, stdout=out)
+        results = json.loads(out.getvalue())['results']
+        self.assertEqual(set(results), {'roll_rarity', 'mint_cards[1]', 'mint_cards[5]', 'UserCardSerializer[5]',
+                                        'UserCardSerializer[5, query]'})
+        self.assertFalse(User.objects.filter(username='__microbench__').exists())
+        self.assertFalse(CardTemplate.objects.exists())
+
+    def test_fast_paths_are_benchmarked_against_serializers(self):
+        out = io.StringIO()
+        call_command('microbench', sizes=[4], repeat=2, warmup=0, min_time=0.001,
+                     patterns=['*, query]', '*_data[*'], as_json=True, stdout=out)
+        self.assertEqual(set(json.loads(out.getvalue())['results']), {
+            'UserCardSerializer[4, query]', 'user_cards_data[4]',
+        })
+
+
+class CatalogTest(TestCase):
+    """Test the versioned static catalog"""
+
+    def setUp(self):
+        cache.clear()
+        self.template = CardTemplate.objects.create(
+            name='Catalog Card', rarity='RARE', mining_rate=3, max_supply=50)
+        self.pack = Pack.objects.create(name='Starter', image='packs/starter.png', price=100)
+
+    def test_versioned_url_is_immutable(self):
+        response = self.client.get('/api/game/catalog/')
+        self.assertEqual(response.status_code, 200)
+        version = response.json()['version']
+        self.assertEqual([t['id'] for t in response.json()['templates']], [self.template.id])
+
+        response = self.client.get(f'/api/game/catalog/{version}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get('/api/game/catalog/stale/')
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].endswith(f'/catalog/{version}/'))
+
+    def test_packs_served_from_memory_until_changed(self):
+        first = self.client.get('/api/game/packs/')
+        self.assertEqual(first.json()[0]['image'], 'http://testserver/media/packs/starter.png')
+        with self.assertNumQueries(0):
+            self.client.get('/api/game/packs/')
+
+        # Minting only touches minted_count and must not invalidate the catalog
+        with self.captureOnCommitCallbacks(execute=True):
+            self.template.minted_count += 1
+            self.template.save(update_fields=['minted_count'])
+        with self.assertNumQueries(0):
+            self.client.get('/api/game/packs/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pack.price = 250
+            self.pack.save()
+        response = self.client.get('/api/game/packs/')
+        self.assertEqual(response.json()[0]['price'], 250)
+
+    def test_compact_cards_reference_template_ids(self):
+        user = User.objects.create_user(username='compact', password='testpass')
+        profile = PlayerProfile.objects.create(user=user)
+        card = UserCard.objects.create(owner=profile, template=self.template, serial_number=1)
+        self.client.login(username='compact', password='testpass')
+
+        response = self.client.get('/api/game/my-cards/?compact=1')
+        self.assertEqual(response.json(), [{
+            'id': card.id, 'serial_number': 1, 'template_id': self.template.id,
+            'is_listed_in_market': False,
+        }])
+
+
+class ImportCatalogTest(TestCase):
+    """Test the streaming catalog import command"""
+
+    CSV_HEADER = ('type,name,rarity,mining_rate,max_supply,image,price,currency_type,card_count,'
+                  'chance_common,chance_rare,chance_epic,chance_legendary\n')
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as fp:
+            fp.write(content)
+        return path
+
+    def run_import(self, path, **options):
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_catalog', path, stdout=out, stderr=io.StringIO(), **options)
+        return out.getvalue()
+
+    def test_csv_creates_templates_and_packs(self):
+        path = self.write('catalog.csv', self.CSV_HEADER +
+                          'template,Ash Knight,EPIC,8,500,cards/ash.png,,,,,,,\n'
+                          'template,Moss Page,,,1000,cards/moss.png,,,,,,,\n'
+                          'pack,Ember Pack,,,,packs/ember.png,250,VOW,3,50,30,15,5\n')
+        version = self.client.get('/api/game/catalog/').json()['version']
+        out = self.run_import(path, verbosity=2)
+
+        self.assertIn('template: 2 جدید', out)
+        self.assertIn('pack: 1 جدید', out)
+        self.assertIn('+ pack Ember Pack', out)
+        knight = CardTemplate.objects.get(name='Ash Knight')
+        self.assertEqual((knight.rarity, knight.mining_rate, knight.max_supply, knight.image.name),
+                         ('EPIC', 8, 500, 'cards/ash.png'))
+        # Missing columns fall back to model defaults for new rows
+        self.assertEqual(CardTemplate.objects.get(name='Moss Page').rarity, 'COMMON')
+        pack = Pack.objects.get(name='Ember Pack')
+        self.assertEqual((pack.price, pack.currency_type, pack.chance_legendary), (250, 'VOW', 5))
+        self.assertNotEqual(self.client.get('/api/game/catalog/').json()['version'], version)
+
+    def test_jsonl_updates_only_given_fields(self):
+        template = CardTemplate.objects.create(name='Old Guard', image='cards/old.png', rarity='RARE',
+                                               mining_rate=3, max_supply=100, minted_count=40)
+        Pack.objects.create(name='Starter', image='packs/starter.png', price=100)
+        path = self.write('catalog.jsonl', '\n'.join(json.dumps(row) for row in [
+            {'type': 'template', 'name': 'Old Guard', 'mining_rate': 5},
+            {'type': 'pack', 'name': 'Starter', 'price': 100},
+            {'type': 'pack', 'name': 'Starter', 'card_count': 2},
+        ]) + '\n')
+        out = self.run_import(path, verbosity=2)
+
+        self.assertIn('~ template Old Guard: mining_rate', out)
+        self.assertIn('~ pack Starter: card_count', out)
+        template.refresh_from_db()
+        self.assertEqual((template.mining_rate, template.max_supply, template.minted_count, template.rarity),
+                         (5, 100, 40, 'RARE'))
+        self.assertEqual(Pack.objects.get(name='Starter').card_count, 2)
+
+        out = self.run_import(path)
+        self.assertIn('template: 0 جدید، 0 تغییر، 1 بدون تغییر', out)
+
+    def test_invalid_rows_roll_back_everything(self):
+        CardTemplate.objects.create(name='Scarce', image='cards/scarce.png', max_supply=10, minted_count=8)
+        path = self.write('catalog.csv', self.CSV_HEADER +
+                          'template,Fine Card,RARE,2,50,cards/fine.png,,,,,,,\n'
+                          'pack,Bad Odds,,,,packs/bad.png,10,GEMS,1,60,30,9,0\n'
+                          'template,Scarce,,,5,,,,,,,,\n'
+                          'template,No Image,RARE,2,50,,,,,,,,\n'
+                          'relic,Thing,,,,,,,,,,,\n')
+        stderr = io.StringIO()
+        with self.assertRaisesMessage(CommandError, '4 ردیف نامعتبر'):
+            call_command('import_catalog', path, stdout=io.StringIO(), stderr=stderr)
+        errors = stderr.getvalue()
+        self.assertIn('مجموع شانس‌ها باید 100 باشد (الان 99)', errors)
+        self.assertIn('max_supply (5)', errors)
+        self.assertIn('image', errors)
+        self.assertFalse(CardTemplate.objects.filter(name='Fine Card').exists())
+        self.assertEqual(CardTemplate.objects.get(name='Scarce').max_supply, 10)
+
+    def test_dry_run_writes_nothing(self):
+        path = self.write('catalog.csv', self.CSV_HEADER + 'template,Ghost,RARE,2,50,cards/ghost.png,,,,,,,\n')
+        out = self.run_import(path, dry_run=True)
+        self.assertIn('template: 1 جدید', out)
+        self.assertFalse(CardTemplate.objects.exists())
+
+    def test_queries_are_per_batch_not_per_row(self):
+        def queries(rows):
+            path = self.write(f'catalog_{rows}.csv', self.CSV_HEADER + ''.join(
+                f'template,Card {rows}-{i},RARE,2,50,cards/{i}.png,,,,,,,\n' for i in range(rows)))
+            with CaptureQueriesContext(connection) as captured:
+                self.run_import(path, batch_size=10)
+            return len(captured)
+
+        self.assertEqual(queries(5), queries(10))
+        self.assertEqual(CardTemplate.objects.count(), 15)
+
+
+class ExportDataTest(TestCase):
+    """Test streaming exports of players, cards and trades"""
+
+    def setUp(self):
+        cache.clear()
+        clear_auth_cache()
+        self.directory = tempfile.mkdtemp()
+        template = CardTemplate.objects.create(name='Export Card', rarity='EPIC', max_supply=100, minted_count=4)
+        self.profiles = []
+        for i in range(2):
+            profile = PlayerProfile.objects.create(
+                user=User.objects.create_user(username=f'exporter{i}', password='testpass'), coins=10 * i)
+            for serial in (2 * i + 1, 2 * i + 2):
+                card = UserCard.objects.create(owner=profile, template=template, serial_number=serial)
+            MarketListing.objects.create(seller=profile, card_instance=card, price=5 + i, is_active=bool(i))
+            self.profiles.append(profile)
+
+    def export(self, dataset, filename, **options):
+        path = os.path.join(self.directory, filename)
+        out = io.StringIO()
+        call_command('export_data', dataset, output=path, stdout=out, **options)
+        return path, out.getvalue()
+
+    def test_csv_export(self):
+        path, out = self.export('players', 'players.csv')
+        self.assertIn('2 ردیف players', out)
+        with open(path, newline='', encoding='utf-8') as fp:
+            rows = list(csv.DictReader(fp))
+        self.assertEqual([row['username'] for row in rows], ['exporter0', 'exporter1'])
+        self.assertEqual(list(rows[0]), exports.columns('players'))
+        self.assertEqual(rows[1]['coins'], '10')
+        self.assertEqual(rows[0]['slot_1_id'], '')
+        self.assertTrue(rows[0]['last_claim_time'].endswith('Z'))
+
+        path, _ = self.export('trades', 'trades.csv')
+        with open(path, newline='', encoding='utf-8') as fp:
+            rows = list(csv.DictReader(fp))
+        self.assertEqual([(row['seller_username'], row['is_active']) for row in rows],
+                         [('exporter0', 'false'), ('exporter1', 'true')])
+
+    def test_gzip_jsonl_export(self):
+        path, _ = self.export('cards', 'cards.jsonl.gz')
+        with gzip.open(path, 'rt', encoding='utf-8') as fp:
+            rows = [json.loads(line) for line in fp]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['template_name'], 'Export Card')
+        self.assertIs(rows[0]['is_listed_in_market'], False)
+        self.assertEqual(rows[3]['serial_number'], 4)
+
+    def test_output_is_chunked(self):
+        with mock.patch.object(exports, 'STREAM_BUFFER_BYTES', 64):
+            chunks = list(exports.export('cards', 'jsonl', chunk_size=1))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b''.join(chunks).count(b'\n'), 4)
+        with self.assertNumQueries(1):
+            list(exports.export('trades', 'csv', compress=True))
+
+    def test_endpoint_is_staff_only(self):
+        url = '/api/game/export/trades.csv'
+        self.assertIn(self.client.get(url).status_code, (401, 403))
+        self.client.login(username='exporter0', password='testpass')
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        User.objects.create_superuser(username='analyst', password='testpass')
+        self.client.login(username='analyst', password='testpass')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="trades.csv"')
+        self.assertEqual(b''.join(response.streaming_content).count(b'\r\n'), 3)
+
+        response = self.client.get('/api/game/export/players.jsonl.gz')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).splitlines()
+        # staff user has no profile, so only the two players are exported
+        self.assertEqual([json.loads(line)['username'] for line in lines], ['exporter0', 'exporter1'])
+
+        self.assertEqual(self.client.get('/api/game/export/secrets.csv').status_code, 404)
+
+    def test_endpoint_is_paged(self):
+        User.objects.create_superuser(username='analyst', password='testpass')
+        self.client.login(username='analyst', password='testpass')
+        url = '/api/game/export/trades.jsonl'
+
+        def ids(response):
+            return [json.loads(line)['id'] for line in b''.join(response.streaming_content).splitlines()]
+
+        first = self.client.get(url, {'limit': 1})
+        listings = list(MarketListing.objects.order_by('pk').values_list('pk', flat=True))
+        self.assertEqual(ids(first), listings[:1])
+        next_url = first['Link'].split(';')[0].strip('<>')
+        last = self.client.get(next_url)
+        self.assertEqual(ids(last), listings[1:])
+        self.assertFalse(last.has_header('Link'))
+
+        with mock.patch.object(exports, 'EXPORT_PAGE_SIZE', 1):
+            self.assertEqual(len(ids(self.client.get(url, {'limit': 100}))), 1)
+        self.assertEqual(self.client.get(url, {'after': 'x'}).status_code, 400)
+
+
+class FastSerializerTest(TestCase):
+    """Fast read paths must render byte-identical JSON to the DRF serializers"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='fastpath', password='testpass')
+        self.avatar = Avatar.objects.create(name='Knight', image='avatars/knight.png')
+        self.profile = PlayerProfile.objects.create(user=self.user, avatar=self.avatar, level=3)
+        template = CardTemplate.objects.create(
+            name='Fast Card', image='cards/fast.png', rarity='EPIC', mining_rate=7, max_supply=10)
+        no_image = CardTemplate.objects.create(name='Blank', rarity='COMMON', max_supply=10)
+        self.cards = [
+            UserCard.objects.create(owner=self.profile, template=template, serial_number=1),
+            UserCard.objects.create(owner=self.profile, template=no_image, serial_number=1),
+        ]
+        MarketListing.objects.create(seller=self.profile, card_instance=self.cards[0], price=40)
+        self.profile.slot_2 = self.cards[1]
+        self.profile.save()
+
+    def assertSameJSON(self, fast, slow):
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(fast), renderer.render(slow))
+
+    def test_user_cards(self):
+        cards = UserCard.objects.order_by('id')
+        self.assertSameJSON(user_cards_data(cards), UserCardSerializer(cards, many=True).data)
+
+    def test_player_profile(self):
+        profile = PlayerProfile.objects.select_related(
+            'user', 'avatar', 'slot_1__template', 'slot_2__template', 'slot_3__template'
+        ).get(pk=self.profile.pk)
+        self.assertSameJSON(player_profile_data(profile), PlayerProfileSerializer(profile).data)
+
+
+class RendererTest(TestCase):
+    """Test the orjson and MessagePack renderers"""
+
+    def test_fast_json_matches_drf_json(self):
+        data = {
+            'created_at': timezone.make_aware(datetime.datetime(2025, 1, 2, 3, 4, 5, 678901)),
+            'day': datetime.date(2025, 1, 2),
+            'price': decimal.Decimal('12.50'),
+            'name': 'کارت\u2028افسانه‌ای\u2029',
+            'nested': [{'a': 1}, (2, 3), None, True, 0.15],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_messagepack_negotiation_and_parsing(self):
+        user = User.objects.create_user(username='packer', password='testpass')
+        PlayerProfile.objects.create(user=user, coins=2000)
+        self.client.login(username='packer', password='testpass')
+
+        response = self.client.post(
+            '/api/game/exchange/', msgpack.packb({'coins': 1000}),
+            content_type='application/msgpack', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['added_gems'], 25)
+
+
+class StreamingResponseTest(TestCase):
+    """Streaming mode must return the same JSON as the buffered endpoints"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='streamer', password='testpass')
+        self.profile = PlayerProfile.objects.create(user=self.user)
+        template = CardTemplate.objects.create(
+            name='Stream Card', image='cards/stream.png', rarity='RARE', mining_rate=2, max_supply=500)
+        cards = UserCard.objects.bulk_create([
+            UserCard(owner=self.profile, template=template, serial_number=serial)
+            for serial in range(1, 301)
+        ])
+        MarketListing.objects.bulk_create([
+            MarketListing(seller=self.profile, card_instance=card, price=5) for card in cards[:100]
+        ])
+        UserCard.objects.filter(id__in=[card.id for card in cards[:100]]).update(is_listed_in_market=True)
+        self.client.login(username='streamer', password='testpass')
+
+    def assertStreamMatches(self, url):
+        buffered = self.client.get(url)
+        streamed = self.client.get(url + ('&' if '?' in url else '?') + 'stream=1')
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(b''.join(streamed.streaming_content), buffered.content)
+
+    def test_market_feed_stream(self):
+        self.assertStreamMatches('/api/game/market/')
+
+    def test_my_cards_stream(self):
+        self.assertStreamMatches('/api/game/my-cards/')
+        self.assertStreamMatches('/api/game/my-cards/?compact=1&ordering=-serial')
+
+
+class BootstrapTest(TestCase):
+    """Test the single-request bootstrap payload"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='booter', password='testpass')
+        self.profile = PlayerProfile.objects.create(user=self.user, coins=50)
+        template = CardTemplate.objects.create(name='Boot Card', rarity='COMMON', max_supply=10)
+        UserCard.objects.create(owner=self.profile, template=template, serial_number=1)
+        Pack.objects.create(name='Boot Pack', image='packs/boot.png', price=10)
+        self.client.login(username='booter', password='testpass')
+
+    def test_bootstrap_matches_individual_endpoints(self):
+        data = self.client.get('/api/game/bootstrap/').json()
+        self.assertEqual(data['profile'], self.client.get('/api/game/profile/me/').json())
+        self.assertEqual(data['cards'], self.client.get('/api/game/my-cards/').json())
+        self.assertEqual(data['packs'], self.client.get('/api/game/packs/').json())
+        self.assertEqual(data['avatars'], self.client.get('/api/game/avatars/').json())
+        self.assertEqual(data['leaderboard'], self.client.get('/api/game/leaderboard/').json())
+        page = self.client.get('/api/game/market/?limit=50').json()
+        self.assertEqual((data['market'], data['market_next']), (page['results'], page['next']))
+
+    def test_bootstrap_only_returns_requested_keys(self):
+        full = self.client.get('/api/game/bootstrap/').json()
+        rest = [key for key in views.BOOTSTRAP_KEYS if key not in views.EMBEDDED_BOOTSTRAP_KEYS]
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/game/bootstrap/', {'only': ','.join(rest)}).json()
+        self.assertEqual(sorted(data), sorted(['catalog_version', *rest]))
+        self.assertEqual(data, {key: full[key] for key in data})
+        self.assertFalse(any('game_marketlisting' in q['sql'] for q in queries.captured_queries))
+        self.assertEqual(self.client.get('/api/game/bootstrap/', {'only': 'cards,secrets'}).status_code, 400)
+
+    def test_game_index_embeds_bootstrap(self):
+        response = self.client.get('/api/game/')
+        self.assertContains(response, 'id="game-bootstrap"')
+        self.assertContains(response, '"username": "booter"')
+        # Cards, packs and the rest are fetched by the SPA, so the page does not grow with them
+        self.assertNotContains(response, 'Boot Pack')
+
+        self.client.logout()
+        response = self.client.get('/api/game/')
+        self.assertNotContains(response, 'game-bootstrap')
+
+    def test_game_index_for_user_without_profile(self):
+        User.objects.create_superuser(username='root', password='testpass')
+        self.client.login(username='root', password='testpass')
+        response = self.client.get('/api/game/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'game-bootstrap')
+
+    def test_embedded_market_is_first_page_only(self):
+        template = CardTemplate.objects.get(name='Boot Card')
+        for serial in range(2, 2 + 55):
+            card = UserCard.objects.create(owner=self.profile, template=template, serial_number=serial,
+                                           is_listed_in_market=True)
+            MarketListing.objects.create(seller=self.profile, card_instance=card, price=serial)
+        data = views.embedded_bootstrap_data(self.client.get('/api/game/').wsgi_request)
+        self.assertEqual(sorted(data), ['catalog_version', 'market', 'market_next', 'profile'])
+        self.assertEqual(len(data['market']), 50)
+        self.assertEqual(data['market'][0]['price'], 56)
+
+        rest = self.client.get(data['market_next']).json()
+        self.assertIsNone(rest['next'])
+        listed = [item['listing_id'] for item in data['market'] + rest['results']]
+        self.assertEqual(listed, sorted(MarketListing.objects.values_list('id', flat=True), reverse=True))
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Query-count and response-size budgets for every endpoint in game/urls.py.
+
+    Each request is measured with cold caches (no cached session, user, profile
+    or catalog), so the budgets are the worst case a client can hit. Raising a
+    budget should be a deliberate change reviewed like any other behaviour change.
+    """
+
+    CARDS_OWNED = 60
+    SELLERS = 20
+
+    def setUp(self):
+        cache.clear()
+        clear_auth_cache()
+        reset_throttles()
+        reset_metrics()
+        self.templates = [
+            CardTemplate.objects.create(name=f'{rarity} {i}', rarity=rarity, mining_rate=i + 1, max_supply=1000)
+            for rarity in ('COMMON', 'RARE', 'EPIC', 'LEGENDARY') for i in range(5)
+        ]
+        for i in range(3):
+            Avatar.objects.create(name=f'Avatar {i}', image=f'avatars/{i}.png')
+        self.pack = Pack.objects.create(name='Big Pack', image='packs/big.png', price=10, card_count=5)
+        Pack.objects.create(name='Small Pack', image='packs/small.png', price=5, card_count=1)
+
+        self.user = User.objects.create_user(username='budget', password='testpass')
+        self.profile = PlayerProfile.objects.create(user=self.user, coins=100000, gems=1000, vow_fragments=100000)
+        self.cards = self.give_cards(self.profile, self.CARDS_OWNED)
+        self.profile.slot_1, self.profile.slot_2, self.profile.slot_3 = self.cards[:3]
+        self.profile.save()
+        self.profile.update_mining_rate()
+        PlayerProfile.objects.filter(pk=self.profile.pk).update(
+            last_claim_time=timezone.now() - datetime.timedelta(hours=2))
+
+        self.listings = []
+        for i in range(self.SELLERS):
+            seller = PlayerProfile.objects.create(
+                user=User.objects.create_user(username=f'seller{i}'), coins=i * 100)
+            card = self.give_cards(seller, 2)[0]
+            card.is_listed_in_market = True
+            card.save(update_fields=['is_listed_in_market'])
+            self.listings.append(MarketListing.objects.create(seller=seller, card_instance=card, price=50))
+
+        self.client.login(username='budget', password='testpass')
+
+    def give_cards(self, profile, count):
+        cards = []
+        for i in range(count):
+            template = self.templates[i % len(self.templates)]
+            template.minted_count += 1
+            cards.append(UserCard(owner=profile, template=template, serial_number=template.minted_count))
+        CardTemplate.objects.bulk_update(self.templates, ['minted_count'])
+        return UserCard.objects.bulk_create(cards)
+
+    def measure(self, method, url, data=None):
+        cache.clear()
+        clear_auth_cache()
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                if method == 'post':
+                    response = self.client.post(url, data or {}, content_type='application/json')
+                else:
+                    response = self.client.get(url, data)
+        return len(queries), response
+
+    def assertWithinBudget(self, method, url, max_queries, max_bytes, data=None, status=200):
+        count, response = self.measure(method, url, data)
+        self.assertEqual(response.status_code, status, url)
+        self.assertLessEqual(count, max_queries, f'{method.upper()} {url}: {count} queries')
+        size = len(b''.join(response.streaming_content) if response.streaming else response.content)
+        self.assertLessEqual(size, max_bytes, f'{method.upper()} {url}: {size} bytes')
+        return response
+
+    def test_page_budgets(self):
+        self.assertWithinBudget('get', '/api/game/', 10, 20000)
+        self.assertWithinBudget('get', '/api/game/login/', 0, 2048)
+        self.assertWithinBudget('get', '/api/game/register/', 0, 2048)
+
+    def test_auth_budgets(self):
+        self.assertWithinBudget('post', '/api/game/auth/logout/', 5, 256)
+        self.assertWithinBudget('post', '/api/game/auth/login/', 20, 2048,
+                                {'username': 'budget', 'password': 'testpass'})
+        self.client.logout()
+        self.assertWithinBudget('post', '/api/game/auth/register/', 20, 1024,
+                                {'username': 'newcomer', 'password': 'testpass'}, status=201)
+
+    def test_read_budgets(self):
+        self.assertWithinBudget('get', '/api/game/bootstrap/', 10, 20000)
+        self.assertWithinBudget('get', '/api/game/profile/me/', 4, 2048)
+        self.assertWithinBudget('get', '/api/game/leaderboard/', 4, 1024)
+        self.assertWithinBudget('get', '/api/game/avatars/', 6, 512)
+        self.assertWithinBudget('get', '/api/game/catalog/', 6, 4096)
+        self.assertWithinBudget('get', '/api/game/packs/', 6, 512)
+        self.assertWithinBudget('get', '/api/game/my-cards/', 4, 12000)
+        self.assertWithinBudget('get', '/api/game/my-cards/sync/', 5, 12000)
+        self.assertWithinBudget('get', '/api/game/my-cards/summary/', 5, 4096)
+        self.assertWithinBudget('get', '/api/game/market/', 4, 5000)
+        self.assertWithinBudget('get', '/api/game/market/', 3, 5000, {'stream': '1'})
+        self.assertWithinBudget('get', '/api/game/events/', 3, 256, status=501)
+
+    def test_metrics_budget(self):
+        self.user.is_staff = True
+        self.user.save(update_fields=['is_staff'])
+        self.assertWithinBudget('get', '/api/game/metrics/', 3, 4096)
+
+    def test_write_budgets(self):
+        avatar = Avatar.objects.first()
+        listing = self.listings[0]
+        self.assertWithinBudget('post', '/api/game/profile/update/', 6, 256, {'avatar_id': avatar.id})
+        self.assertWithinBudget('post', '/api/game/open-pack/', 14, 1536, {'pack_id': self.pack.id})
+        self.assertWithinBudget('post', '/api/game/equip/', 10, 256,
+                                {'card_id': self.cards[10].id, 'slot_number': 2})
+        self.assertWithinBudget('post', '/api/game/claim/', 7, 256)
+        self.assertWithinBudget('post', '/api/game/exchange/', 7, 256, {'coins': 1000})
+        self.assertWithinBudget('post', '/api/game/market/create/', 12, 256,
+                                {'card_id': self.cards[20].id, 'price': 100})
+        self.assertWithinBudget('post', f'/api/game/market/buy/{listing.id}/', 17, 256,
+                                {'listing_id': listing.id})
+
+    def assertSameQueryCount(self, method, url, grow, data=None):
+        before, _ = self.measure(method, url, data)
+        grow()
+        after, response = self.measure(method, url, data)
+        self.assertLess(response.status_code, 300, url)
+        self.assertEqual(after, before, f'{method.upper()} {url}')
+
+    def test_profile_queries_independent_of_card_count(self):
+        self.assertSameQueryCount('get', '/api/game/profile/me/', lambda: self.give_cards(self.profile, 200))
+        self.assertSameQueryCount('get', '/api/game/my-cards/', lambda: self.give_cards(self.profile, 200))
+        self.assertSameQueryCount('get', '/api/game/my-cards/summary/', lambda: self.give_cards(self.profile, 200))
+
+    def test_feed_queries_independent_of_row_count(self):
+        def more_players():
+            start = User.objects.count()
+            for i in range(start, start + 30):
+                seller = PlayerProfile.objects.create(user=User.objects.create_user(username=f'extra{i}'))
+                card = self.give_cards(seller, 1)[0]
+                MarketListing.objects.create(seller=seller, card_instance=card, price=10)
+
+        self.assertSameQueryCount('get', '/api/game/market/', more_players)
+        self.assertSameQueryCount('get', '/api/game/leaderboard/', more_players)
+
+    def test_open_pack_queries_independent_of_card_count(self):
+        def bigger_pack():
+            self.pack.card_count = 10
+            self.pack.save(update_fields=['card_count'])
+
+        self.pack.card_count = 1
+        self.pack.save(update_fields=['card_count'])
+        self.assertSameQueryCount('post', '/api/game/open-pack/', bigger_pack, {'pack_id': self.pack.id})
+        self.assertEqual(UserCard.objects.filter(owner=self.profile).count(), self.CARDS_OWNED + 11)
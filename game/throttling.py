@@ -0,0 +1,123 @@
+"""
+محدودسازی نرخ درخواست با token bucket برای هر کاربر
+
+هر scope (مثلاً claim یا open_pack) یک سطل با ظرفیت burst دارد که با نرخ rate
+دوباره پر می‌شود. درخواستی که توکن نداشته باشد پیش از رسیدن به دیتابیس با 429
+و هدر Retry-After رد می‌شود.
+
+وضعیت سطل‌ها در حالت پیش‌فرض داخل پروسه نگه داشته می‌شود؛ با تنظیم
+GAME_THROTTLE_CACHE_ALIAS در یک کش مشترک (مثلاً Redis) ذخیره می‌شود. خواندن و
+نوشتن در کش مشترک اتمیک نیست (مثل throttleهای خود DRF)، پس در رقابت‌های همزمان
+ممکن است یکی دو درخواست بیشتر از بودجه رد شوند.
+
+تنظیمات:
+    GAME_THROTTLE_BUCKETS = {'claim': {'rate': '6/min', 'burst': 3}, ...}
+    scopeی که در این دیکشنری نباشد محدود نمی‌شود.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+from .authentication import TTLCache
+
+_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# سطلی که یک ساعت دست نخورده، با هر نرخ معقولی دوباره پر شده است
+_local = TTLCache(getattr(settings, 'GAME_THROTTLE_LOCAL_SIZE', 10000), 3600)
+_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """'6/min' -> توکن در ثانیه"""
+    num, period = rate.split('/')
+    return int(num) / _PERIODS[period[0]]
+
+
+def _shared():
+    alias = getattr(settings, 'GAME_THROTTLE_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def _get(key):
+    shared = _shared()
+    return shared.get(key) if shared else _local.get(key)
+
+
+def _set(key, value, timeout):
+    shared = _shared()
+    if shared:
+        shared.set(key, value, max(1, math.ceil(timeout)))
+    else:
+        _local.set(key, value)
+
+
+def take_token(key, rate, burst):
+    """
+    برداشتن یک توکن از سطل؛ صفر یعنی درخواست مجاز است،
+    در غیر این صورت تعداد ثانیه‌هایی که باید صبر کرد
+    """
+    refill = parse_rate(rate)
+    now = time.time()
+    with _lock:
+        tokens, updated = _get(key) or (burst, now)
+        tokens = min(burst, tokens + (now - updated) * refill)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0
+        else:
+            wait = (1 - tokens) / refill
+        _set(key, (tokens, now), (burst - tokens) / refill)
+    return wait
+
+
+def set_cooldown(scope, ident, seconds):
+    """تا seconds ثانیهٔ دیگر درخواست‌های این کاربر در این scope بی‌فایده‌اند"""
+    _set(f'game:cooldown:{scope}:{ident}', time.time() + seconds, seconds)
+
+
+def cooldown_remaining(scope, ident):
+    until = _get(f'game:cooldown:{scope}:{ident}')
+    if until is None:
+        return 0
+    return max(0, until - time.time())
+
+
+def reset_throttles():
+    """پاک کردن وضعیت داخل پروسه (برای تست‌ها)"""
+    _local.clear()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    scope = None
+
+    def __init__(self):
+        buckets = getattr(settings, 'GAME_THROTTLE_BUCKETS', {})
+        self.bucket = buckets.get(self.scope)
+        self._wait = None
+
+    def get_ident(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'u{request.user.pk}'
+        return f'ip{super().get_ident(request)}'
+
+    def allow_request(self, request, view):
+        if not self.bucket:
+            return True
+        key = f'game:throttle:{self.scope}:{self.get_ident(request)}'
+        self._wait = take_token(key, self.bucket['rate'], self.bucket.get('burst', 1))
+        return not self._wait
+
+    def wait(self):
+        return self._wait
+
+
+class ClaimCoinsThrottle(TokenBucketThrottle):
+    scope = 'claim'
+
+
+class OpenPackThrottle(TokenBucketThrottle):
+    scope = 'open_pack'
@@ -1,8 +1,11 @@
-from django.urls import path
-from . import views
+from django.urls import path, re_path
+from . import views, async_views
 from django.conf import settings
 from django.conf.urls.static import static
 
+# endpointهای فقط‌خواندنی: نسخهٔ async زیر ASGI، نسخهٔ DRF زیر WSGI
+reads = async_views if getattr(settings, 'GAME_ASYNC_READ_VIEWS', False) else views
+
 urlpatterns = [
     # --- صفحات اصلی (HTML) ---
     path('', views.game_index, name='game-index'),
@@ -15,22 +18,31 @@ urlpatterns = [
     path('auth/logout/', views.logout_user, name='logout'),
 
     # --- پروفایل و اطلاعات پایه ---
-    path('profile/me/', views.get_my_profile, name='my-profile'),
+    path('bootstrap/', views.bootstrap, name='bootstrap'),
+    path('profile/me/', reads.get_my_profile, name='my-profile'),
     path('profile/update/', views.update_profile, name='update-profile'),
-    path('leaderboard/', views.leaderboard, name='leaderboard'),
-    path('avatars/', views.get_avatars, name='get-avatars'),
+    path('leaderboard/', reads.leaderboard, name='leaderboard'),
+    path('avatars/', reads.get_avatars, name='get-avatars'),
+    path('catalog/', views.get_catalog_view, name='catalog'),
+    path('catalog/<str:version>/', views.get_catalog_view, name='catalog-versioned'),
+    path('events/', async_views.event_stream, name='events'),
+    path('metrics/', views.metrics, name='metrics'),
+    # خروجی استریمی جدول‌ها برای staff: export/players.csv، export/trades.jsonl.gz
+    re_path(r'^export/(?P<dataset>\w+)\.(?P<fmt>csv|jsonl)(?P<gz>\.gz)?$', views.export_data, name='export-data'),
 
     # --- سیستم بازی (Game Loop) ---
-    path('packs/', views.get_packs, name='get-packs'),
+    path('packs/', reads.get_packs, name='get-packs'),
     path('open-pack/', views.open_pack, name='open-pack'),
     path('my-cards/', views.get_my_cards, name='my-cards'),
+    path('my-cards/sync/', views.sync_my_cards, name='my-cards-sync'),
+    path('my-cards/summary/', views.collection_summary, name='my-cards-summary'),
     path('equip/', views.equip_card, name='equip-card'),
     path('claim/', views.claim_coins, name='claim-coins'),
     path('exchange/', views.exchange_coins, name='exchange'),
 
     # --- بازار سیاه (Black Market) ---
     # لیست تمام آگهی‌ها
-    path('market/', views.market_feed, name='market-feed'), 
+    path('market/', reads.market_feed, name='market-feed'), 
     # ثبت آگهی فروش جدید
     path('market/create/', views.create_listing, name='market-create'), 
     # خرید یک کارت (نیاز به ID دارد)
@@ -1,26 +1,56 @@
 from django.db import models, transaction, IntegrityError
-from django.db.models import Q
+from django.db.models import Q, Count, Min, Sum
 from django.utils import timezone
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.shortcuts import render, redirect
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from django.utils.http import parse_etags
+from django.utils.html import json_script
+from django.conf import settings
 import random
 import math
 
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.authtoken.models import Token
-
-from .models import MarketListing, CardTemplate, UserCard, PlayerProfile, Avatar, Pack
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.utils import encoders
+
+from . import exports
+from .models import MarketListing, CardTemplate, UserCard, PlayerProfile, Avatar, Pack, InventoryChange
+from .events import MARKET_CHANNEL, publish, publish_balance
+from .idempotency import idempotent
+from .inventory import record_card_changes, collapse_changes
+from .metrics import render_prometheus
+from .pagination import DEFAULT_PAGE_SIZE, keyset_paginate, parse_page_size
+from .authentication import get_profile_id, invalidate_token, invalidate_user
+from .catalog import get_catalog, catalog_generation
+from .cache import (
+    bump_profile_version,
+    get_profile_version,
+    get_cached_profile,
+    set_cached_profile,
+    profile_etag,
+    get_cached_collection_summary,
+    set_cached_collection_summary,
+)
 from .serializers import (
     UserCardSerializer,
+    UserCardCompactSerializer,
     PlayerProfileSerializer,
-    AvatarSerializer,
-    PackSerializer,
-    MarketListingSerializer
+    user_cards_data,
+    iter_user_cards,
+    iter_user_cards_compact,
+    player_profile_data,
 )
+from .streaming import STREAM_CHUNK_SIZE, wants_stream, streaming_json_response
+from .throttling import ClaimCoinsThrottle, OpenPackThrottle, set_cooldown, cooldown_remaining
 
 # 1. دریافت لیست آواتارها
 
@@ -28,9 +58,8 @@ from .serializers import (
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_avatars(request):
-    avatars = Avatar.objects.all()
-    serializer = AvatarSerializer(avatars, many=True)
-    return Response(serializer.data)
+    # از کاتالوگ داخل حافظه؛ بدون کوئری
+    return Response(get_catalog()['avatars'])
 
 # 2. آپدیت پروفایل
 
@@ -45,32 +74,41 @@ def update_profile(request):
     new_password = request.data.get('password')
     avatar_id = request.data.get('avatar_id')
 
-    # تغییر نام کاربری
-    if new_username and new_username != user.username:
-        if User.objects.filter(username=new_username).exists():
-            return Response({'error': 'این نام کاربری قبلاً گرفته شده است.'}, status=400)
-        user.username = new_username
-        user.save()
+    # اول همهٔ فیلدها بررسی می‌شوند تا با خطای یک فیلد، فیلد دیگری نیمه‌کاره ذخیره نشود
+    rename = bool(new_username) and new_username != user.username
+    if rename and User.objects.filter(username=new_username).exists():
+        return Response({'error': 'این نام کاربری قبلاً گرفته شده است.'}, status=400)
+    if new_password and len(new_password) < 6:
+        return Response({'error': 'رمز عبور باید حداقل ۶ کاراکتر باشد.'}, status=400)
+    avatar = None
+    if avatar_id:
+        try:
+            avatar = Avatar.objects.get(id=avatar_id)
+        except (Avatar.DoesNotExist, ValueError, TypeError):
+            return Response({'error': 'آواتار نامعتبر است.'}, status=400)
 
-    # تغییر رمز عبور
+    # تغییر نام کاربری و رمز عبور
+    if rename:
+        user.username = new_username
     if new_password:
-        if len(new_password) < 6:
-            return Response({'error': 'رمز عبور باید حداقل ۶ کاراکتر باشد.'}, status=400)
         user.set_password(new_password)
+    if rename or new_password:
         user.save()
+
+    # تغییر آواتار
+    if avatar is not None:
+        profile.avatar = avatar
+        profile.save(update_fields=['avatar'])
+
+    bump_profile_version(user.pk)
+
+    if new_password:
+        # سیگنال post_save کاربر را از کش احراز هویت هم پاک می‌کند؛ برای وضوح صریح:
+        invalidate_user(user.pk)
         # نکته: بعد از تغییر رمز، سشن کاربر ممکن است منقضی شود که باید دوباره لاگین کند
         # اما فعلاً برای سادگی لاگین را نگه می‌داریم:
         login(request, user)
 
-    # تغییر آواتار
-    if avatar_id:
-        try:
-            avatar = Avatar.objects.get(id=avatar_id)
-            profile.avatar = avatar
-            profile.save()
-        except Avatar.DoesNotExist:
-            return Response({'error': 'آواتار نامعتبر است.'}, status=400)
-
     return Response({'message': 'پروفایل با موفقیت بروزرسانی شد.'})
 
 
@@ -81,44 +119,254 @@ PACK_PRICE = 100
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_my_profile(request):
-    serializer = PlayerProfileSerializer(request.user.profile)
-    return Response(serializer.data)
+    # پاسخ از کش نسخه‌دار خوانده می‌شود؛ فقط بعد از تغییر پروفایل دوباره سریالایز می‌شود
+    user_id = request.user.pk
+    version = current_profile_version(user_id)
+    etag = profile_etag(user_id, version)
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Vary': 'Accept'}
+
+    # Conditional GET: اگر نسخهٔ کلاینت به‌روز است، بدنه‌ای ارسال نمی‌شود
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(profile_data(user_id, version), headers=headers)
+
+
+def current_profile_version(user_id):
+    # نسل کاتالوگ هم جزء نسخه است چون اسلات‌ها اطلاعات تمپلیت را در خود دارند
+    return f'{get_profile_version(user_id)}.{catalog_generation()}'
+
+
+def profile_data(user_id, version):
+    """payload پروفایل از کش؛ در صورت نبودن، با یک کوئری ساخته و ذخیره می‌شود"""
+    data = get_cached_profile(user_id, version)
+    if data is None:
+        profile = PlayerProfile.objects.select_related(
+            'user', 'avatar',
+            'slot_1__template', 'slot_2__template', 'slot_3__template'
+        ).get(user_id=user_id)
+        data = player_profile_data(profile)
+        set_cached_profile(user_id, version, data)
+    return data
 
 
 @api_view(['GET'])
 def leaderboard(request):
+    return Response(leaderboard_data())
+
+
+def leaderboard_queryset():
     # مرتب‌سازی ترکیبی: اول بر اساس قدرت ماینینگ، بعد سکه
-    top_players = PlayerProfile.objects.select_related('user', 'avatar') \
+    return PlayerProfile.objects.select_related('user', 'avatar') \
         .order_by('-current_mining_rate', '-coins')[:10]  # <--- بهینه شد
 
-    data = []
-    for rank, player in enumerate(top_players, 1):
-        data.append({
-            'rank': rank,
-            'username': player.user.username,
-            'coins': player.coins,
-            'power': player.current_mining_rate,  # خواندن مستقیم و سریع
-            'avatar': player.avatar.image.url if player.avatar else None
-        })
 
-    return Response(data)
+def leaderboard_entry(rank, player):
+    return {
+        'rank': rank,
+        'username': player.user.username,
+        'coins': player.coins,
+        'power': player.current_mining_rate,  # خواندن مستقیم و سریع
+        'avatar': player.avatar.image.url if player.avatar else None
+    }
+
+
+def leaderboard_data():
+    return [leaderboard_entry(rank, player)
+            for rank, player in enumerate(leaderboard_queryset(), 1)]
+
+
+def wants_compact(request):
+    """?compact=1: کارت‌ها فقط با template_id (جزئیات تمپلیت از کاتالوگ)"""
+    return request.query_params.get('compact') in ('1', 'true')
+
+
+def card_serializer_class(request):
+    return UserCardCompactSerializer if wants_compact(request) else UserCardSerializer
+
+
+# نام پارامتر ordering -> فیلد مرتب‌سازی در UserCard
+INVENTORY_ORDERING_FIELDS = {
+    'id': 'id',
+    'serial': 'serial_number',
+    'mining_rate': 'template__mining_rate',
+}
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_my_cards(request):
+    """
+    لیست کارت‌های بازیکن (به جز کارت‌های داخل مارکت)
+
+    Query params (همه اختیاری):
+        rarity: فیلتر بر اساس کمیابی (COMMON / RARE / EPIC / LEGENDARY)
+        template: فیلتر بر اساس شناسهٔ تمپلیت
+        ordering: id, serial, mining_rate (با - برای نزولی)
+        limit / cursor: صفحه‌بندی keyset؛ بدون این دو، کل لیست مثل قبل برگردانده می‌شود
+        stream=1: کل لیست به صورت استریم (فقط بدون صفحه‌بندی)
+    """
+    params = request.query_params
+    # کارت‌هایی که در مارکت نیستند (شناسهٔ پروفایل از کش احراز هویت، بدون کوئری)
+    cards = UserCard.objects.filter(
+        owner_id=get_profile_id(request.user), is_listed_in_market=False
+    ).select_related('template')
+
+    rarity = params.get('rarity')
+    if rarity:
+        rarity = rarity.upper()
+        if rarity not in dict(CardTemplate.RARITY_CHOICES):
+            return Response({'error': 'کمیابی نامعتبر است.'}, status=400)
+        cards = cards.filter(template__rarity=rarity)
+
+    template_id = params.get('template')
+    if template_id:
+        try:
+            cards = cards.filter(template_id=int(template_id))
+        except ValueError:
+            return Response({'error': 'شناسه تمپلیت نامعتبر است.'}, status=400)
+
+    ordering = params.get('ordering', 'id')
+    descending = ordering.startswith('-')
+    field = INVENTORY_ORDERING_FIELDS.get(ordering.lstrip('-'))
+    if field is None:
+        return Response({'error': 'مرتب‌سازی نامعتبر است.'}, status=400)
+
+    if 'limit' not in params and 'cursor' not in params:
+        # حالت قدیمی: کل لیست در یک پاسخ
+        prefix = '-' if descending else ''
+        order = [f'{prefix}{field}'] if field == 'id' else [f'{prefix}{field}', f'{prefix}id']
+        cards = cards.order_by(*order)
+        if wants_stream(request):
+            rows = iter_user_cards_compact if wants_compact(request) else iter_user_cards
+            return streaming_json_response(rows(cards, chunk_size=STREAM_CHUNK_SIZE))
+        if wants_compact(request):
+            return Response(UserCardCompactSerializer(cards, many=True).data)
+        return Response(user_cards_data(cards))
+
+    try:
+        page_size = parse_page_size(params.get('limit'))
+        page, next_cursor = keyset_paginate(
+            cards, field, descending, params.get('cursor'), page_size)
+    except ValueError:
+        return Response({'error': 'پارامترهای صفحه‌بندی نامعتبر است.'}, status=400)
+
+    next_url = None
+    if next_cursor:
+        next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+
+    return Response({
+        'next': next_url,
+        'results': card_serializer_class(request)(page, many=True).data,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def collection_summary(request):
+    """
+    خلاصهٔ کلکسیون به ازای هر تمپلیت (با GROUP BY در دیتابیس)
+    اندازهٔ پاسخ به تعداد تمپلیت‌های متفاوت بستگی دارد، نه تعداد کارت‌ها
+    """
+    profile = request.user.profile
+    data = get_cached_collection_summary(profile.pk, profile.inventory_seq)
+    if data is None:
+        rows = UserCard.objects.filter(owner=profile).values(
+            'template_id', 'template__name', 'template__rarity'
+        ).annotate(
+            owned=Count('id'),
+            listed=Count('id', filter=Q(is_listed_in_market=True)),
+            best_serial=Min('serial_number'),
+            total_mining_rate=Sum('template__mining_rate'),
+        ).order_by('template_id')
+
+        data = [{
+            'template_id': row['template_id'],
+            'card_name': row['template__name'],
+            'rarity': row['template__rarity'],
+            'owned': row['owned'],
+            'listed': row['listed'],
+            'best_serial': row['best_serial'],
+            'total_mining_rate': row['total_mining_rate'],
+        } for row in rows]
+        set_cached_collection_summary(profile.pk, profile.inventory_seq, data)
+
+    return Response(data)
+
+
+def cards_snapshot(request, profile, current):
+    cards = UserCard.objects.filter(owner=profile).order_by('id')
+    if wants_compact(request):
+        changed = UserCardCompactSerializer(cards, many=True).data
+    else:
+        changed = user_cards_data(cards)
+    return Response({
+        'cursor': current,
+        'full': True,
+        'changed': changed,
+        'removed': [],
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_my_cards(request):
+    """
+    همگام‌سازی افزایشی کارت‌ها از روی cursor کلاینت
+
+    Query params:
+        since: آخرین cursor دریافت‌شده (بدون آن snapshot کامل برگردانده می‌شود)
+
+    خروجی شامل همهٔ کارت‌های بازیکن است (از جمله کارت‌های داخل مارکت، با is_listed_in_market)
+    و removed شناسهٔ کارت‌هایی است که دیگر متعلق به بازیکن نیستند.
+    cursorی که تغییرات بعدش پاک شده (purge_inventory_changes) هم snapshot کامل می‌گیرد.
+    """
     profile = request.user.profile
-    # کارت‌هایی که در مارکت نیستند
-    cards = UserCard.objects.filter(owner=profile, is_listed_in_market=False)
-    serializer = UserCardSerializer(cards, many=True)
-    return Response(serializer.data)
+    current = profile.inventory_seq
+
+    since = request.query_params.get('since')
+    try:
+        since = int(since) if since not in (None, '') else None
+    except ValueError:
+        return Response({'error': 'cursor نامعتبر است.'}, status=400)
+
+    if since is None or since < 0 or since > current:
+        # snapshot کامل (اولین همگام‌سازی یا cursor ناشناخته)
+        return cards_snapshot(request, profile, current)
+
+    changed_ids, removed_ids = [], []
+    if since < current:
+        rows = list(InventoryChange.objects.filter(
+            owner=profile, seq__gt=since, seq__lte=current
+        ).order_by('seq').values_list('card_id', 'removed'))
+        if len(rows) != current - since:
+            # شماره‌ها پشت سر هم‌اند؛ کمبود ردیف یعنی cursor از تغییرات نگه‌داشته‌شده قدیمی‌تر است
+            return cards_snapshot(request, profile, current)
+        changed_ids, removed_ids = collapse_changes(rows)
+
+    cards = []
+    if changed_ids:
+        cards = list(UserCard.objects.filter(
+            owner=profile, id__in=changed_ids
+        ).select_related('template').order_by('id'))
+        # کارتی که بعد از ثبت تغییر از دست بازیکن خارج شده هم حذف‌شده حساب می‌شود
+        owned = {card.id for card in cards}
+        removed_ids += [card_id for card_id in changed_ids if card_id not in owned]
+
+    return Response({
+        'cursor': current,
+        'full': False,
+        'changed': card_serializer_class(request)(cards, many=True).data,
+        'removed': sorted(removed_ids),
+    })
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([OpenPackThrottle])
+@idempotent
 def open_pack(request):
     user = request.user
-    profile = user.profile
     pack_id = request.data.get('pack_id')
 
     # 1. پیدا کردن پک
@@ -130,16 +378,17 @@ def open_pack(request):
     except Pack.DoesNotExist:
         return Response({'error': 'پک یافت نشد.'}, status=404)
 
-    # 2. بررسی موجودی
-    if pack.currency_type == 'GEMS' and profile.gems < pack.price:
-        return Response({'error': 'الماس کافی ندارید!'}, status=400)
-    elif pack.currency_type == 'COINS' and profile.coins < pack.price:
-        return Response({'error': 'سکه کافی ندارید!'}, status=400)
-    elif pack.currency_type == 'VOW' and profile.vow_fragments < pack.price:
-        return Response({'error': 'فرگمنت کافی ندارید!'}, status=400)
-
     # شروع تراکنش
     with transaction.atomic():
+        # 2. قفل پروفایل و بررسی موجودی زیر قفل (جلوگیری از خرج دوباره در درخواست‌های همزمان)
+        profile = PlayerProfile.objects.select_for_update().get(user=user)
+        if pack.currency_type == 'GEMS' and profile.gems < pack.price:
+            return Response({'error': 'الماس کافی ندارید!'}, status=400)
+        elif pack.currency_type == 'COINS' and profile.coins < pack.price:
+            return Response({'error': 'سکه کافی ندارید!'}, status=400)
+        elif pack.currency_type == 'VOW' and profile.vow_fragments < pack.price:
+            return Response({'error': 'فرگمنت کافی ندارید!'}, status=400)
+
         # کسر هزینه
         if pack.currency_type == 'GEMS':
             profile.gems -= pack.price
@@ -147,63 +396,15 @@ def open_pack(request):
             profile.coins -= pack.price
         elif pack.currency_type == 'VOW':
             profile.vow_fragments -= pack.price
-        profile.save()
-
-        created_cards = []
-
-        # 3. حلقه تولید کارت به تعداد مشخص شده در پک
-        for _ in range(pack.card_count):
-            roll = random.randint(1, 100)
-
-            # منطق تجمعی (Cumulative Probability) بر اساس تنظیمات پک
-            cumulative = 0
-            selected_rarity = 'COMMON'  # پیش‌فرض
-
-            # چک کردن Common
-            cumulative += pack.chance_common
-            if roll <= cumulative:
-                selected_rarity = 'COMMON'
-            else:
-                # چک کردن Rare
-                cumulative += pack.chance_rare
-                if roll <= cumulative:
-                    selected_rarity = 'RARE'
-                else:
-                    # چک کردن Epic
-                    cumulative += pack.chance_epic
-                    if roll <= cumulative:
-                        selected_rarity = 'EPIC'
-                    else:
-                        # باقی‌مانده می‌شود Legendary
-                        selected_rarity = 'LEGENDARY'
-
-            # انتخاب تمپلیت
-            available_cards = CardTemplate.objects.select_for_update().filter(
-                rarity=selected_rarity,
-                minted_count__lt=models.F('max_supply')
-            )
+        profile.save(update_fields=['gems', 'coins', 'vow_fragments'])
 
-            # فال‌بک (اگر کارت نایاب تمام شده بود، معمولی بده)
-            if not available_cards.exists():
-                available_cards = CardTemplate.objects.select_for_update().filter(
-                    rarity='COMMON',
-                    minted_count__lt=models.F('max_supply')
-                )
+        # 3. تولید کارت‌ها به تعداد مشخص شده در پک؛ تعداد کوئری‌ها به card_count بستگی ندارد
+        rarities = [roll_rarity(pack_chances(pack)) for _ in range(pack.card_count)]
+        created_cards = mint_cards(profile, rarities)
 
-            # اگر کلاً کارتی نبود (خیلی بعید)
-            if not available_cards.exists():
-                continue  # این دور را رد کن (یا ارور بده)
-
-            card_template = random.choice(list(available_cards))
-            card_template.minted_count += 1
-            card_template.save()
-
-            new_card = UserCard.objects.create(
-                owner=profile,
-                template=card_template,
-                serial_number=card_template.minted_count
-            )
-            created_cards.append(new_card)
+        record_card_changes(profile.pk, [card.id for card in created_cards])
+        bump_profile_version(user.pk)
+        publish_balance(profile)
 
         # سریالایز کردن لیست کارت‌ها
         serializer = UserCardSerializer(created_cards, many=True)
@@ -216,13 +417,105 @@ def open_pack(request):
             'remaining_vow': profile.vow_fragments
         })
 
+
+def pack_chances(pack):
+    # باقی‌مانده (تا 100) سهم Legendary است
+    return [
+        ('COMMON', pack.chance_common),
+        ('RARE', pack.chance_rare),
+        ('EPIC', pack.chance_epic),
+        ('LEGENDARY', None),
+    ]
+
+
+# شانس کارت هدیهٔ ثبت‌نام
+STARTER_CHANCES = [('COMMON', 60), ('RARE', 30), ('EPIC', 9), ('LEGENDARY', None)]
+
+
+def roll_rarity(chances, roll=None):
+    """
+    انتخاب کمیابی با احتمال تجمعی (Cumulative Probability)
+    chances: [(rarity, درصد), ...] به ترتیب؛ آخری باقی‌مانده را می‌گیرد
+    """
+    if roll is None:
+        roll = random.randint(1, 100)
+    cumulative = 0
+    for rarity, chance in chances[:-1]:
+        cumulative += chance
+        if roll <= cumulative:
+            return rarity
+    return chances[-1][0]
+
+
+def mint_cards(profile, rarities):
+    """
+    ساخت کارت‌های جدید برای بازیکن با یک قفل روی تمپلیت‌های لازم، یک bulk_update
+    و یک bulk_create. باید داخل تراکنش صدا زده شود.
+    اگر کمیابی انتخاب‌شده تمام شده باشد COMMON داده می‌شود و اگر آن هم نباشد کارتی ساخته نمی‌شود.
+    """
+    if not rarities:
+        return []
+    templates = CardTemplate.objects.select_for_update().filter(
+        rarity__in=set(rarities) | {'COMMON'},
+        minted_count__lt=models.F('max_supply')
+    ).order_by('id')
+    by_rarity = {}
+    for template in templates:
+        by_rarity.setdefault(template.rarity, []).append(template)
+
+    def available(rarity):
+        return [t for t in by_rarity.get(rarity, ()) if t.minted_count < t.max_supply]
+
+    new_cards = []
+    touched = {}
+    for rarity in rarities:
+        candidates = available(rarity) or available('COMMON')
+        if not candidates:
+            continue  # کلاً کارتی نمانده (خیلی بعید)
+        template = random.choice(candidates)
+        template.minted_count += 1
+        touched[template.pk] = template
+        new_cards.append(UserCard(owner=profile, template=template, serial_number=template.minted_count))
+
+    CardTemplate.objects.bulk_update(touched.values(), ['minted_count'])
+    return UserCard.objects.bulk_create(new_cards)
+
 # ==========================================
 
 
+CLAIM_COOLDOWN_SECONDS = 60
+
+
+def add_xp(profile, amount):
+    """اضافه کردن XP و بالا بردن لول؛ True اگر لول بالا رفت (بدون ذخیره)"""
+    profile.xp += amount
+
+    # حلقه چک کردن لول (ممکن است یکجا آنقدر XP بگیرد که 2 لول بالا برود)
+    leveled_up = False
+    while profile.xp >= profile.get_next_level_xp():
+        profile.xp -= profile.get_next_level_xp()  # کسر XP مصرف شده
+        profile.level += 1
+        leveled_up = True
+    return leveled_up
+
+
+def claim_too_soon(seconds_left):
+    return Response({'error': 'مخزن هنوز خالی است. لطفاً صبر کنید.'}, status=400,
+                    headers={'Retry-After': str(math.ceil(seconds_left))})
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([ClaimCoinsThrottle])
+@idempotent
 def claim_coins(request):
     MAX_HOURS_CAP = 8.0  # حداکثر ظرفیت ذخیره (ساعت)
+    user_id = request.user.pk
+
+    # کلیک‌های پشت سر هم بدون رفتن سراغ دیتابیس و قفل رد می‌شوند
+    seconds_left = cooldown_remaining('claim', user_id)
+    if seconds_left:
+        return claim_too_soon(seconds_left)
 
     with transaction.atomic():
         # قفل کردن پروفایل برای جلوگیری از دابل کلیک
@@ -239,7 +532,9 @@ def claim_coins(request):
 
         # اگر کمتر از 1 دقیقه گذشته، خطا بده (جلوگیری از اسپم ریکوئست)
         if hours_passed < (1/60):
-            return Response({'error': 'مخزن هنوز خالی است. لطفاً صبر کنید.'}, status=400)
+            seconds_left = CLAIM_COOLDOWN_SECONDS - time_diff.total_seconds()
+            set_cooldown('claim', user_id, seconds_left)
+            return claim_too_soon(seconds_left)
 
         # اعمال محدودیت ظرفیت (Cap)
         effective_hours = min(hours_passed, MAX_HOURS_CAP)
@@ -248,24 +543,17 @@ def claim_coins(request):
 
         if coins_earned > 0:
             profile.coins += coins_earned
-
-            # --- منطق لول آپ ---
-            profile.xp += coins_earned
-
-            # حلقه چک کردن لول (ممکن است یکجا آنقدر XP بگیرد که 2 لول بالا برود)
-            leveled_up = False
-            while profile.xp >= profile.get_next_level_xp():
-                profile.xp -= profile.get_next_level_xp()  # کسر XP مصرف شده
-                profile.level += 1
-                leveled_up = True
+            leveled_up = add_xp(profile, coins_earned)
 
             profile.last_claim_time = now
+            profile.save(update_fields=['coins', 'xp', 'level', 'last_claim_time'])
+            transaction.on_commit(lambda: set_cooldown('claim', user_id, CLAIM_COOLDOWN_SECONDS))
 
             # اگر لول آپ شد، باید ریت استخراج دوباره محاسبه شود (چون ضریب عوض شده)
             if leveled_up:
                 profile.update_mining_rate()
-            else:
-                profile.save()
+            bump_profile_version(request.user.pk)
+            publish_balance(profile)
 
             message = f'{coins_earned} سکه جمع‌آوری شد!'
             if leveled_up:
@@ -294,38 +582,248 @@ def market_feed(request):
     """
     نمایش لیست تمام کارت‌های فروشی در بازار
     فقط آگهی‌های فعال نمایش داده می‌شوند
+
+    limit / cursor: صفحه‌بندی keyset (جدیدترین اول)؛ بدون این دو کل لیست برمی‌گردد
     """
-    listings = MarketListing.objects.filter(
-        is_active=True
-    ).select_related('card_instance__template', 'seller__user').order_by('-created_at')
-    
-    data = []
-    for item in listings:
-        data.append({
-            'listing_id': item.id,
-            'card_name': item.card_instance.template.name,
-            'rarity': item.card_instance.template.rarity,
-            'serial': item.card_instance.serial_number,
-            'price': item.price,  # ✅ فقط Vow Fragments
-            'currency': 'Vow Fragments',  # ثابت
-            'seller': item.seller.user.username,
-            'created_at': item.created_at.isoformat()
-        })
-    
-    return Response(data)
+    listings = MarketListing.objects.filter(is_active=True).order_by('-created_at')
+    compact = wants_compact(request)
+    params = request.query_params
+    if 'limit' in params or 'cursor' in params:
+        try:
+            items, next_url = market_page_data(
+                request, params.get('cursor'), parse_page_size(params.get('limit')), compact)
+        except ValueError:
+            return Response({'error': 'پارامترهای صفحه‌بندی نامعتبر است.'}, status=400)
+        return Response({'next': next_url, 'results': items})
+    if wants_stream(request):
+        # ?stream=1 برای کلاینت‌های قدیمی و خروجی‌های بزرگ: حافظهٔ ثابت
+        return streaming_json_response(
+            iter_market_feed(listings, compact=compact, chunk_size=STREAM_CHUNK_SIZE))
+    return Response(market_feed_data(listings, compact=compact))
+
+
+def market_feed_data(listings, compact=False):
+    return list(iter_market_feed(listings, compact=compact))
+
+
+def market_page_data(request, cursor=None, page_size=DEFAULT_PAGE_SIZE, compact=False):
+    """
+    یک صفحه از فید بازار: (آیتم‌ها، URL صفحهٔ بعد یا None)
+    ترتیب بر اساس id نزولی است که با created_at (auto_now_add) یکی است و cursor را ساده نگه می‌دارد
+    """
+    rows = MarketListing.objects.filter(is_active=True).values_list(*MARKET_FEED_COLUMNS, named=True)
+    page, next_cursor = keyset_paginate(rows, 'id', True, cursor, page_size)
+    next_url = None
+    if next_cursor:
+        url = request.build_absolute_uri(reverse('market-feed'))
+        url = replace_query_param(url, 'limit', page_size)
+        if compact:
+            url = replace_query_param(url, 'compact', 1)
+        next_url = replace_query_param(url, 'cursor', next_cursor)
+    return [market_feed_item(row, compact) for row in page], next_url
+
+
+MARKET_FEED_COLUMNS = (
+    'id', 'card_instance__template_id', 'card_instance__template__name',
+    'card_instance__template__rarity', 'card_instance__serial_number',
+    'price', 'seller__user__username', 'created_at',
+)
+
+
+def iter_market_feed(listings, compact=False, chunk_size=None):
+    """ساخت آیتم‌های market_feed مستقیم از values_list (بدون ساختن مدل‌ها)"""
+    rows = listings.values_list(*MARKET_FEED_COLUMNS)
+    if chunk_size:
+        rows = rows.iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield market_feed_item(row, compact)
+
+
+def market_feed_item(row, compact=False):
+    listing_id, template_id, card_name, rarity, serial, price, seller, created_at = row
+    if compact:
+        card = {'template_id': template_id}
+    else:
+        card = {'card_name': card_name, 'rarity': rarity}
+    return {
+        'listing_id': listing_id,
+        **card,
+        'serial': serial,
+        'price': price,  # ✅ فقط Vow Fragments
+        'currency': 'Vow Fragments',  # ثابت
+        'seller': seller,
+        'created_at': created_at.isoformat()
+    }
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_packs(request):
-    packs = Pack.objects.all()
-    serializer = PackSerializer(packs, many=True, context={'request': request})
-    return Response(serializer.data)
+    return Response(packs_data(request))
+
+
+def packs_data(request, catalog=None):
+    # از کاتالوگ داخل حافظه؛ آدرس تصویر مثل PackSerializer با request مطلق می‌شود
+    catalog = catalog or get_catalog()
+    packs = []
+    for pack in catalog['packs']:
+        pack = dict(pack)
+        if pack['image']:
+            pack['image'] = request.build_absolute_uri(pack['image'])
+        packs.append(pack)
+    return packs
+
+
+@require_GET
+def metrics(request):
+    """
+    متریک‌های عملکرد (game.metrics) برای Prometheus
+    فقط برای کاربر staff یا با هدر Authorization: Bearer <GAME_METRICS_TOKEN>
+    """
+    token = getattr(settings, 'GAME_METRICS_TOKEN', '')
+    authorized = request.user.is_staff or (
+        token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'))
+    if not authorized:
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_data(request, dataset, fmt, gz=None):
+    """
+    خروجی استریم یک جدول (game.exports) برای staff، صفحه به صفحه
+    export/players.csv، export/cards.jsonl.gz، ...
+
+    برای خروجی‌های کوچک یا بخشی از جدول است: دانلود یک worker وب را نگه می‌دارد و
+    زیر timeout سرور (30 ثانیه در gunicorn) باید تمام شود. هر صفحه حداکثر
+    EXPORT_PAGE_SIZE ردیف دارد و اگر ردیف دیگری مانده باشد هدر Link (rel="next")
+    آدرس صفحهٔ بعد را می‌دهد. کل جدول‌های بزرگ را با دستور export_data بگیرید.
+
+    Query params:
+        after: آخرین pk صفحهٔ قبل
+        limit: تعداد ردیف (حداکثر EXPORT_PAGE_SIZE)
+    """
+    if dataset not in exports.DATASETS:
+        return Response({'error': 'dataset ناشناخته'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        after = int(request.query_params['after']) if request.query_params.get('after') else None
+        limit = int(request.query_params.get('limit') or exports.EXPORT_PAGE_SIZE)
+    except ValueError:
+        return Response({'error': 'after و limit باید عدد باشند.'}, status=400)
+    if limit < 1:
+        return Response({'error': 'limit باید مثبت باشد.'}, status=400)
+    limit = min(limit, exports.EXPORT_PAGE_SIZE)
+
+    compress = bool(gz)
+    response = StreamingHttpResponse(
+        exports.export(dataset, fmt, compress, after=after, limit=limit),
+        content_type=exports.GZIP_CONTENT_TYPE if compress else exports.CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{exports.filename(dataset, fmt, compress)}"'
+    response['Cache-Control'] = 'no-store'
+    next_pk = exports.next_after(dataset, after, limit)
+    if next_pk is not None:
+        next_url = replace_query_param(request.build_absolute_uri(), 'after', next_pk)
+        response['Link'] = f'<{replace_query_param(next_url, "limit", limit)}>; rel="next"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_catalog_view(request, version=None):
+    """
+    کاتالوگ ثابت (تمپلیت‌ها، پک‌ها، آواتارها)
+
+    catalog/ همیشه با ETag اعتبارسنجی می‌شود؛ catalog/<version>/ تغییرناپذیر است
+    و کلاینت می‌تواند آن را برای همیشه کش کند.
+    """
+    catalog = get_catalog()
+    current = catalog['version']
+
+    if version is not None:
+        if version != current:
+            return redirect('catalog-versioned', version=current)
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = 'public, no-cache'
+
+    # JSON و MessagePack هر دو از همین URL سرو می‌شوند
+    headers = {'ETag': f'"{current}"', 'Cache-Control': cache_control, 'Vary': 'Accept'}
+    if headers['ETag'] in parse_etags(request.headers.get('If-None-Match', '')):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(catalog, headers=headers)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def bootstrap(request):
+    """
+    همهٔ داده‌های شروع بازی در یک درخواست:
+    profile/me، my-cards، packs، avatars، leaderboard و market
+
+    Query params:
+        only: فهرست کلیدها با کاما (مثلاً only=cards,packs)؛ SPA وقتی بخشی از داده
+              داخل HTML آمده فقط بقیه را می‌گیرد
+    """
+    keys = BOOTSTRAP_KEYS
+    only = request.query_params.get('only')
+    if only:
+        keys = {key.strip() for key in only.split(',') if key.strip()}
+        unknown = keys - set(BOOTSTRAP_KEYS)
+        if unknown:
+            return Response({'error': f"کلید ناشناخته: {', '.join(sorted(unknown))}"}, status=400)
+    return Response(bootstrap_data(request, keys))
+
+
+BOOTSTRAP_KEYS = ('profile', 'cards', 'packs', 'avatars', 'leaderboard', 'market')
+# کلیدهایی که game_index داخل HTML می‌گذارد؛ SPA بقیه را با bootstrap/?only= می‌گیرد
+EMBEDDED_BOOTSTRAP_KEYS = ('profile', 'market')
+
+
+def bootstrap_data(request, keys=BOOTSTRAP_KEYS):
+    user_id = request.user.pk
+    catalog = get_catalog()
+    data = {'catalog_version': catalog['version']}
+    if 'profile' in keys:
+        data['profile'] = profile_data(user_id, current_profile_version(user_id))
+    if 'cards' in keys:
+        # کارت‌ها مستقیم با user_id فیلتر می‌شوند تا به خواندن جداگانهٔ پروفایل نیازی نباشد
+        data['cards'] = user_cards_data(UserCard.objects.filter(
+            owner__user_id=user_id, is_listed_in_market=False
+        ).order_by('id'))
+    if 'packs' in keys:
+        data['packs'] = packs_data(request)
+    if 'avatars' in keys:
+        data['avatars'] = catalog['avatars']
+    if 'leaderboard' in keys:
+        data['leaderboard'] = leaderboard_data()
+    if 'market' in keys:
+        # فقط صفحهٔ اول بازار؛ بقیه با market_next صفحه‌به‌صفحه گرفته می‌شود
+        data['market'], data['market_next'] = market_page_data(request)
+    return data
+
+
+def embedded_bootstrap_data(request):
+    """
+    دادهٔ داخل HTML صفحهٔ بازی: فقط پروفایل، نسخهٔ کاتالوگ و صفحهٔ اول بازار
+    (اندازهٔ صفحه با تعداد کارت‌ها و آگهی‌ها بزرگ نمی‌شود؛ بقیه را SPA می‌گیرد)
+    """
+    return bootstrap_data(request, EMBEDDED_BOOTSTRAP_KEYS)
 
 
 def game_index(request):
     # Main game page - serves React SPA
-    return render(request, 'game/base.html')
+    context = {}
+    # برای کاربر لاگین‌شده داده‌های شروع داخل HTML قرار می‌گیرد تا SPA درخواست اولیه نزند
+    if settings.GAME_EMBED_BOOTSTRAP and request.user.is_authenticated:
+        try:
+            data = embedded_bootstrap_data(request)
+        except PlayerProfile.DoesNotExist:
+            # مثلاً ادمینی که با createsuperuser ساخته شده و پروفایل ندارد
+            data = None
+        if data is not None:
+            context['bootstrap_script'] = json_script(data, 'game-bootstrap', encoder=encoders.JSONEncoder)
+    return render(request, 'game/base.html', context)
 
 # ==========================================
 
@@ -360,11 +858,12 @@ def equip_card(request):
 
         # 3. چک کردن اینکه کارت قبلاً در اسلات دیگری نباشد
         # اگر کارت الان در اسلات 1 است و کاربر می‌خواهد بگذارد در اسلات 2، باید اسلات 1 خالی شود.
-        if profile.slot_1 == card:
+        # مقایسه با id تا اسلات‌ها بی‌دلیل از دیتابیس خوانده نشوند
+        if profile.slot_1_id == card.id:
             profile.slot_1 = None
-        if profile.slot_2 == card:
+        if profile.slot_2_id == card.id:
             profile.slot_2 = None
-        if profile.slot_3 == card:
+        if profile.slot_3_id == card.id:
             profile.slot_3 = None
 
         # 4. قرار دادن در اسلات جدید
@@ -376,17 +875,18 @@ def equip_card(request):
             profile.slot_3 = card
 
         # 5. ذخیره پروفایل و محاسبه مجدد
-        profile.save()
+        profile.save(update_fields=['slot_1', 'slot_2', 'slot_3'])
         new_rate = profile.update_mining_rate()
+        bump_profile_version(request.user.pk)
 
     return Response({
         'message': f'کارت با موفقیت در اسلات {slot_number} قرار گرفت.',
         'mining_rate': new_rate,
         # برگرداندن وضعیت جدید اسلات‌ها برای آپدیت فرانت
         'slots': {
-            '1': getattr(profile.slot_1, 'id', None),
-            '2': getattr(profile.slot_2, 'id', None),
-            '3': getattr(profile.slot_3, 'id', None),
+            '1': profile.slot_1_id,
+            '2': profile.slot_2_id,
+            '3': profile.slot_3_id,
         }
     })
 
@@ -413,36 +913,11 @@ def register_user(request):
 
             # Grant one free starter card (simulate opening a pack)
             # Rarity roll: COMMON 60%, RARE 30%, EPIC 9%, LEGENDARY 1%
-            roll = random.randint(1, 100)
-            if roll <= 60:
-                selected_rarity = 'COMMON'
-            elif roll <= 90:
-                selected_rarity = 'RARE'
-            elif roll <= 99:
-                selected_rarity = 'EPIC'
-            else:
-                selected_rarity = 'LEGENDARY'
-
-            available_cards = CardTemplate.objects.select_for_update().filter(
-                rarity=selected_rarity,
-                minted_count__lt=models.F('max_supply')
-            )
-            if not available_cards.exists():
-                available_cards = CardTemplate.objects.select_for_update().filter(
-                    rarity='COMMON',
-                    minted_count__lt=models.F('max_supply')
-                )
-
             starter_card = None
-            if available_cards.exists():
-                template = random.choice(list(available_cards))
-                template.minted_count += 1
-                template.save()
-                starter_card = UserCard.objects.create(
-                    owner=profile,
-                    template=template,
-                    serial_number=template.minted_count
-                )
+            minted = mint_cards(profile, [roll_rarity(STARTER_CHANCES)])
+            if minted:
+                starter_card = minted[0]
+                record_card_changes(profile.pk, [starter_card.id])
     except IntegrityError:
         return Response({'error': 'این نام کاربری قبلاً گرفته شده است.'}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -490,15 +965,19 @@ def login_user(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def logout_user(request):
+    user_id = request.user.pk
     logout(request)
+    invalidate_user(user_id)
+    if isinstance(request.auth, Token):
+        invalidate_token(request.auth.key)
     return Response({'message': 'خارج شدید.'})
 
 
 # Exchange coins -> gems: 1000 coins -> 25 gems
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def exchange_coins(request):
-    profile = request.user.profile
     try:
         coins = int(request.data.get('coins', 0))
     except (TypeError, ValueError):
@@ -507,9 +986,6 @@ def exchange_coins(request):
     if coins < 1000:
         return Response({'error': 'حداقل مقدار 1000 سکه است.'}, status=400)
 
-    if coins > profile.coins:
-        return Response({'error': 'سکه کافی ندارید.'}, status=400)
-
     # compute bundles of 1000
     bundles = coins // 1000
     if bundles <= 0:
@@ -519,9 +995,15 @@ def exchange_coins(request):
     gems_to_add = bundles * 25
 
     with transaction.atomic():
+        # قفل پروفایل؛ موجودی باید زیر قفل چک شود تا دو درخواست همزمان یک سکه را دو بار خرج نکنند
+        profile = PlayerProfile.objects.select_for_update().get(user=request.user)
+        if coins > profile.coins:
+            return Response({'error': 'سکه کافی ندارید.'}, status=400)
+
         profile.coins -= coins_to_deduct
         profile.gems += gems_to_add
-        profile.save()
+        profile.save(update_fields=['coins', 'gems'])
+        bump_profile_version(request.user.pk)
 
     return Response({
         'message': f'{coins_to_deduct} سکه تبدیل شد به {gems_to_add} الماس.',
@@ -581,27 +1063,34 @@ def create_listing(request):
             status=400
         )
 
-    try:
-        card = UserCard.objects.get(
-            id=card_id, 
-            owner=profile, 
-            is_listed_in_market=False
-        )
-    except UserCard.DoesNotExist:
-        return Response(
-            {'error': 'کارت یافت نشد یا قبلاً در بازار لیست شده است.'},
-            status=404
-        )
-
     with transaction.atomic():
+        # قفل کارت تا دو درخواست همزمان یک کارت را دو بار لیست نکنند
+        try:
+            card = UserCard.objects.select_for_update().select_related('template').get(
+                id=card_id,
+                owner=profile,
+                is_listed_in_market=False
+            )
+        except UserCard.DoesNotExist:
+            return Response(
+                {'error': 'کارت یافت نشد یا قبلاً در بازار لیست شده است.'},
+                status=404
+            )
+
         card.is_listed_in_market = True
-        card.save()
+        card.save(update_fields=['is_listed_in_market'])
+        record_card_changes(profile.pk, [card.id])
         
-        MarketListing.objects.create(
+        listing = MarketListing.objects.create(
             seller=profile,
             card_instance=card,
             price=price  # ✅ فقط Vow Fragments
         )
+        bump_profile_version(user.pk)
+        publish(MARKET_CHANNEL, 'listing_created', market_feed_item((
+            listing.id, card.template_id, card.template.name, card.template.rarity,
+            card.serial_number, listing.price, user.username, listing.created_at,
+        )))
 
     return Response({
         'message': f'کارت با قیمت {price} Vow Fragments در بازار قرار گرفت.'
@@ -610,6 +1099,7 @@ def create_listing(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def buy_listing(request, listing_id):
     """
     خرید کارت از بازار سیاه با Vow Fragments
@@ -620,7 +1110,7 @@ def buy_listing(request, listing_id):
     }
     """
     buyer_user = request.user
-    buyer_profile = buyer_user.profile
+    buyer_id = get_profile_id(buyer_user)
 
     listing_id = request.data.get('listing_id')
 
@@ -632,7 +1122,10 @@ def buy_listing(request, listing_id):
 
     with transaction.atomic():
         try:
-            listing = MarketListing.objects.select_for_update().get(
+            # کارت و تمپلیت در همان کوئری خوانده می‌شوند؛ قفل فقط روی آگهی و کارت
+            listing = MarketListing.objects.select_for_update(of=('self', 'card_instance')).select_related(
+                'card_instance__template'
+            ).get(
                 id=listing_id,
                 is_active=True
             )
@@ -643,11 +1136,18 @@ def buy_listing(request, listing_id):
             )
         
         # بررسی: خریدار نمی‌تواند کارت خود را بخرد
-        if listing.seller == buyer_profile:
+        if listing.seller_id == buyer_id:
             return Response(
                 {'error': 'شما نمی‌توانید کارت خودتان را بخرید!'},
                 status=400
             )
+
+        # قفل هر دو پروفایل به ترتیب pk، تا دو خرید متقابل (A از B و B از A) در بن‌بست نیفتند
+        profiles = PlayerProfile.objects.select_for_update().filter(
+            pk__in=[buyer_id, listing.seller_id]
+        ).order_by('pk').in_bulk()
+        buyer_profile = profiles[buyer_id]
+        seller_profile = profiles[listing.seller_id]
         
         # ✅ بررسی Vow Fragments (نه Gems)
         if buyer_profile.vow_fragments < listing.price:
@@ -665,7 +1165,6 @@ def buy_listing(request, listing_id):
         buyer_profile.save(update_fields=['vow_fragments'])
         
         # 2. واریز Vow Fragments به فروشنده
-        seller_profile = listing.seller
         seller_profile.vow_fragments += listing.price
         seller_profile.save(update_fields=['vow_fragments'])
         
@@ -674,11 +1173,19 @@ def buy_listing(request, listing_id):
         card.owner = buyer_profile
         card.is_listed_in_market = False
         card.save(update_fields=['owner', 'is_listed_in_market'])
+        # tombstone برای فروشنده، کارت جدید برای خریدار
+        record_card_changes(seller_profile.pk, [card.id], removed=True)
+        record_card_changes(buyer_profile.pk, [card.id])
         
         # 4. غیرفعال کردن آگهی
         listing.is_active = False
         listing.save(update_fields=['is_active'])
 
+        bump_profile_version(buyer_user.pk, seller_profile.user_id)
+        publish(MARKET_CHANNEL, 'listing_sold', {'listing_id': listing.id})
+        publish_balance(buyer_profile)
+        publish_balance(seller_profile)
+
     return Response({
         'message': f'تبریک! کارت {card.template.name} خریداری شد.',
         'remaining_vow_fragments': buyer_profile.vow_fragments
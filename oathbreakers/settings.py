@@ -7,6 +7,7 @@ from pathlib import Path
 import os
 import dj_database_url
 from decouple import config, Csv
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -61,13 +62,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'game.middleware.PerformanceMiddleware',  # first, so it sees the whole request
+    'game.middleware.SlowQueryMiddleware',  # slow-query log, independent of GAME_PERF_METRICS
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # WhiteNoise for static files
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'game.middleware.CachedAuthenticationMiddleware',  # cached request.user (game.authentication)
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -118,6 +121,121 @@ else:
     }
 
 
+# ============================================================
+# CACHE CONFIGURATION
+# ============================================================
+
+# Use REDIS_URL when running more than one worker, otherwise cache invalidation
+# (e.g. profile versions) only reaches the process that made the change.
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'oathbreakers',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Seconds a serialized profile payload stays cached (it is also replaced
+# whenever the profile version is bumped by a mutating view)
+GAME_PROFILE_CACHE_TIMEOUT = config('GAME_PROFILE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Seconds the per-template collection summary stays cached (0 disables it)
+GAME_COLLECTION_SUMMARY_CACHE_TIMEOUT = config('GAME_COLLECTION_SUMMARY_CACHE_TIMEOUT', default=300, cast=int)
+
+# Rows fetched per server-side cursor round trip for ?stream=1 responses
+GAME_STREAM_CHUNK_SIZE = config('GAME_STREAM_CHUNK_SIZE', default=2000, cast=int)
+
+# Embed the bootstrap payload (profile, cards, packs, ...) into the SPA page
+# for logged-in users so the first render needs no API round trip
+GAME_EMBED_BOOTSTRAP = config('GAME_EMBED_BOOTSTRAP', default=True, cast=bool)
+
+# Sessions are read from the cache first and only hit the database on a miss
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Authenticated users (and their profile id) resolved from a token or session
+# are kept in a per-process LRU for GAME_AUTH_CACHE_TTL seconds. Set
+# GAME_AUTH_CACHE_ALIAS to a shared cache (e.g. 'default' with Redis) so that
+# invalidation reaches every worker immediately.
+GAME_AUTH_CACHE_SIZE = config('GAME_AUTH_CACHE_SIZE', default=10000, cast=int)
+GAME_AUTH_CACHE_TTL = config('GAME_AUTH_CACHE_TTL', default=30, cast=int)
+GAME_AUTH_CACHE_ALIAS = config('GAME_AUTH_CACHE_ALIAS', default='') or None
+
+# Per-user token buckets for endpoints clients tend to hammer (see
+# game/throttling.py). 'rate' is the refill rate, 'burst' the bucket size.
+# Set GAME_THROTTLE_CACHE_ALIAS to share buckets between workers.
+GAME_THROTTLE_BUCKETS = {
+    'claim': {'rate': '6/min', 'burst': 3},
+    'open_pack': {'rate': '60/min', 'burst': 10},
+}
+GAME_THROTTLE_CACHE_ALIAS = config('GAME_THROTTLE_CACHE_ALIAS', default='') or None
+
+# Seconds a response stored under an Idempotency-Key can be replayed
+# (expired rows are removed by `manage.py purge_idempotency_keys`)
+GAME_IDEMPOTENCY_TTL = config('GAME_IDEMPOTENCY_TTL', default=24 * 3600, cast=int)
+# Seconds after which a key whose request never stored a response (the
+# worker died mid-request, so its transaction rolled back) may be re-run
+GAME_IDEMPOTENCY_PENDING_TIMEOUT = config('GAME_IDEMPOTENCY_PENDING_TIMEOUT', default=60, cast=int)
+
+# Card change log rows kept per player for delta sync; older rows are removed
+# by `manage.py purge_inventory_changes` and clients with an older cursor get
+# a full snapshot on their next sync
+GAME_INVENTORY_CHANGES_KEEP = config('GAME_INVENTORY_CHANGES_KEEP', default=1000, cast=int)
+
+# Serve leaderboard, market feed, packs, avatars and profile reads from the
+# async views in game/async_views.py. Only worth enabling under an ASGI server:
+#   gunicorn oathbreakers.asgi:application -k uvicorn.workers.UvicornWorker
+GAME_ASYNC_READ_VIEWS = config('GAME_ASYNC_READ_VIEWS', default=False, cast=bool)
+
+# Push channel for market and balance events (GET /api/game/events/, SSE,
+# ASGI only). The default broker only reaches clients connected to the same
+# process; point GAME_EVENT_BROKER at a shared implementation for more workers.
+GAME_EVENT_BROKER = config('GAME_EVENT_BROKER', default='game.events.LocalBroker')
+GAME_EVENT_HEARTBEAT = config('GAME_EVENT_HEARTBEAT', default=15, cast=int)
+
+# Per-endpoint query count, DB time, encode time and latency (Server-Timing
+# header plus Prometheus histograms at /api/game/metrics/). The metrics
+# endpoint is open to staff users and to `Authorization: Bearer <token>`.
+GAME_PERF_METRICS = config('GAME_PERF_METRICS', default=True, cast=bool)
+GAME_METRICS_TOKEN = config('GAME_METRICS_TOKEN', default='')
+
+# Queries slower than GAME_SLOW_QUERY_MS (0 disables) are sampled into a ring
+# buffer with their view and call stack (manage.py slow_queries, or
+# /admin/game/slow-queries/). GAME_SLOW_QUERY_CACHE mirrors the buffer into
+# the cache so other processes can read it; that needs a shared cache (REDIS_URL).
+# Recorded by game.middleware.SlowQueryMiddleware, so it keeps working with
+# GAME_PERF_METRICS=False.
+GAME_SLOW_QUERY_MS = config('GAME_SLOW_QUERY_MS', default=100, cast=int)
+GAME_SLOW_QUERY_SAMPLE_RATE = config('GAME_SLOW_QUERY_SAMPLE_RATE', default=1.0, cast=float)
+GAME_SLOW_QUERY_BUFFER = config('GAME_SLOW_QUERY_BUFFER', default=500, cast=int)
+GAME_SLOW_QUERY_CACHE = config('GAME_SLOW_QUERY_CACHE', default=bool(REDIS_URL), cast=bool)
+
+# Admin bulk actions (cancel listings, recalculate mining rates) run as
+# set-based UPDATEs over GAME_BULK_CHUNK_SIZE primary keys per transaction.
+# Selections larger than GAME_BULK_BACKGROUND_THRESHOLD run in a background
+# thread and report progress under Admin > Game > bulk jobs.
+GAME_BULK_CHUNK_SIZE = config('GAME_BULK_CHUNK_SIZE', default=1000, cast=int)
+GAME_BULK_BACKGROUND_THRESHOLD = config('GAME_BULK_BACKGROUND_THRESHOLD', default=5000, cast=int)
+# A background job with no progress for this many seconds is treated as
+# abandoned (its worker restarted); `manage.py resume_bulk_jobs` or the
+# retry action on the bulk jobs page continues it from its last chunk.
+GAME_BULK_STALE_AFTER = config('GAME_BULK_STALE_AFTER', default=300, cast=int)
+
+# Rows per page of the staff export endpoint (/api/game/export/...). Each page
+# holds a web worker until it is downloaded, so it must finish well inside the
+# server timeout; full-table exports go through `manage.py export_data`.
+GAME_EXPORT_PAGE_SIZE = config('GAME_EXPORT_PAGE_SIZE', default=50000, cast=int)
+
+
 # ============================================================
 # REST FRAMEWORK
 # ============================================================
@@ -125,11 +243,23 @@ else:
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'game.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson-backed JSON by default; MessagePack when the client asks for it
+    'DEFAULT_RENDERER_CLASSES': (
+        'game.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'game.renderers.MessagePackRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'game.renderers.MessagePackParser',
+    ),
 }
 
 
@@ -198,6 +328,10 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # CORS settings for API access
 CORS_ALLOW_CREDENTIALS = True
 
+# Idempotency-Key is sent by the SPA on retried mutations
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Retry-After', 'Idempotent-Replayed', 'Server-Timing']
+
 # Configure CORS origins
 CORS_ALLOWED_ORIGINS = config(
     'CORS_ALLOWED_ORIGINS',
@@ -3,11 +3,13 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from game import views as game_views
+from game.admin import slow_queries_view
 
 urlpatterns = [
     path('', game_views.landing, name='landing'),
     path('login/', game_views.login_page, name='root-login'),
     path('register/', game_views.register_page, name='root-register'),
+    path('admin/game/slow-queries/', admin.site.admin_view(slow_queries_view), name='admin-slow-queries'),
     path('admin/', admin.site.urls),
     path('api/game/', include('game.urls')),  # این خط اضافه شد
 ]